@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import os
+import platform
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import time
+
+
+UTIL = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 
+    "util.py")
+
+# Distinct lines generated per log, the log is sampled from this pool so 
+# gigabytes can be written at disk speed
+POOL_SIZE = 4096
+
+# Arguments timed by default, each is run against FILE and stdin
+DEFAULT_CASES = [
+    "-f 1000", "-f -1000", "-l 1000", "-l -1000", "-f 5000 -l 1000", 
+    "-t", "-i", "-I", "-t -i", "-t -I", "-i -I", "-t -i -I", 
+    "-f 100000 -t -i", "-l 100000 -i -I", 
+    "--engine numpy -t", "--engine numpy -i", "--engine numpy -t -i", 
+]
+
+WORDS = (
+    "GET POST PUT DELETE request response user session cache miss hit "
+    "upstream timeout connected closed worker queue retry ok error warn "
+    "info debug /index.html /api/v1/items status=200 status=404 bytes=512 "
+    "latency_ms=12 agent=curl/7.68 id=af93 host=web-01 region=eu-west"
+).split()
+
+
+def parse_size(text): 
+    '''
+    Function to parse sizes such as 512, 64KB, 1.5MB or 2GB into bytes
+    Reads the same sizes as util.py's --block-size, less than a byte is 
+        invalid
+    '''
+    
+    match = re.fullmatch(r"(\d+(?:\.\d+)?)\s*([KMG]?)B?", text.strip().upper())
+    size = 0 if match is None else int(
+        float(match[1]) * 1024 ** " KMG".index(match[2] or " "))
+    if size == 0: 
+        raise argparse.ArgumentTypeError(f"invalid size: '{text}'")
+    return size
+
+
+def density(text): 
+    '''
+    Function to parse a fraction of lines between 0 and 1
+    '''
+    
+    value = float(text)
+    if not 0 <= value <= 1: 
+        raise argparse.ArgumentTypeError(f"density must be in [0, 1]: {text}")
+    return value
+
+
+def random_ipv4(rng): 
+    return ".".join(str(rng.randrange(256)) for _ in range(4))
+
+
+def random_ipv6(rng): 
+    return ":".join(f"{rng.randrange(65536):x}" for _ in range(8))
+
+
+def random_timestamp(rng): 
+    return (
+        f"{rng.randrange(24):02}:{rng.randrange(60):02}:"
+        f"{rng.randrange(60):02}"
+    )
+
+
+def generate_line(rng, line_length, timestamp_density, ipv4_density, 
+        ipv6_density, ips_per_line): 
+    '''
+    Function to generate one log line
+    Timestamps and addresses are included with the given probabilities, 
+        and the line is padded with words up to roughly line_length
+    '''
+    
+    fields = []
+    if rng.random() < timestamp_density: 
+        fields.append(random_timestamp(rng))
+    if rng.random() < ipv4_density: 
+        fields += [random_ipv4(rng) for _ in range(ips_per_line)]
+    if rng.random() < ipv6_density: 
+        fields += [random_ipv6(rng) for _ in range(ips_per_line)]
+    length = sum(len(field) + 1 for field in fields)
+    while length < line_length - 1: 
+        word = rng.choice(WORDS)
+        fields.insert(rng.randrange(len(fields) + 1), word)
+        length += len(word) + 1
+    return " ".join(fields) + "\n"
+
+
+def generate_log(path, size, line_length=120, timestamp_density=0.5, 
+        ipv4_density=0.1, ipv6_density=0.01, ips_per_line=1, seed=0): 
+    '''
+    Function to write a synthetic log of roughly size bytes to path
+    Returns a dict describing the log that was written
+    '''
+    
+    rng = random.Random(seed)
+    pool = [
+        generate_line(rng, line_length, timestamp_density, ipv4_density, 
+            ipv6_density, ips_per_line).encode() 
+        for _ in range(POOL_SIZE)
+    ]
+    written = lines = 0
+    with open(path, "wb") as log: 
+        while written < size: 
+            block = rng.choices(pool, k=1024)
+            data = b"".join(block)
+            if written + len(data) > size: 
+                # Finish on whole lines as close to size as possible
+                data = data[:max(data.rfind(b"\n", 0, size - written) + 1, 
+                    len(block[0]))]
+            log.write(data)
+            written += len(data)
+            lines += data.count(b"\n")
+    return {
+        "path": os.path.abspath(path), "bytes": written, "lines": lines, 
+        "line_length": line_length, "timestamp_density": timestamp_density, 
+        "ipv4_density": ipv4_density, "ipv6_density": ipv6_density, 
+        "ips_per_line": ips_per_line, "seed": seed,
+    }
+
+
+def time_case(path, args, source): 
+    '''
+    Function to run util.py once and measure it
+    source is "file" to pass the log as FILE or "stdin" to pipe it in 
+        through cat. Returns (seconds, peak RSS in KiB)
+    '''
+    
+    command = [sys.executable, UTIL, *args]
+    with open(os.devnull, "wb") as devnull: 
+        if source == "file": 
+            start = time.perf_counter()
+            child = subprocess.Popen(command + [path], stdout=devnull)
+            feeder = None
+        else: 
+            feeder = subprocess.Popen(["cat", path], stdout=subprocess.PIPE)
+            start = time.perf_counter()
+            child = subprocess.Popen(
+                command, stdin=feeder.stdout, stdout=devnull)
+            feeder.stdout.close()
+        _, status, usage = os.wait4(child.pid, 0)
+        elapsed = time.perf_counter() - start
+        child.returncode = os.waitstatus_to_exitcode(status)
+        if feeder is not None: 
+            feeder.wait()
+    if child.returncode != 0: 
+        raise RuntimeError(f"{' '.join(command)} exited {child.returncode}")
+    
+    # ru_maxrss is in KiB on Linux and in bytes on macOS
+    peak_rss = usage.ru_maxrss
+    if sys.platform == "darwin": 
+        peak_rss //= 1024
+    return elapsed, peak_rss
+
+
+def run_benchmarks(log, cases, sources, repeat): 
+    '''
+    Function to time every case against every source
+    The fastest of repeat runs is kept, along with the largest peak RSS
+    '''
+    
+    results = []
+    for case in cases: 
+        for source in sources: 
+            runs = [time_case(log["path"], case.split(), source) 
+                for _ in range(repeat)]
+            seconds = min(elapsed for elapsed, _ in runs)
+            results.append({
+                "case": case, 
+                "source": source, 
+                "seconds": round(seconds, 6), 
+                "lines_per_s": round(log["lines"] / seconds), 
+                "mb_per_s": round(log["bytes"] / 1024 ** 2 / seconds, 3), 
+                "peak_rss_kb": max(rss for _, rss in runs), 
+            })
+            print(
+                f"{case:<20} {source:<6} {seconds:>9.3f}s "
+                f"{results[-1]['mb_per_s']:>10.1f} MB/s "
+                f"{results[-1]['peak_rss_kb']:>9} KiB", 
+                file=sys.stderr)
+    return results
+
+
+def compare(baseline, current, tolerance): 
+    '''
+    Function to compare two benchmark reports
+    Returns the (case, source, metric, baseline, current) entries that got 
+        worse by more than the tolerance, as a fraction of the baseline
+    '''
+    
+    previous = {
+        (result["case"], result["source"]): result 
+        for result in baseline["results"]
+    }
+    regressions = []
+    for result in current["results"]: 
+        before = previous.get((result["case"], result["source"]))
+        if before is None: 
+            continue
+        for metric in ("seconds", "peak_rss_kb"): 
+            if result[metric] > before[metric] * (1 + tolerance): 
+                regressions.append((
+                    result["case"], result["source"], metric, 
+                    before[metric], result[metric]
+                ))
+    return regressions
+
+
+def parse_cli_args(args): 
+    '''
+    Function to parse command line arguments for the benchmark suite
+    '''
+    
+    parser = argparse.ArgumentParser(
+        description="Benchmark suite for logParserUtility")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    generate = commands.add_parser(
+        "generate", help="write a synthetic log")
+    generate.add_argument("output", metavar="LOG", help="path to write")
+    run = commands.add_parser(
+        "run", help="time util.py against a synthetic log")
+    run.add_argument(
+        "--log", metavar="LOG", 
+        help="existing log to time, generated if not given")
+    run.add_argument(
+        "--keep-log", action="store_true", 
+        help="keep the generated log as benchmark-SIZE-SEED.log instead of "
+        "deleting it")
+    run.add_argument(
+        "--case", metavar="ARGS", action="append", 
+        help="util.py arguments to time, may be repeated, e.g. --case='-t -i'")
+    run.add_argument(
+        "--source", choices=("file", "stdin"), action="append", 
+        help="how the log is given to util.py, defaults to both")
+    run.add_argument(
+        "--repeat", metavar="NUM", type=int, default=3, 
+        help="runs per case, the fastest is kept")
+    run.add_argument(
+        "-o", "--output", metavar="JSON", help="write the report to JSON")
+    run.add_argument(
+        "--baseline", metavar="JSON", 
+        help="compare against a stored report and fail on regressions")
+    run.add_argument(
+        "--tolerance", metavar="FRACTION", type=float, default=0.1, 
+        help="allowed slowdown or memory growth before failing")
+    check = commands.add_parser(
+        "compare", help="compare two stored reports")
+    check.add_argument("baseline", metavar="BASELINE")
+    check.add_argument("current", metavar="CURRENT")
+    check.add_argument(
+        "--tolerance", metavar="FRACTION", type=float, default=0.1)
+
+    for command in (generate, run): 
+        command.add_argument(
+            "--size", type=parse_size, default=parse_size("100MB"), 
+            help="size of the generated log, e.g. 64MB or 2GB")
+        command.add_argument("--line-length", type=int, default=120)
+        command.add_argument(
+            "--timestamp-density", type=density, default=0.5, 
+            help="fraction of lines with a timestamp")
+        command.add_argument(
+            "--ipv4-density", type=density, default=0.1, 
+            help="fraction of lines with IPv4 addresses")
+        command.add_argument(
+            "--ipv6-density", type=density, default=0.01, 
+            help="fraction of lines with IPv6 addresses")
+        command.add_argument(
+            "--ips-per-line", type=int, default=1, 
+            help="addresses on a line that has any")
+        command.add_argument("--seed", type=int, default=0)
+    return parser.parse_args(args)
+
+
+def report_regressions(regressions): 
+    for case, source, metric, before, after in regressions: 
+        print(
+            f"regression: {case} ({source}) {metric} {before} -> {after}", 
+            file=sys.stderr)
+    return 1 if regressions else 0
+
+
+def main(args): 
+    args = parse_cli_args(args)
+    if args.command == "compare": 
+        with open(args.baseline) as baseline, open(args.current) as current: 
+            return report_regressions(compare(
+                json.load(baseline), json.load(current), args.tolerance))
+
+    settings = dict(
+        line_length=args.line_length, 
+        timestamp_density=args.timestamp_density, 
+        ipv4_density=args.ipv4_density, ipv6_density=args.ipv6_density, 
+        ips_per_line=args.ips_per_line, seed=args.seed, 
+    )
+    if args.command == "generate": 
+        log = generate_log(args.output, args.size, **settings)
+        print(json.dumps(log, indent=2))
+        return 0
+
+    # A generated log is written to the temporary directory and deleted 
+    # once it has been timed, unless it's to be kept
+    generated = args.log is None
+    if generated and args.keep_log: 
+        args.log = f"benchmark-{args.size}-{args.seed}.log"
+    elif generated: 
+        descriptor, args.log = tempfile.mkstemp(
+            prefix=f"benchmark-{args.size}-{args.seed}-", suffix=".log")
+        os.close(descriptor)
+    try: 
+        if generated: 
+            log = generate_log(args.log, args.size, **settings)
+        else: 
+            with open(args.log, "rb") as existing: 
+                lines = sum(block.count(b"\n") 
+                    for block in iter(lambda: existing.read(1 << 20), b""))
+            log = {"path": os.path.abspath(args.log), 
+                "bytes": os.path.getsize(args.log), "lines": lines}
+        results = run_benchmarks(
+            log, args.case or DEFAULT_CASES, args.source or ["file", "stdin"], 
+            args.repeat)
+    finally: 
+        if generated and not args.keep_log: 
+            os.unlink(args.log)
+    report = {
+        "meta": {
+            "python": platform.python_version(), 
+            "platform": platform.platform(), 
+            "cpus": os.cpu_count(), 
+            "date": time.strftime("%Y-%m-%dT%H:%M:%S"), 
+            "log": log, 
+        }, 
+        "results": results, 
+    }
+    text = json.dumps(report, indent=2)
+    if args.output: 
+        with open(args.output, "w") as output: 
+            output.write(text + "\n")
+    else: 
+        print(text)
+
+    if args.baseline: 
+        with open(args.baseline) as baseline: 
+            return report_regressions(
+                compare(json.load(baseline), report, args.tolerance))
+    return 0
+
+
+if __name__ == "__main__": 
+    sys.exit(main(sys.argv[1:]))
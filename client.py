@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+
+import os
+import socket
+import struct
+import sys
+
+
+# Must match SERVE_HEADER in util.py
+SERVE_HEADER = "!I"
+
+USAGE = "usage: client.py SOCKET [ARGUMENT ...]\n"
+
+
+def request(path, args): 
+    '''
+    Function to run util.py with args on the util.py --serve at the Unix 
+        socket path
+    This process's standard input, output, and error are handed to the 
+        server, which reads and writes them directly. Returns the exit 
+        status of the run
+    '''
+    
+    payload = b"\0".join(os.fsencode(arg) for arg in [os.getcwd(), *args])
+    with socket.socket(socket.AF_UNIX) as sock: 
+        sock.connect(path)
+        socket.send_fds(
+            sock, [struct.pack(SERVE_HEADER, len(payload)) + payload], 
+            [0, 1, 2])
+        status = sock.recv(1)
+    if not status: 
+        raise ConnectionError("the server closed the connection")
+    return status[0]
+
+
+def main(args): 
+    if not args: 
+        sys.stderr.write(USAGE)
+        sys.exit(2)
+    try: 
+        status = request(args[0], args[1:])
+    except OSError as error: 
+        sys.stderr.write(f"client.py: can't reach '{args[0]}': {error}\n")
+        sys.exit(2)
+    sys.exit(status)
+
+
+if __name__ == "__main__": 
+    main(sys.argv[1:])
@@ -1,7 +1,66 @@
 import pytest
 import sys
 from pathlib import PurePath
+from .. import util
+
+
+# Option and positional tokens in the order they appear in util.py's usage
+USAGE_OPTIONALS = [
+    "[-h]", "[-f NUM]", "[-l NUM]", "[-t]", "[-i]", "[-I]", "[-e RE]",
+    "[-k KW]", "[--keywords LIST]", "[--ip-in LIST]", "[--ip-not-in LIST]",
+    "[--since HH:MM:SS]",
+    "[--until HH:MM:SS]", "[-F]", "[-j NUM]", "[--color WHEN]", "[--stats]",
+    "[--index]", "[--merge]", "[--unordered]", "[--top K]", "[--by KEY]",
+    "[--counters NUM]", "[--count-distinct IP]", "[--precision P]",
+    "[--sketch FILE]", "[--pipeline]", "[--block-size SIZE]",
+    "[--queue-depth NUM]", "[--engine ENGINE]", "[--serve SOCKET]",
+]
+USAGE_POSITIONALS = ["[FILE ...]"]
+
 
 @pytest.fixture(scope="session")
 def script_name(): 
-    return PurePath(sys.argv[0]).parts[-1]
\ No newline at end of file
+    return PurePath(sys.argv[0]).parts[-1]
+
+
+@pytest.fixture(scope="session")
+def usage(script_name): 
+    '''
+    Returns the usage message printed by util.py's argument parser
+    Long usage messages are wrapped at 78 columns the way argparse wraps 
+        them, with the positional arguments starting a new line
+    '''
+    
+    prefix = "usage: "
+    single_line = " ".join([script_name, *USAGE_OPTIONALS, *USAGE_POSITIONALS])
+    if len(prefix) + len(single_line) <= 78: 
+        return f"{prefix}{single_line}\n"
+
+    indent = " " * (len(prefix) + len(script_name) + 1)
+    def get_lines(parts, line_len): 
+        lines = [[]]
+        for part in parts: 
+            if line_len + 1 + len(part) > 78 and lines[-1]: 
+                lines.append([])
+                line_len = len(indent) - 1
+            lines[-1].append(part)
+            line_len += len(part) + 1
+        return [" ".join(line) for line in lines]
+    
+    lines = get_lines([script_name, *USAGE_OPTIONALS], len(prefix) - 1)
+    lines += get_lines(USAGE_POSITIONALS, len(indent) - 1)
+    return prefix + f"\n{indent}".join(lines) + "\n"
+
+
+@pytest.fixture
+def run(capsys): 
+    '''
+    Returns a function that returns what util.py prints for a list of 
+        args
+    '''
+    
+    def run_util(args): 
+        util.main(args)
+        return capsys.readouterr().out
+    
+    return run_util
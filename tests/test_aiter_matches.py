@@ -0,0 +1,215 @@
+import pytest
+import asyncio
+import io
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from .. import util
+
+
+GENERAL_LOG = "testLogs/test_general.log"
+ARGS = [
+    {"ipv4": True}, {"timestamps": True, "ipv6": True}, {"last": 3}, 
+    {"first": 4, "timestamps": True}, {"first": -3, "last": 5, "ipv6": True}, 
+    {"first": 0}, {}, 
+]
+
+
+def log_data(): 
+    '''
+    Returns the bytes of test_general.log
+    '''
+    
+    with open(GENERAL_LOG, "rb") as log: 
+        return log.read()
+
+
+def expected(data, kwargs): 
+    '''
+    Returns the Matches iter_matches gives for data
+    '''
+    
+    return list(util.iter_matches(io.BytesIO(data), **kwargs))
+
+
+async def chunks(data, size, pulled=None): 
+    '''
+    Async generator that yields data size bytes at a time, recording each 
+        chunk handed out in pulled if it is given
+    '''
+    
+    for pos in range(0, len(data), size): 
+        if pulled is not None: 
+            pulled.append(pos)
+        await asyncio.sleep(0)
+        yield data[pos:pos + size]
+
+
+async def collect(source, **kwargs): 
+    '''
+    Returns the Matches aiter_matches yields for source
+    '''
+    
+    return [match async for match in util.aiter_matches(source, **kwargs)]
+
+
+class CountingExecutor(ThreadPoolExecutor): 
+    '''
+    Thread pool that counts the calls submitted to it
+    '''
+    
+    def __init__(self): 
+        super().__init__(max_workers=1)
+        self.submitted = 0
+    
+    def submit(self, *args, **kwargs): 
+        self.submitted += 1
+        return super().submit(*args, **kwargs)
+
+
+class TestPositive: 
+    @pytest.mark.functional
+    @pytest.mark.parametrize("kwargs", ARGS)
+    @pytest.mark.parametrize("size", [1, 7, 100, 100000])
+    def test_chunks(self, kwargs, size): 
+        '''
+        Tests chunks split anywhere, even inside lines, give the same 
+            matches as iter_matches
+        '''
+        
+        data = log_data()
+        assert asyncio.run(
+            collect(chunks(data, size), **kwargs)) == expected(data, kwargs)
+    
+    @pytest.mark.functional
+    def test_trailing_newline_and_crlf(self): 
+        '''
+        Tests a terminated last line and carriage returns are handled like 
+            iter_matches handles them
+        '''
+        
+        data = log_data().replace(b"\n", b"\r\n") + b"\r\n"
+        for kwargs in ARGS: 
+            assert asyncio.run(
+                collect(chunks(data, 13), **kwargs)) == expected(data, kwargs)
+    
+    @pytest.mark.functional
+    def test_unix_sockets(self, tmp_path): 
+        '''
+        Tests many streams read from local Unix sockets at once are each 
+            filtered on their own
+        '''
+        
+        data = log_data()
+        path = str(tmp_path / "log.sock")
+
+        async def serve(reader, writer): 
+            for pos in range(0, len(data), 50): 
+                writer.write(data[pos:pos + 50])
+                await writer.drain()
+            writer.close()
+            await writer.wait_closed()
+
+        async def client(kwargs): 
+            reader, writer = await asyncio.open_unix_connection(path)
+            matches = await collect(reader, block_size=64, **kwargs)
+            writer.close()
+            await writer.wait_closed()
+            return matches
+
+        async def main(): 
+            server = await asyncio.start_unix_server(serve, path)
+            async with server: 
+                return await asyncio.gather(
+                    *(client(kwargs) for kwargs in ARGS * 10))
+
+        results = asyncio.run(main())
+        assert results == [expected(data, kwargs) for kwargs in ARGS * 10]
+    
+    @pytest.mark.functional
+    def test_pipes(self): 
+        '''
+        Tests subprocess and os pipes can be filtered as StreamReaders
+        '''
+        
+        data = log_data()
+
+        async def from_subprocess(): 
+            process = await asyncio.create_subprocess_exec(
+                sys.executable, "-c", 
+                f"import sys; sys.stdout.buffer.write(open({GENERAL_LOG!r}, "
+                "'rb').read())", 
+                stdout=asyncio.subprocess.PIPE)
+            matches = await collect(process.stdout, ipv4=True)
+            await process.wait()
+            return matches
+
+        async def from_pipe(): 
+            read_fd, write_fd = os.pipe()
+            loop = asyncio.get_running_loop()
+            reader = asyncio.StreamReader()
+            transport, _ = await loop.connect_read_pipe(
+                lambda: asyncio.StreamReaderProtocol(reader), 
+                os.fdopen(read_fd, "rb"))
+            await loop.run_in_executor(None, os.write, write_fd, data)
+            os.close(write_fd)
+            matches = await collect(reader, ipv4=True)
+            transport.close()
+            return matches
+
+        async def main(): 
+            return await asyncio.gather(from_subprocess(), from_pipe())
+
+        assert asyncio.run(main()) == [expected(data, {"ipv4": True})] * 2
+    
+    @pytest.mark.functional
+    @pytest.mark.parametrize("kwargs", [{"ipv4": True}, {"last": 5}])
+    def test_large_chunks_are_offloaded(self, kwargs): 
+        '''
+        Tests chunks of at least offload_size bytes are filtered in the 
+            executor, and smaller ones are not
+        '''
+        
+        data = log_data()
+        for offload_size, submitted in ((1, True), (len(data) + 1, False)): 
+            with CountingExecutor() as executor: 
+                matches = asyncio.run(collect(
+                    chunks(data, 400), executor=executor, 
+                    offload_size=offload_size, **kwargs))
+            assert matches == expected(data, kwargs)
+            assert bool(executor.submitted) is submitted
+    
+    @pytest.mark.functional
+    @pytest.mark.parametrize("kwargs", [{"ipv4": True}, {"first": 3}])
+    def test_backpressure(self, kwargs): 
+        '''
+        Tests chunks are only pulled as matches are consumed, and reading 
+            stops once -f has been reached
+        '''
+        
+        data = log_data()
+        pulled = []
+
+        async def main(): 
+            matches = util.aiter_matches(chunks(data, 10), **kwargs)
+            first = await anext(matches)
+            read_so_far = len(pulled)
+            rest = [match async for match in matches]
+            return first, read_so_far, rest
+
+        first, read_so_far, rest = asyncio.run(main())
+        assert [first] + rest == expected(data, kwargs)
+        assert read_so_far < 10
+        if "first" in kwargs: 
+            assert len(pulled) < len(data) // 10 / 2
+
+
+class TestNegative: 
+    @pytest.mark.functional
+    def test_encoding(self): 
+        '''
+        Tests encodings that aren't ASCII-compatible are refused
+        '''
+        
+        with pytest.raises(ValueError, match="can't split utf-16 input"): 
+            asyncio.run(collect(chunks(b"", 1), encoding="utf-16"))
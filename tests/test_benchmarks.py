@@ -0,0 +1,109 @@
+import pytest
+import json
+from ..benchmarks import benchmark
+
+
+class TestPositive: 
+    @pytest.mark.unit
+    def test_parse_size(self): 
+        '''
+        Test that sizes are parsed with optional units
+        '''
+        
+        assert benchmark.parse_size("512") == 512
+        assert benchmark.parse_size("64KB") == 64 * 1024
+        assert benchmark.parse_size("1.5MB") == 1536 * 1024
+        assert benchmark.parse_size("2G") == 2 * 1024 ** 3
+
+    @pytest.mark.unit
+    def test_generate_log(self, tmp_path): 
+        '''
+        Test that the generated log has the requested size and densities
+        '''
+        
+        path = tmp_path / "synthetic.log"
+        log = benchmark.generate_log(path, 256 * 1024, line_length=80, 
+            timestamp_density=1, ipv4_density=0, ipv6_density=0, seed=1)
+        data = path.read_bytes()
+        lines = data.splitlines()
+        assert log["bytes"] == len(data)
+        assert log["lines"] == len(lines)
+        assert abs(len(data) - 256 * 1024) <= 200
+        assert all(line.count(b":") == 2 for line in lines)
+
+    @pytest.mark.unit
+    def test_generate_log_is_reproducible(self, tmp_path): 
+        '''
+        Test that the same seed generates the same log
+        '''
+        
+        for name in ("a.log", "b.log"): 
+            benchmark.generate_log(tmp_path / name, 64 * 1024, 
+                ips_per_line=3, seed=7)
+        assert (tmp_path / "a.log").read_bytes() == \
+            (tmp_path / "b.log").read_bytes()
+
+    @pytest.mark.functional
+    def test_run_and_compare(self, tmp_path): 
+        '''
+        Test that a small run writes a report and matches itself
+        '''
+        
+        log = tmp_path / "bench.log"
+        report = tmp_path / "report.json"
+        assert benchmark.main(["generate", str(log), "--size", "16KB"]) == 0
+        assert benchmark.main([
+            "run", "--log", str(log), "--case=-t -i", "--repeat", "1", 
+            "-o", str(report)
+        ]) == 0
+        results = json.loads(report.read_text())["results"]
+        assert [(result["case"], result["source"]) for result in results] == \
+            [("-t -i", "file"), ("-t -i", "stdin")]
+        assert benchmark.main(
+            ["compare", str(report), str(report)]) == 0
+
+    @pytest.mark.functional
+    @pytest.mark.parametrize("keep", [False, True])
+    def test_generated_log_removed(self, monkeypatch, tmp_path, keep): 
+        '''
+        Test that a generated log is written to the temporary directory and 
+            deleted after the run, or kept in the working directory
+        '''
+        
+        temp = tmp_path / "tmp"
+        temp.mkdir()
+        monkeypatch.setattr(benchmark.tempfile, "tempdir", str(temp))
+        monkeypatch.chdir(tmp_path)
+        args = ["run", "--size", "16KB", "--case=-t", "--repeat", "1", 
+            "--source", "file", "-o", "report.json"]
+        assert benchmark.main(args + ["--keep-log"] * keep) == 0
+        assert [*temp.iterdir()] == []
+        kept = ["benchmark-16384-0.log"] if keep else []
+        assert sorted(path.name for path in tmp_path.glob("*.log")) == kept
+
+
+class TestNegative: 
+    @pytest.mark.unit
+    def test_compare_reports_regressions(self): 
+        '''
+        Test that slowdowns beyond the tolerance are reported
+        '''
+        
+        result = {"case": "-t", "source": "file", "seconds": 1.0, 
+            "peak_rss_kb": 1000}
+        slower = dict(result, seconds=1.5)
+        assert benchmark.compare(
+            {"results": [result]}, {"results": [slower]}, 0.1
+        ) == [("-t", "file", "seconds", 1.0, 1.5)]
+        assert benchmark.compare(
+            {"results": [result]}, {"results": [slower]}, 0.6) == []
+
+    @pytest.mark.unit
+    def test_invalid_density(self): 
+        '''
+        Test that densities outside [0, 1] are rejected
+        '''
+        
+        with pytest.raises(SystemExit): 
+            benchmark.parse_cli_args(["generate", "x.log", "--ipv4-density", 
+                "2"])
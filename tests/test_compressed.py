@@ -0,0 +1,180 @@
+import pytest
+import bz2
+import gzip
+import io
+import lzma
+import sys
+from .. import util
+
+
+GENERAL_LOG = "testLogs/test_general.log"
+COMPRESSORS = {"gzip": gzip.compress, "bz2": bz2.compress, "xz": lzma.compress}
+
+
+def read_log(): 
+    with open(GENERAL_LOG, "rb") as log: 
+        return log.read()
+
+
+@pytest.fixture
+def multi_member_log(tmp_path): 
+    '''
+    The general log compressed as several gzip members that split lines 
+        in the middle, as produced by compressing a log in pieces
+    '''
+    
+    data = read_log() * 50
+    path = tmp_path / "multi.log.gz"
+    with open(path, "wb") as file: 
+        for start in range(0, len(data), 997): 
+            file.write(gzip.compress(data[start:start + 997]))
+    plain = tmp_path / "multi.log"
+    plain.write_bytes(data)
+    return path, plain
+
+
+class TestPositive: 
+    @pytest.mark.functional
+    @pytest.mark.parametrize("compressor", COMPRESSORS)
+    @pytest.mark.parametrize("args", [
+        ["-t"], ["-i"], ["-I"], ["-i", "-I"], ["-f", "6"], ["-l", "4", "-t"], 
+        ["-f", "-5", "-l", "9"], ["-i", "--color=always"], 
+    ])
+    def test_compressed_file(self, run, tmp_path, compressor, args): 
+        '''
+        Tests compressed FILEs print the same lines as the plain log
+        '''
+        
+        path = tmp_path / f"general.log.{compressor}"
+        path.write_bytes(COMPRESSORS[compressor](read_log()))
+        expected = run(args + [GENERAL_LOG])
+        assert run(args + [str(path)]) == expected
+
+    @pytest.mark.functional
+    @pytest.mark.parametrize("compressor", COMPRESSORS)
+    def test_compressed_stdin(self, run, monkeypatch, compressor): 
+        '''
+        Tests compressed standard input is decompressed too
+        '''
+        
+        expected = run(["-t", GENERAL_LOG])
+        data = COMPRESSORS[compressor](read_log())
+        stdin = io.TextIOWrapper(io.BufferedReader(io.BytesIO(data)))
+        monkeypatch.setattr(sys, "stdin", stdin)
+        assert run(["-t"]) == expected
+
+    @pytest.mark.functional
+    @pytest.mark.parametrize("args", [
+        ["-t"], ["-i", "-I"], ["-i", "--color=always"], 
+    ])
+    def test_members_in_parallel(self, run, monkeypatch, 
+            multi_member_log, args): 
+        '''
+        Tests --jobs splits a multi-member gzip file between workers and 
+            puts the lines split between members back together
+        '''
+        
+        path, plain = multi_member_log
+        monkeypatch.setattr(util, "MIN_CHUNK_SIZE", 2048)
+        expected = run(args + [str(plain)])
+        chunks = []
+        gzip_member_chunks = util.logParserUtil.gzip_member_chunks
+        
+        def spy(self, buf, jobs): 
+            chunks.extend(gzip_member_chunks(self, buf, jobs))
+            return chunks
+        
+        monkeypatch.setattr(util.logParserUtil, "gzip_member_chunks", spy)
+        assert run(["-j", "3"] + args + [str(path)]) == expected
+        assert len(chunks) > 2
+
+    @pytest.mark.unit
+    def test_scan_gzip_members(self, multi_member_log): 
+        '''
+        Tests util.scan_gzip_members() returns the partial lines at either 
+            end of its range and the matching lines between them
+        '''
+        
+        path, plain = multi_member_log
+        size = path.stat().st_size
+        data = plain.read_bytes()
+        head, matches, tail, lines, total, counts = util.scan_gzip_members(
+            str(path), 0, size, True, False, False, True)
+        assert head == data[:data.index(b"\n") + 1]
+        assert tail == data[data.rindex(b"\n") + 1:]
+        assert lines == data.count(b"\n")
+        assert total == len(data)
+        assert len(matches.splitlines()) == 50 * 13 - 1
+        assert counts["timestamp prefilter scan"][0] == lines - 1
+
+    @pytest.mark.functional
+    def test_carriage_returns_in_parallel(self, run, monkeypatch, 
+            tmp_path): 
+        '''
+        Tests a member with carriage returns hands the rest of the file 
+            back to the sequential reader
+        '''
+        
+        monkeypatch.setattr(util, "MIN_CHUNK_SIZE", 64)
+        members = [b"a 10.0.0.1\n" * 20, b"b 10.0.0.2\r\n" * 20, 
+            b"c 10.0.0.3\n" * 20]
+        path = tmp_path / "crlf.log.gz"
+        path.write_bytes(b"".join(map(gzip.compress, members)))
+        out = run(["-j", "3", "-i", str(path)])
+        assert out == "".join(
+            member.decode().replace("\r\n", "\n") for member in members)
+
+    @pytest.mark.functional
+    def test_compressed_stats(self, capsys, tmp_path): 
+        '''
+        Tests --stats counts decompressed bytes
+        '''
+        
+        path = tmp_path / "general.log.xz"
+        path.write_bytes(lzma.compress(read_log()))
+        util.main(["-t", "--stats", str(path)])
+        err = capsys.readouterr().err
+        assert f"bytes read      {len(read_log()):>12}\n" in err
+
+
+class TestNegative: 
+    @pytest.mark.unit
+    def test_member_boundaries_checked(self, multi_member_log): 
+        '''
+        Tests ranges that don't start or end on a member are refused
+        '''
+        
+        path, _ = multi_member_log
+        size = path.stat().st_size
+        assert util.scan_gzip_members(
+            str(path), 3, size, True, False, False) is None
+        assert util.scan_gzip_members(
+            str(path), 0, size - 5, True, False, False) is None
+
+    @pytest.mark.functional
+    def test_corrupt_archive(self, capsys, usage, script_name, tmp_path): 
+        '''
+        Tests damaged compressed input is reported as an error
+        '''
+        
+        path = tmp_path / "broken.log.gz"
+        path.write_bytes(gzip.compress(read_log())[:-30])
+        with pytest.raises(SystemExit): 
+            util.main(["-t", str(path)])
+        captured = capsys.readouterr()
+        assert captured.err == (
+            f"{usage}{script_name}: error: argument FILE: can't decompress "
+            f"'{path}': Compressed file ended before the end-of-stream "
+            "marker was reached\n"
+        )
+
+    @pytest.mark.functional
+    def test_not_compressed(self, run, tmp_path): 
+        '''
+        Tests text that merely starts like a bz2 header is read as text
+        '''
+        
+        path = tmp_path / "plain.log"
+        path.write_text("BZh is not 12:00:00 compressed\n")
+        assert run(["-t", str(path)]) == \
+            "BZh is not 12:00:00 compressed\n"
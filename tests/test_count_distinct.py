@@ -0,0 +1,222 @@
+import pytest
+import ipaddress
+import re
+from .. import util
+
+
+GENERAL_LOG = "testLogs/test_general.log"
+IPV4_LOG = "testLogs/test_ipv4.log"
+IPV6_LOG = "testLogs/test_ipv6.log"
+
+
+def estimate(run, args): 
+    '''
+    Returns the estimate --count-distinct prints for args
+    '''
+    
+    return int(run(args).split()[0])
+
+
+def distinct(paths, key): 
+    '''
+    Returns the true number of distinct key addresses in the files at paths
+    '''
+    
+    found = set()
+    for path in paths: 
+        with open(path) as log: 
+            found.update(re.findall(util.TOP_KEY_PATS[key], log.read()))
+    if key == "ipv4": 
+        return len({
+            ".".join(str(int(octet)) for octet in address.split(".")) 
+            for address in found
+        })
+    return len({ipaddress.IPv6Address(address) for address in found})
+
+
+@pytest.fixture(scope="module")
+def many_ips_log(tmp_path_factory): 
+    '''
+    Returns the path of a log with 20000 distinct IPv4 addresses, each 
+        seen twice
+    '''
+    
+    path = tmp_path_factory.mktemp("distinct") / "many.log"
+    path.write_text("".join(
+        f"12:00:00 GET from 10.{n % 4}.{n // 4 % 256}.{n // 1024}\n" 
+        for n in (n % 20000 for n in range(20000 * 2))))
+    return str(path)
+
+
+class TestPositive: 
+    @pytest.mark.functional
+    @pytest.mark.parametrize("key", ["ipv4", "ipv6"])
+    @pytest.mark.parametrize("paths", [
+        [GENERAL_LOG], [IPV4_LOG], [IPV6_LOG], 
+        [GENERAL_LOG, IPV4_LOG, IPV6_LOG], 
+    ])
+    def test_small_counts_are_exact(self, run, key, paths): 
+        '''
+        Tests a few hundred addresses are counted exactly, with IPv6 
+            addresses counted case-insensitively
+        '''
+        
+        args = ["--count-distinct", key] + paths
+        assert estimate(run, args) == distinct(paths, key)
+    
+    @pytest.mark.functional
+    def test_report_format(self, run): 
+        '''
+        Tests the estimate is printed with its standard error
+        '''
+        
+        assert run(["--count-distinct", "ipv4", GENERAL_LOG]) == (
+            "13 distinct IPv4 addresses, standard error ±0 (0.81%)\n")
+        assert run([
+            "--count-distinct", "ipv4", "--precision", "4", GENERAL_LOG]) == (
+            "11 distinct IPv4 addresses, standard error ±3 (26.00%)\n")
+    
+    @pytest.mark.functional
+    def test_only_matching_lines(self, run): 
+        '''
+        Tests only the addresses in the lines that would have been printed 
+            are counted
+        '''
+        
+        assert estimate(
+            run, ["--count-distinct", "ipv4", "-f", "3", GENERAL_LOG]) == 3
+        assert estimate(
+            run, ["--count-distinct", "ipv4", "-t", "-l", "4", GENERAL_LOG]
+        ) == 3
+    
+    @pytest.mark.functional
+    @pytest.mark.parametrize("precision", ["10", "14"])
+    def test_estimate_within_error(self, run, many_ips_log, precision): 
+        '''
+        Tests the estimate for many addresses is within three standard 
+            errors of the true count
+        '''
+        
+        output = run([
+            "--count-distinct", "ipv4", "--precision", precision, 
+            many_ips_log])
+        error = 1.04 / 2 ** (int(precision) / 2)
+        assert abs(int(output.split()[0]) - 20000) <= 3 * error * 20000
+    
+    @pytest.mark.functional
+    @pytest.mark.parametrize("args", [
+        ["-j", "2"], ["--merge"], ["-j", "2", "--unordered"]
+    ])
+    def test_files_and_jobs(self, run, many_ips_log, args): 
+        '''
+        Tests sketches of several FILEs and worker processes are merged 
+            into the sketch of a single scan
+        '''
+        
+        expected = estimate(run, ["--count-distinct", "ipv4", many_ips_log])
+        assert estimate(run, ["--count-distinct", "ipv4"] + args + [
+            many_ips_log, GENERAL_LOG, many_ips_log]) == estimate(
+            run, ["--count-distinct", "ipv4", many_ips_log, GENERAL_LOG])
+        assert estimate(run, ["--count-distinct", "ipv4", "-j", "2", 
+            many_ips_log]) == expected
+    
+    @pytest.mark.functional
+    def test_saved_sketch(self, run, tmp_path): 
+        '''
+        Tests --sketch adds the addresses saved by earlier runs, and 
+            keeps their precision
+        '''
+        
+        path = str(tmp_path / "ips.hll")
+        args = ["--count-distinct", "ipv4", "--sketch", path]
+        run(args + ["--precision", "12", GENERAL_LOG])
+        assert estimate(run, args + [IPV4_LOG]) == distinct(
+            [GENERAL_LOG, IPV4_LOG], "ipv4")
+        sketch = util.DistinctCounter.load(path)
+        assert sketch.precision == 12
+        assert sketch.estimate() == distinct([GENERAL_LOG, IPV4_LOG], "ipv4")
+    
+    @pytest.mark.unit
+    def test_merge_and_serialise(self): 
+        '''
+        Tests merged sketches equal the sketch of all their addresses, and 
+            survive being serialised
+        '''
+        
+        left, right, both = (util.DistinctCounter("ipv6", 8) for _ in "abc")
+        ips = [f"fe80:0:0:0:0:0:0:{n}" for n in range(4)]
+        left.write(" ".join(ips[:3]) + "\n")
+        right.write(" ".join(ips[2:]) + "\n")
+        both.write(" ".join(ips) + "\n")
+        for sketch in (left, right, both): 
+            sketch.flush()
+        left.merge(util.DistinctCounter.from_bytes(right.to_bytes()))
+        assert left.registers == both.registers
+        assert left.estimate() == 4
+        assert left.total == 5
+    
+    @pytest.mark.unit
+    def test_top_rank_counted(self): 
+        '''
+        Tests registers holding the largest possible rank count towards the 
+            estimate
+        '''
+        
+        sketch = util.DistinctCounter("ipv4", 4)
+        top = 64 - sketch.precision + 1
+        sketch.registers = bytearray([top] * 16)
+        assert sketch.estimate() == round(0.673 * 16 * 2 ** top)
+
+
+class TestNegative: 
+    @pytest.mark.functional
+    @pytest.mark.parametrize("args,message", [
+        (["--precision", "12", "-t"], 
+         "argument --precision: not allowed without argument "
+         "--count-distinct"), 
+        (["--sketch", "ips.hll", "-t"], 
+         "argument --sketch: not allowed without argument --count-distinct"), 
+        (["--count-distinct", "ipv4", "--top", "3"], 
+         "argument --count-distinct: not allowed with argument --top"), 
+        (["--count-distinct", "ipv4", "--precision", "3"], 
+         "argument --precision: P must be from 4 to 18"), 
+        (["--count-distinct", "ipv4", "--precision", "19"], 
+         "argument --precision: P must be from 4 to 18"), 
+        (["--count-distinct", "ipv4", "--sketch", GENERAL_LOG], 
+         f"argument --sketch: '{GENERAL_LOG}' is not a sketch"), 
+    ])
+    def test_invalid_arguments(
+            self, capsys, usage, script_name, args, message): 
+        '''
+        Tests error handling for --count-distinct and the options that 
+            need it
+        '''
+        
+        with pytest.raises(SystemExit): 
+            util.main(args + [GENERAL_LOG])
+        captured = capsys.readouterr()
+        assert captured.out == ""
+        assert captured.err == f"{usage}{script_name}: error: {message}\n"
+    
+    @pytest.mark.functional
+    @pytest.mark.parametrize("args,message", [
+        (["--count-distinct", "ipv6"], "counts ipv4 addresses"), 
+        (["--count-distinct", "ipv4", "--precision", "10"], 
+         "has precision 12"), 
+    ])
+    def test_mismatched_sketch(
+            self, capsys, usage, script_name, tmp_path, args, message): 
+        '''
+        Tests a saved sketch must count the same addresses with the same 
+            precision
+        '''
+        
+        path = str(tmp_path / "ips.hll")
+        util.DistinctCounter("ipv4", 12).save(path)
+        with pytest.raises(SystemExit): 
+            util.main(args + ["--sketch", path, GENERAL_LOG])
+        captured = capsys.readouterr()
+        assert captured.out == ""
+        assert captured.err == (
+            f"{usage}{script_name}: error: argument --sketch: '{path}' "
+            f"{message}\n")
@@ -192,7 +192,7 @@ class TestPositive:
 
 class TestNegative: 
     @staticmethod
-    def get_expected_values_for_no_value_given(script_name, arg): 
+    def get_expected_values_for_no_value_given(usage, script_name, arg): 
         '''
         Returns expected (stdout, stderr) when no NUM values are given
         '''
@@ -200,15 +200,14 @@ class TestNegative:
         return (
             "",
             (
-                f"usage: {script_name} [-h] [-f NUM] [-l NUM] [-t] [-i] [-I] "
-                f"[FILE]\n{script_name}: error: argument {arg}: expected one "
+                f"{usage}{script_name}: error: argument {arg}: expected one "
                 "argument\n"
             )
         )
 
     @staticmethod
     def get_expected_values_for_invalid_value_given(
-            script_name, arg, invalid_val): 
+            usage, script_name, arg, invalid_val): 
         '''
         Returns expected (stdout, stderr) when invalid NUM values given
         '''
@@ -216,8 +215,7 @@ class TestNegative:
         return (
             "",
             (
-                f"usage: {script_name} [-h] [-f NUM] [-l NUM] [-t] [-i] [-I] "
-                f"[FILE]\n{script_name}: error: argument {arg}: invalid int "
+                f"{usage}{script_name}: error: argument {arg}: invalid int "
                 f"value: '{invalid_val}'\n"
             )
         )
@@ -229,7 +227,8 @@ class TestNegative:
             ("-l", "-l/--last")
         ]
     )
-    def test_no_value_given(self, capsys, script_name, short_arg, long_arg): 
+    def test_no_value_given(
+            self, capsys, usage, script_name, short_arg, long_arg): 
         '''
         Tests error handling when no value is given to -f or -l
         '''
@@ -239,7 +238,8 @@ class TestNegative:
             util.main(args)
         captured = capsys.readouterr()
         expected_stdout, expected_stderr = (
-            self.get_expected_values_for_no_value_given(script_name, long_arg)
+            self.get_expected_values_for_no_value_given(
+                usage, script_name, long_arg)
         )
         assert captured.out == expected_stdout
         assert captured.err == expected_stderr
@@ -254,7 +254,8 @@ class TestNegative:
         ]
     )
     def test_invalid_value_given(
-            self, capsys, script_name, short_arg, long_arg, invalid_val): 
+            self, capsys, usage, script_name, short_arg, long_arg, 
+            invalid_val): 
         '''
         Tests error handling when an invalid value is given to -f or -l
         '''
@@ -265,7 +266,7 @@ class TestNegative:
         captured = capsys.readouterr()
         expected_stdout, expected_stderr = (
             self.get_expected_values_for_invalid_value_given(
-                script_name, long_arg, invalid_val)
+                usage, script_name, long_arg, invalid_val)
         )
         assert captured.out == expected_stdout
         assert captured.err == expected_stderr
@@ -0,0 +1,242 @@
+import pytest
+import os
+import select
+import signal
+import subprocess
+import sys
+import time
+from .. import util
+
+
+UTIL = os.path.join(os.path.dirname(__file__), os.pardir, "util.py")
+
+
+class Script: 
+    '''
+    Stand-in for time.sleep that runs one action each time --follow goes 
+        idle, and interrupts it once the actions run out
+    '''
+
+    def __init__(self, *actions): 
+        self.actions = list(actions)
+        self.intervals = []
+
+    def __call__(self, interval): 
+        self.intervals.append(interval)
+        if not self.actions: 
+            raise KeyboardInterrupt
+        self.actions.pop(0)()
+
+
+def append(path, text): 
+    '''
+    Returns an action that appends text to path
+    '''
+    
+    def action(): 
+        with open(path, "a") as file: 
+            file.write(text)
+    return action
+
+
+@pytest.fixture
+def live_log(tmp_path): 
+    path = tmp_path / "live.log"
+    path.write_text(
+        "old 01:00:00\n"
+        "old without a time\n"
+        "last 02:00:00 from 10.0.0.1\n"
+    )
+    return path
+
+
+def follow(capsys, monkeypatch, script, args): 
+    '''
+    Returns the output of util.py args while script drives --follow
+    '''
+    
+    monkeypatch.setattr(util.time, "sleep", script)
+    util.main(["-F"] + args)
+    return capsys.readouterr().out
+
+
+class TestPositive: 
+    @pytest.mark.functional
+    def test_follow_appended_lines(self, capsys, monkeypatch, live_log): 
+        '''
+        Tests --follow prints the --last window and then filtered appends
+        '''
+        
+        script = Script(
+            append(live_log, "new 03:00:00\nnew without a time\n"), 
+            append(live_log, "new 04:00:00\n"), 
+        )
+        out = follow(capsys, monkeypatch, script, 
+            ["-t", "-l", "1", str(live_log)])
+        assert out == (
+            "last 02:00:00 from 10.0.0.1\n"
+            "new 03:00:00\n"
+            "new 04:00:00\n"
+        )
+
+    @pytest.mark.functional
+    def test_follow_whole_file(self, capsys, monkeypatch, live_log): 
+        '''
+        Tests --follow without --last starts at the beginning of FILE
+        '''
+        
+        script = Script(append(live_log, "10.0.0.2\n"))
+        out = follow(capsys, monkeypatch, script, ["-i", str(live_log)])
+        assert out == "last 02:00:00 from 10.0.0.1\n10.0.0.2\n"
+
+    @pytest.mark.functional
+    def test_follow_partial_line(self, capsys, monkeypatch, live_log): 
+        '''
+        Tests a line is only filtered once its newline has been written
+        '''
+        
+        script = Script(
+            append(live_log, "partial from 10.0."), 
+            append(live_log, "0.3 done\n"), 
+        )
+        out = follow(capsys, monkeypatch, script, 
+            ["-i", "-l", "0", str(live_log)])
+        assert out == "partial from 10.0.0.3 done\n"
+
+    @pytest.mark.functional
+    def test_follow_truncation(self, capsys, monkeypatch, live_log): 
+        '''
+        Tests a truncated FILE is read again from its start
+        '''
+        
+        def truncate(): 
+            live_log.write_text("after 05:00:00\n")
+        
+        script = Script(truncate)
+        out = follow(capsys, monkeypatch, script, 
+            ["-t", "-l", "1", str(live_log)])
+        assert out == "last 02:00:00 from 10.0.0.1\nafter 05:00:00\n"
+
+    @pytest.mark.functional
+    def test_follow_rotation(self, capsys, monkeypatch, live_log, tmp_path): 
+        '''
+        Tests the old file is read to its end before following the new 
+            file moved into its place
+        '''
+        
+        def rotate(): 
+            os.rename(live_log, tmp_path / "live.log.1")
+            with open(tmp_path / "live.log.1", "a") as file: 
+                file.write("late 06:00:00\nunterminated 06:30:00")
+            live_log.write_text("rotated 07:00:00\n")
+        
+        script = Script(rotate, append(live_log, "more 08:00:00\n"))
+        out = follow(capsys, monkeypatch, script, 
+            ["-t", "-l", "1", str(live_log)])
+        assert out == (
+            "last 02:00:00 from 10.0.0.1\n"
+            "late 06:00:00\n"
+            "unterminated 06:30:00"
+            "rotated 07:00:00\n"
+            "more 08:00:00\n"
+        )
+
+    @pytest.mark.functional
+    def test_follow_highlighting(self, capsys, monkeypatch, live_log): 
+        '''
+        Tests appended lines are highlighted
+        '''
+        
+        script = Script(append(live_log, "to 10.0.0.9\n"))
+        out = follow(capsys, monkeypatch, script, 
+            ["-i", "-l", "0", "--color=always", str(live_log)])
+        assert out == "to \x1b[42m10.0.0.9\x1b[0m\n"
+
+    @pytest.mark.functional
+    def test_follow_carriage_returns(self, capsys, monkeypatch, live_log): 
+        '''
+        Tests appended carriage returns end lines as they do in text mode
+        '''
+        
+        script = Script(append(live_log, "a 09:00:00\r\nb\rc 10:00:00\n"))
+        out = follow(capsys, monkeypatch, script, 
+            ["-t", "-l", "0", str(live_log)])
+        assert out == "a 09:00:00\nc 10:00:00\n"
+
+    @pytest.mark.unit
+    def test_follow_backoff(self, capsys, monkeypatch, live_log): 
+        '''
+        Tests polling slows down while idle and speeds up after new data
+        '''
+        
+        idle = [lambda: None] * 8
+        script = Script(*idle, append(live_log, "x\n"), lambda: None)
+        follow(capsys, monkeypatch, script, ["-l", "0", str(live_log)])
+        assert script.intervals[0] == util.FOLLOW_MIN_INTERVAL
+        assert script.intervals[1] == 2 * util.FOLLOW_MIN_INTERVAL
+        assert max(script.intervals) == util.FOLLOW_MAX_INTERVAL
+        assert script.intervals[9] == util.FOLLOW_MIN_INTERVAL
+
+    @pytest.mark.functional
+    def test_follow_burst(self, capsys, monkeypatch, live_log): 
+        '''
+        Tests a burst larger than one read is filtered in full
+        '''
+        
+        lines = [f"{num % 24:02}:00:00 {num}\n" if num % 3 else f"{num}\n" 
+            for num in range(200000)]
+        script = Script(append(live_log, "".join(lines)))
+        out = follow(capsys, monkeypatch, script, 
+            ["-t", "-l", "0", str(live_log)])
+        assert out == "".join(line for line in lines if ":" in line)
+
+    @pytest.mark.functional
+    def test_follow_stdin_pipe(self, capsys, monkeypatch): 
+        '''
+        Tests --follow reads a pipe to its end like any other input
+        '''
+        
+        read, write = os.pipe()
+        os.write(write, b"12:00:00\nnone\n")
+        os.close(write)
+        with open(read) as stdin: 
+            monkeypatch.setattr(sys, "stdin", stdin)
+            util.main(["-F", "-t"])
+        assert capsys.readouterr().out == "12:00:00\n"
+
+    @pytest.mark.functional
+    def test_follow_process(self, live_log): 
+        '''
+        Tests appended lines come out of a following process promptly and 
+            that interrupting it ends it cleanly
+        '''
+        
+        child = subprocess.Popen(
+            [sys.executable, UTIL, "-F", "-i", "-l", "0", str(live_log)], 
+            stdout=subprocess.PIPE)
+        try: 
+            time.sleep(0.5)
+            with open(live_log, "a") as file: 
+                file.write("no address\nfrom 10.1.2.3\n")
+            ready, _, _ = select.select([child.stdout], [], [], 10)
+            assert ready
+            assert child.stdout.readline() == b"from 10.1.2.3\n"
+        finally: 
+            child.send_signal(signal.SIGINT)
+            assert child.wait(10) == 0
+
+
+class TestNegative: 
+    @pytest.mark.functional
+    def test_follow_with_first(self, capsys, usage, script_name, live_log): 
+        '''
+        Tests --follow cannot be combined with --first
+        '''
+        
+        with pytest.raises(SystemExit): 
+            util.main(["-F", "-f", "2", "-t", str(live_log)])
+        captured = capsys.readouterr()
+        assert captured.err == (
+            f"{usage}{script_name}: error: argument -F/--follow: not allowed "
+            "with argument -f/--first\n"
+        )
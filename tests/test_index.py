@@ -0,0 +1,301 @@
+import pytest
+import io
+import os
+import shutil
+import sys
+from .. import util
+
+
+GENERAL_LOG = "testLogs/test_general.log"
+
+
+@pytest.fixture
+def general_log(tmp_path): 
+    '''
+    Copy of the general test log in a directory the index can be kept in
+    '''
+    
+    path = tmp_path / "general.log"
+    shutil.copy(GENERAL_LOG, path)
+    return path
+
+
+class TestPositive: 
+    @pytest.mark.functional
+    @pytest.mark.parametrize("args", [
+        ["-t"], ["-i"], ["-I"], ["-t", "-i"], ["-i", "-I"], ["-f", "7"], 
+        ["-l", "4"], ["-f", "-3", "-l", "12", "-t"], ["-f", "15", "-l", "9"], 
+        ["-f", "2", "-l", "2"], ["-l", "6", "-I", "-i"], 
+        ["-i", "--color=always"], ["-i", "-I", "--color=always", "-l", "10"],
+    ])
+    def test_index_matches_scan(self, run, general_log, args): 
+        '''
+        Tests output with --index matches output without it, both when the 
+            index is built and when it is reused
+        '''
+        
+        expected = run(args + [str(general_log)])
+        assert run(["--index"] + args + [str(general_log)]) == expected
+        assert os.path.exists(f"{general_log}.lpidx")
+        assert run(["--index"] + args + [str(general_log)]) == expected
+
+    @pytest.mark.unit
+    def test_index_contents(self, general_log): 
+        '''
+        Tests the offsets and feature bits of a built index
+        '''
+        
+        with open(general_log, "rb") as file: 
+            lines = file.readlines()
+            identity = util.LineIndex.identity_of(file.fileno())
+        util.main(["--index", "-t", str(general_log)])
+        index = util.LineIndex.load(f"{general_log}.lpidx", identity)
+        assert index.line_count == len(lines) == 20
+        assert list(index.offsets) == [
+            sum(map(len, lines[:num])) for num in range(len(lines) + 1)
+        ]
+        parser = util.logParserUtil()
+        for line, features in zip(lines, index.features): 
+            text = line.decode()
+            assert bool(features & 1) == bool(util.re.search(
+                util.TIMESTAMP_PAT, text))
+            assert bool(features & 2) == bool(parser.ip_spans(text, True, 
+                False))
+            assert bool(features & 4) == bool(parser.ip_spans(text, False, 
+                True))
+
+    @pytest.mark.functional
+    def test_index_reused(self, run, general_log): 
+        '''
+        Tests an up to date index is not rebuilt
+        '''
+        
+        run(["--index", "-i", str(general_log)])
+        index_path = f"{general_log}.lpidx"
+        built = os.stat(index_path).st_mtime_ns
+        run(["--index", "-I", str(general_log)])
+        assert os.stat(index_path).st_mtime_ns == built
+
+    @pytest.mark.functional
+    def test_stale_index_rebuilt(self, run, general_log): 
+        '''
+        Tests a changed file gets a new index
+        '''
+        
+        run(["--index", "-t", str(general_log)])
+        with open(general_log, "a") as file: 
+            file.write("\nappended at 23:59:59\n")
+        out = run(["--index", "-t", "-l", "1", str(general_log)])
+        assert out == "appended at 23:59:59\n"
+
+    @pytest.mark.functional
+    def test_index_lookup_stats(self, capsys, run, general_log): 
+        '''
+        Tests --stats reports the lines looked up in the index
+        '''
+        
+        run(["--index", "-i", str(general_log)])
+        util.main(["--index", "-i", "--stats", str(general_log)])
+        err = capsys.readouterr().err
+        assert err.startswith(
+            "stage              checked      rejected\n"
+            "index lookup            20             7\n"
+        )
+
+
+class TestNegative: 
+    @pytest.mark.functional
+    def test_corrupt_index_rebuilt(self, run, general_log): 
+        '''
+        Tests an index that cannot be read is replaced
+        '''
+        
+        expected = run(["-i", str(general_log)])
+        index_path = f"{general_log}.lpidx"
+        with open(index_path, "wb") as file: 
+            file.write(b"LPIDX1 but truncated")
+        assert run(["--index", "-i", str(general_log)]) == expected
+        with open(general_log, "rb") as file: 
+            identity = util.LineIndex.identity_of(file.fileno())
+        assert util.LineIndex.load(index_path, identity) is not None
+
+    @pytest.mark.functional
+    def test_carriage_returns_not_indexed(self, run, tmp_path): 
+        '''
+        Tests files with carriage returns are scanned without an index
+        '''
+        
+        path = tmp_path / "crlf.log"
+        path.write_bytes(b"10.0.0.1\r\nnone\r\n10.0.0.2\r\n")
+        expected = run(["-i", str(path)])
+        assert run(["--index", "-i", str(path)]) == expected
+        assert not os.path.exists(f"{path}.lpidx")
+
+    @pytest.mark.functional
+    def test_stdin_not_indexed(self, run, monkeypatch, tmp_path): 
+        '''
+        Tests --index is ignored for standard input
+        '''
+        
+        with open(GENERAL_LOG) as log: 
+            monkeypatch.setattr(sys, "stdin", io.StringIO(log.read()))
+        monkeypatch.chdir(tmp_path)
+        out = run(["--index", "-t", "-l", "1"])
+        assert out == "Line 20: 04:52:24 144.1.18.87 ti"
+        assert os.listdir(tmp_path) == []
+
+
+class TestIncremental: 
+    @pytest.fixture
+    def growing_log(self, tmp_path): 
+        '''
+        Log that ends in the middle of a line, as a live log often does
+        '''
+        
+        path = tmp_path / "live.log"
+        path.write_text(
+            "boot at 00:00:01\n"
+            "client 10.0.0.1 connected\n"
+            "partial line from 10.0."
+        )
+        return path
+
+    @pytest.mark.functional
+    @pytest.mark.parametrize("args", [
+        ["-i"], ["-t"], ["-l", "2"], ["-l", "3", "-i"], ["-f", "4"], 
+    ])
+    def test_appended_lines_indexed(self, run, monkeypatch, growing_log, 
+            args): 
+        '''
+        Tests an index extended with appended bytes matches a fresh scan, 
+            including a last line that was completed by the append
+        '''
+        
+        run(["--index", "-t", str(growing_log)])
+        with open(growing_log, "a") as file: 
+            file.write("0.2 done\nat 12:30:00 from 10.0.0.3\n")
+        expected = run(args + [str(growing_log)])
+        
+        def build(buf, identity): 
+            raise AssertionError("index rebuilt")
+        
+        with monkeypatch.context() as patch: 
+            patch.setattr(util.LineIndex, "build", build)
+            out = run(["--index"] + args + [str(growing_log)])
+        assert out == expected
+        index = util.LineIndex.load(f"{growing_log}.lpidx")
+        assert index.line_count == 4
+        assert bytes(index.features) == bytes([1, 2, 2, 3])
+
+    @pytest.mark.unit
+    def test_extend_scans_new_bytes(self, monkeypatch, growing_log): 
+        '''
+        Tests extending an index only scans from the start of the old last 
+            line
+        '''
+        
+        with open(growing_log, "rb") as file: 
+            buf = file.read()
+            old = util.LineIndex.build(buf, (len(buf), 0, 0, 0))
+        with open(growing_log, "ab") as file: 
+            file.write(b"0.1\n")
+        new = growing_log.read_bytes()
+        scanned = []
+        iter_matching_spans = util.iter_matching_spans
+        
+        def spy(buf, start, end, *flags): 
+            scanned.append(start)
+            return iter_matching_spans(buf, start, end, *flags)
+        
+        monkeypatch.setattr(util, "iter_matching_spans", spy)
+        assert old.appended_to(new, (len(new), 1, 0, 0))
+        index = old.extend(new, (len(new), 1, 0, 0))
+        assert set(scanned) == {old.offsets[-2]}
+        assert list(index.offsets) == [0, 17, 43, len(new)]
+        assert bytes(index.features) == bytes([1, 2, 2])
+
+    @pytest.mark.functional
+    def test_unchanged_log_not_rescanned(self, run, monkeypatch, 
+            growing_log): 
+        '''
+        Tests an index saved by an earlier run is used as is
+        '''
+        
+        run(["--index", "-t", str(growing_log)])
+        monkeypatch.setattr(util.LineIndex, "scan", None)
+        assert run(["--index", "-l", "1", str(growing_log)]) == \
+            "partial line from 10.0."
+
+
+class TestRotation: 
+    @pytest.mark.functional
+    def test_truncated_log_rebuilt(self, run, general_log): 
+        '''
+        Tests a log truncated and written again is indexed from scratch
+        '''
+        
+        run(["--index", "-i", str(general_log)])
+        general_log.write_text("after truncation 10.1.1.1\n")
+        assert run(["--index", "-i", str(general_log)]) == \
+            "after truncation 10.1.1.1\n"
+
+    @pytest.mark.functional
+    def test_rotated_log_rebuilt(self, run, general_log, tmp_path): 
+        '''
+        Tests a new file moved into place is indexed from scratch, even if 
+            it is larger than the old one
+        '''
+        
+        run(["--index", "-i", str(general_log)])
+        rotated = tmp_path / "new.log"
+        rotated.write_bytes(general_log.read_bytes() + b"\n10.9.9.9 new\n")
+        os.replace(rotated, general_log)
+        expected = run(["-i", "-l", "3", str(general_log)])
+        assert run(["--index", "-i", "-l", "3", str(general_log)]) \
+            == expected
+        assert expected.endswith("10.9.9.9 new\n")
+
+    @pytest.mark.unit
+    def test_rewritten_tail_not_appended(self, general_log): 
+        '''
+        Tests a grown file whose old last line changed is not treated as 
+            appended to
+        '''
+        
+        data = general_log.read_bytes()
+        index = util.LineIndex.build(data, (len(data), 0, 1, 2))
+        changed = data[:-2] + b"XX more\n"
+        assert not index.appended_to(changed, (len(changed), 1, 1, 2))
+        assert not index.appended_to(data[:-5], (len(data) - 5, 1, 1, 2))
+        assert not index.appended_to(data + b"x", (len(data) + 1, 1, 1, 3))
+        assert index.appended_to(data + b"x", (len(data) + 1, 1, 1, 2))
+
+    @pytest.mark.unit
+    def test_rewritten_middle_not_appended(self, general_log): 
+        '''
+        Tests a grown file whose old contents changed before the last line 
+            is not treated as appended to, nor one that changed without 
+            growing
+        '''
+        
+        data = general_log.read_bytes()
+        index = util.LineIndex.build(data, (len(data), 0, 1, 2))
+        changed = data.replace(b"Line 7", b"Line X") + b"\nmore"
+        assert not index.appended_to(changed, (len(changed), 1, 1, 2))
+        assert not index.appended_to(data, (len(data), 1, 1, 2))
+
+    @pytest.mark.functional
+    def test_rewritten_in_place_rebuilt(self, run, tmp_path): 
+        '''
+        Tests a log rewritten in place at the same size and with the same 
+            last line is indexed from scratch
+        '''
+        
+        path = tmp_path / "rewritten.log"
+        path.write_bytes(b"a nothing\nlast line\n")
+        assert run(["--index", "-i", str(path)]) == ""
+        with open(path, "r+b") as file: 
+            file.write(b"b 1.2.3.4")
+        info = os.stat(path)
+        os.utime(path, ns=(info.st_atime_ns, info.st_mtime_ns + 10**9))
+        assert run(["--index", "-i", str(path)]) == "b 1.2.3.4\n"
@@ -52,18 +52,18 @@ class TestPositive:
         )
     
     @pytest.fixture(scope="class")
-    def expected_values_help_option(self, script_name): 
+    def expected_values_help_option(self, usage, script_name): 
         '''
         Returns expected (stdout, stderr) when the -h switch is passed
         '''
         
         return (
             (
-                f"usage: {script_name} [-h] [-f NUM] [-l NUM] [-t] [-i] [-I] "
-                "[FILE]\n\nCLI application to help you parse logs of various "
+                f"{usage}\nCLI application to help you parse logs of various "
                 "kinds\n\npositional arguments:\n  FILE                 log "
-                "file to be parsed\n\noptions:\n  -h, --help           show "
-                "this help message and exit\n  -f NUM, --first NUM  print "
+                "files to be parsed, glob patterns are expanded\n\noptions:"
+                "\n  -h, --help           show this help message and exit"
+                "\n  -f NUM, --first NUM  print "
                 "first NUM lines\n  -l NUM, --last NUM   print last NUM lines"
                 "\n  -t, --timestamps     print lines that contain a "
                 "timestamp in HH:MM:SS format\n  -i, --ipv4           print "
@@ -72,6 +72,80 @@ class TestPositive:
                 "--ipv6           print lines that contain an IPv6 address "
                 "(standard\n                       notation), matching IPs "
                 "are highlighted\n"
+                "  -e RE, --regexp RE   print lines that match the regular "
+                "expression RE\n"
+                "  -k KW, --keyword KW  print lines that contain the keyword "
+                "KW\n"
+                "  --keywords LIST      print lines that contain one of the "
+                "keywords listed one\n                       per line in the "
+                "file LIST\n"
+                "  --ip-in LIST         print lines with an IP in one of the "
+                "addresses or CIDR\n                       networks listed in "
+                "the file LIST\n"
+                "  --ip-not-in LIST     print lines with IPs, none of "
+                "which are in the\n                       addresses or CIDR "
+                "networks listed in the file LIST\n"
+                "  --since HH:MM:SS     print lines timestamped at or after "
+                "HH:MM:SS\n"
+                "  --until HH:MM:SS     print lines timestamped at or before "
+                "HH:MM:SS\n  -F, --follow         keep printing "
+                "lines as they are appended to FILE,\n                       "
+                "following it across rotation and truncation\n"
+                "  -j NUM, --jobs NUM   filter FILE with NUM "
+                "worker processes (0 uses every\n                       CPU)\n"
+                "  --color WHEN         highlight IPs when WHEN is always, "
+                "never, or auto (only\n                       when printing "
+                "to a terminal, the default)\n"
+                "  --stats              print counts, timings, throughput, "
+                "and peak memory for\n                       each stage to "
+                "standard error\n"
+                "  --index              keep an index of FILE's lines in "
+                "FILE.lpidx and use it\n                       while FILE is "
+                "unchanged\n"
+                "  --merge              merge FILEs that are each in time "
+                "order into one stream\n                       ordered by the "
+                "first HH:MM:SS timestamp of each line\n"
+                "  --unordered          print each FILE's lines as soon as "
+                "it has been scanned\n                       instead of in "
+                "argument order\n"
+                "  --top K              print the K most frequent keys in "
+                "matching lines with\n                       their counts, "
+                "instead of the lines\n"
+                "  --by KEY             count ipv4 or ipv6 addresses, or the "
+                "minute of the\n                       first timestamp on "
+                "each line, for --top (ipv4 by\n                       "
+                "default)\n"
+                "  --counters NUM       count approximately for --top with at "
+                "most NUM\n                       counters, printing how far "
+                "off each count can be\n"
+                "  --count-distinct IP  print an estimate of the number of "
+                "distinct IP\n                       addresses, ipv4 or ipv6, "
+                "in matching lines, instead of\n                       the "
+                "lines\n"
+                "  --precision P        estimate --count-distinct with 2**P "
+                "registers, from 4\n                       to 18 (14 by "
+                "default, a standard error of 0.81%)\n"
+                "  --sketch FILE        also count the addresses in the "
+                "sketch saved in FILE by\n                       an earlier "
+                "--count-distinct, and save the combined\n                    "
+                "   sketch to it\n"
+                "  --pipeline           read, filter, and write in separate "
+                "stages joined by\n                       bounded queues, so "
+                "slow reads and writes overlap with\n                       "
+                "filtering, which -j spreads over worker processes (not\n"
+                "                       with -F, --since, --until, or "
+                "--merge)\n"
+                "  --block-size SIZE    bytes --pipeline reads at a time, "
+                "such as 4M (1M by\n                       default)\n"
+                "  --queue-depth NUM    blocks each --pipeline queue holds (4 "
+                "by default)\n"
+                "  --engine ENGINE      filter with the python engine, or the "
+                "numpy engine,\n                       which matches whole "
+                "blocks at once and falls back to\n                       "
+                "python without NumPy (python by default)\n"
+                "  --serve SOCKET       stay running and answer requests from "
+                "client.py on the\n                       Unix socket SOCKET, "
+                "with no other arguments\n"
             ), 
             ""
         )
@@ -145,7 +219,7 @@ class TestPositive:
 
 class TestNegative: 
     @pytest.fixture(scope="class")
-    def expected_values_for_invalid_file(self, script_name): 
+    def expected_values_for_invalid_file(self, usage, script_name): 
         '''
         Returns expected (stdout, stderr) when the file provided as an
             arg cannot be opened
@@ -154,15 +228,14 @@ class TestNegative:
         return (
             "",
             (
-                f"usage: {script_name} [-h] [-f NUM] [-l NUM] [-t] [-i] [-I] "
-                f"[FILE]\n{script_name}: error: argument FILE: can't open '"
+                f"{usage}{script_name}: error: argument FILE: can't open '"
                 f"{INVALID_LOG}': [Errno 2] No such file or directory: '"
                 f"{INVALID_LOG}'\n"
             )
         )
 
     @pytest.fixture(scope="class")
-    def expected_values_for_no_input(self, script_name): 
+    def expected_values_for_no_input(self, usage, script_name): 
         '''
         Returns expected (stdout, stderr) when neither a file nor a pipe
             are provided
@@ -171,14 +244,13 @@ class TestNegative:
         return (
             "", 
             (
-                f"usage: {script_name} [-h] [-f NUM] [-l NUM] [-t] [-i] [-I] "
-                f"[FILE]\n{script_name}: error: A file or standard input must "
+                f"{usage}{script_name}: error: A file or standard input must "
                 "be provided. Try -h for help.\n"
             )
         )
     
     @pytest.fixture(scope="class")
-    def expected_values_for_no_filters_provided(self, script_name): 
+    def expected_values_for_no_filters_provided(self, usage, script_name): 
         '''
         Returns expected (stdout, stderr) when there is valid input data
             but no other arguments
@@ -187,8 +259,7 @@ class TestNegative:
         return (
             "",
             (
-                f"usage: {script_name} [-h] [-f NUM] [-l NUM] [-t] [-i] [-I] "
-                f"[FILE]\n{script_name}: error: At least one argument must be "
+                f"{usage}{script_name}: error: At least one argument must be "
                 "supplied as a filter. Try -h for help.\n"
             )
         )
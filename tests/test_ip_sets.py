@@ -0,0 +1,159 @@
+import pytest
+import gzip
+import io
+import sys
+from .. import util
+
+
+GENERAL_LOG = "testLogs/test_general.log"
+ALLOW_LIST = (
+    "# private networks\n"
+    "10.0.0.0/8\n"
+    "172.16.0.0/12 # includes 172.16.254.1\n"
+    "\n"
+    "192.168.255.0/24\n"
+    "2bc2:2a2d::/32\n"
+)
+
+
+@pytest.fixture
+def allow_list(tmp_path): 
+    '''
+    Returns the path to a list of networks found in the general test log
+    '''
+    
+    path = tmp_path / "allow.txt"
+    path.write_text(ALLOW_LIST)
+    return path
+
+
+def line_numbers(output): 
+    return [int(line.split()[1][:-1]) for line in output.splitlines()]
+
+
+class TestPositive: 
+    @pytest.mark.functional
+    @pytest.mark.parametrize("args,expected", [
+        (["--ip-in"], [2, 3, 5, 9, 13, 14]), 
+        (["--ip-not-in"], [1, 7, 8, 10, 11, 12, 15, 16, 17, 18, 19, 20]), 
+        (["-t", "--ip-in"], [2, 3, 5, 9, 13]), 
+        (["-l", "10", "--ip-in"], [13, 14]), 
+    ])
+    def test_lists(self, run, allow_list, args, expected): 
+        '''
+        Tests --ip-in prints lines with an IP in the list, and --ip-not-in 
+            prints lines with IPs, none of which are in the list
+        '''
+        
+        output = run(args + [str(allow_list), GENERAL_LOG])
+        assert line_numbers(output) == expected
+
+    @pytest.mark.functional
+    def test_lists_combine(self, run, allow_list, tmp_path): 
+        '''
+        Tests several lists are all applied
+        '''
+        
+        block_list = tmp_path / "block.txt"
+        block_list.write_text("192.168.255.255\n")
+        output = run([
+            "--ip-in", str(allow_list), "--ip-not-in", str(block_list), 
+            GENERAL_LOG
+        ])
+        assert line_numbers(output) == [2, 3, 9, 13, 14]
+
+    @pytest.mark.functional
+    def test_other_inputs(self, run, monkeypatch, allow_list, tmp_path): 
+        '''
+        Tests the lists apply to standard input and compressed input
+        '''
+        
+        args = ["--ip-in", str(allow_list)]
+        expected = run(args + [GENERAL_LOG])
+        with open(GENERAL_LOG, "rb") as log: 
+            data = log.read()
+        compressed = tmp_path / "general.log.gz"
+        compressed.write_bytes(gzip.compress(data))
+        assert run(args + [str(compressed)]) == expected
+        monkeypatch.setattr(sys, "stdin", io.StringIO(data.decode()))
+        assert run(args) == expected
+
+    @pytest.mark.unit
+    def test_ranges_are_merged(self): 
+        '''
+        Tests util.IPSet.parse() merges overlapping and adjacent networks, 
+            and addresses are looked up up to the ends of each range
+        '''
+        
+        ip_set = util.IPSet.parse([
+            "10.0.0.0/25\n", "10.0.0.128/25\n", "10.0.0.7\n", "10.0.2.0/24\n", 
+            "::/127\n",
+        ])
+        assert ip_set.ipv4 == (
+            [0x0A000000, 0x0A000200], [0x0A0000FF, 0x0A0002FF])
+        assert ip_set.ipv6 == ([0], [1])
+        assert ip_set.match("at 10.0.0.255 and 10.0.1.0") is True
+        assert ip_set.match("at 10.0.1.0 and 10.0.3.0") is False
+        assert ip_set.match("at 0:0:0:0:0:0:0:1") is True
+        assert ip_set.match("at 0:0:0:0:0:0:0:2") is False
+        assert ip_set.match("no address here") is None
+
+    @pytest.mark.unit
+    def test_compiled_copy(self, monkeypatch, allow_list): 
+        '''
+        Tests the compiled list is saved next to it and used until the 
+            list changes
+        '''
+        
+        ip_set = util.IPSet.load(str(allow_list))
+        compiled = allow_list.with_name("allow.txt" + util.IPSET_SUFFIX)
+        assert compiled.exists()
+        
+        def refuse(*args): 
+            raise AssertionError("list parsed again")
+        
+        with monkeypatch.context() as patch: 
+            patch.setattr(util.IPSet, "parse", classmethod(refuse))
+            cached = util.IPSet.load(str(allow_list))
+        assert list(cached.ipv4[0]) == ip_set.ipv4[0]
+        assert list(cached.ipv4[1]) == ip_set.ipv4[1]
+        assert cached.ipv6 == ip_set.ipv6
+        
+        allow_list.write_text(ALLOW_LIST + "8.8.8.8\n")
+        assert util.IPSet.load(str(allow_list)).match("8.8.8.8") is True
+
+
+class TestNegative: 
+    @pytest.mark.functional
+    def test_missing_list(self, capsys, usage, script_name): 
+        '''
+        Tests error handling when a list can't be opened
+        '''
+        
+        with pytest.raises(SystemExit): 
+            util.main(["--ip-in", "missing.txt", GENERAL_LOG])
+        captured = capsys.readouterr()
+        assert captured.out == ""
+        assert captured.err == (
+            f"{usage}{script_name}: error: argument --ip-in: can't open "
+            "'missing.txt': [Errno 2] No such file or directory: "
+            "'missing.txt'\n"
+        )
+
+    @pytest.mark.functional
+    def test_invalid_entry(self, capsys, usage, script_name, tmp_path): 
+        '''
+        Tests error handling when a list has an entry that isn't an address 
+            or network
+        '''
+        
+        path = tmp_path / "bad.txt"
+        path.write_text("10.0.0.0/8\nexample.com\n")
+        with pytest.raises(SystemExit): 
+            util.main(["--ip-not-in", str(path), GENERAL_LOG])
+        captured = capsys.readouterr()
+        assert captured.err == (
+            f"{usage}{script_name}: error: argument --ip-not-in: '{path}' "
+            "line 2: 'example.com' does not appear to be an IPv4 or IPv6 "
+            "network\n"
+        )
@@ -0,0 +1,163 @@
+import pytest
+import gzip
+import io
+import pathlib
+import re
+from .. import util
+
+
+GENERAL_LOG = "testLogs/test_general.log"
+
+
+def cli_lines(capsys, args): 
+    '''
+    Returns the lines util.py prints for args
+    '''
+    
+    util.main(args)
+    return capsys.readouterr().out.splitlines()
+
+
+def with_flags(args): 
+    '''
+    Returns the iter_matches keyword arguments for the CLI args
+    '''
+    
+    options = util.logParserUtil().parse_cli_args(args + [GENERAL_LOG])
+    return dict(
+        first=options.first, last=options.last, 
+        timestamps=options.timestamps, ipv4=options.ipv4, ipv6=options.ipv6)
+
+
+def sources(): 
+    '''
+    Returns functions that open test_general.log as each kind of source 
+        iter_matches takes, with whether offsets are known
+    '''
+    
+    with open(GENERAL_LOG, "rb") as log: 
+        data = log.read()
+    return [
+        (lambda: GENERAL_LOG, True), 
+        (lambda: pathlib.Path(GENERAL_LOG), True), 
+        (lambda: open(GENERAL_LOG, "rb"), True), 
+        (lambda: io.BytesIO(data), True), 
+        (lambda: io.BytesIO(gzip.compress(data)), True), 
+        (lambda: open(GENERAL_LOG), False), 
+        (lambda: io.StringIO(data.decode()), False), 
+    ]
+
+
+class TestPositive: 
+    @pytest.mark.functional
+    @pytest.mark.parametrize("args", [
+        ["-t"], ["-i"], ["-I"], ["-t", "-i", "-I"], ["-f", "5"], 
+        ["-l", "3"], ["-f", "-4", "-i"], ["-f", "12", "-l", "10", "-I"], 
+        ["-l", "-15", "-t"], ["-f", "0"], 
+    ])
+    @pytest.mark.parametrize("source,has_offsets", sources())
+    def test_same_lines_as_cli(
+            self, capsys, args, source, has_offsets): 
+        '''
+        Tests every kind of source yields the lines util.py prints, with 
+            their numbers and, where known, byte offsets
+        '''
+        
+        with open(GENERAL_LOG, "rb") as log: 
+            data = log.read()
+        matches = list(util.iter_matches(source(), **with_flags(args)))
+        assert [match.line for match in matches] == cli_lines(
+            capsys, args + [GENERAL_LOG])
+        for match in matches: 
+            assert match.line.startswith(f"Line {match.number}: ")
+            if has_offsets: 
+                assert data[match.offset:].startswith(match.line.encode())
+            else: 
+                assert match.offset is None
+    
+    @pytest.mark.functional
+    @pytest.mark.parametrize("flags,patterns", [
+        ({"timestamps": True}, [util.TIMESTAMP_PAT]), 
+        ({"ipv4": True, "ipv6": True}, [util.IPV4_PAT, util.IPV6_PAT]), 
+        ({}, []), 
+    ])
+    def test_spans(self, flags, patterns): 
+        '''
+        Tests spans are the sorted positions of every match the filters 
+            looked for, with no highlighting in the line
+        '''
+        
+        for match in util.iter_matches(GENERAL_LOG, **flags): 
+            expected = sorted(
+                found.span() for pattern in patterns 
+                for found in re.finditer(pattern, match.line))
+            assert match.spans == tuple(expected)
+            assert "\x1b" not in match.line
+    
+    @pytest.mark.functional
+    def test_encoding(self): 
+        '''
+        Tests binary streams in encodings that aren't ASCII-compatible are 
+            decoded before lines are split
+        '''
+        
+        data = "héllo 10.0.0.1\nnothing\n12:00:00 ünïcode\n"
+        matches = list(util.iter_matches(
+            io.BytesIO(data.encode("utf-16")), encoding="utf-16", ipv4=True))
+        assert matches == [util.Match(1, None, "héllo 10.0.0.1", ((6, 14),))]
+    
+    @pytest.mark.functional
+    def test_line_endings(self): 
+        '''
+        Tests lines are yielded without their newline or carriage return
+        '''
+        
+        data = b"a 10.0.0.1\r\nb\r\nc 10.0.0.2"
+        assert [
+            (match.number, match.offset, match.line) 
+            for match in util.iter_matches(io.BytesIO(data), ipv4=True)
+        ] == [(1, 0, "a 10.0.0.1"), (3, 15, "c 10.0.0.2")]
+    
+    @pytest.mark.unit
+    def test_records_are_slotted(self): 
+        '''
+        Tests records are tuples without a __dict__
+        '''
+        
+        match = next(util.iter_matches(GENERAL_LOG, ipv6=True))
+        assert not hasattr(match, "__dict__")
+        number, offset, line, spans = match
+        assert (number, offset) == (5, 146)
+    
+    @pytest.mark.functional
+    def test_stream_left_open(self): 
+        '''
+        Tests a stream passed in is not closed
+        '''
+        
+        with open(GENERAL_LOG, "rb") as log: 
+            assert len(list(util.iter_matches(log, timestamps=True))) == 13
+            assert not log.closed
+
+
+class TestNegative: 
+    @pytest.mark.functional
+    def test_missing_path(self): 
+        '''
+        Tests a path that can't be opened raises OSError
+        '''
+        
+        with pytest.raises(FileNotFoundError): 
+            list(util.iter_matches("missing.log"))
+    
+    @pytest.mark.functional
+    def test_damaged_input(self): 
+        '''
+        Tests damaged compressed input raises DecompressionError
+        '''
+        
+        with open(GENERAL_LOG, "rb") as log: 
+            data = gzip.compress(log.read())[:-30]
+        with pytest.raises(util.DecompressionError) as error: 
+            list(util.iter_matches(io.BytesIO(data)))
+        assert str(error.value).startswith("can't decompress 'input': ")
@@ -0,0 +1,188 @@
+import pytest
+import gzip
+import itertools
+from .. import util
+
+
+HOST_A = (
+    "01:00:00 a1\n"
+    "  trace of a1\n"
+    "03:00:00 a3 10.0.0.1\n"
+    "05:00:00 a5\n"
+)
+HOST_B = (
+    "starting b\n"
+    "02:00:00 b2\n"
+    "03:00:00 b3\n"
+    "  trace of b3\n"
+    "04:00:00 b4 10.0.0.2"
+)
+
+
+@pytest.fixture
+def host_logs(tmp_path): 
+    '''
+    Returns the paths to two logs in time order whose times interleave
+    '''
+    
+    a = tmp_path / "a.log"
+    b = tmp_path / "b.log"
+    a.write_text(HOST_A)
+    b.write_text(HOST_B)
+    return a, b
+
+
+class TestPositive: 
+    @pytest.mark.functional
+    def test_merge(self, run, host_logs): 
+        '''
+        Tests lines are merged by timestamp, lines without one staying 
+            behind the line before them, and ties keeping argument order
+        '''
+        
+        a, b = host_logs
+        assert run(["--merge", str(a), str(b)]) == (
+            f"{b}:starting b\n"
+            f"{a}:01:00:00 a1\n"
+            f"{a}:  trace of a1\n"
+            f"{b}:02:00:00 b2\n"
+            f"{a}:03:00:00 a3 10.0.0.1\n"
+            f"{b}:03:00:00 b3\n"
+            f"{b}:  trace of b3\n"
+            f"{b}:04:00:00 b4 10.0.0.2\n"
+            f"{a}:05:00:00 a5\n"
+        )
+
+    @pytest.mark.functional
+    @pytest.mark.parametrize("args,expected", [
+        (["-i"], ["a:03:00:00 a3 10.0.0.1", "b:04:00:00 b4 10.0.0.2"]), 
+        (["-f", "2"], ["b:starting b", "a:01:00:00 a1"]), 
+        (["-l", "2", "-i"], ["b:04:00:00 b4 10.0.0.2"]), 
+    ])
+    def test_window_and_filters(self, run, host_logs, args, expected): 
+        '''
+        Tests -f, -l, and the filters apply to the merged stream
+        '''
+        
+        a, b = host_logs
+        output = run(["--merge"] + args + [str(a), str(b)])
+        names = {f"{a}:": "a:", f"{b}:": "b:"}
+        for path, name in names.items(): 
+            output = output.replace(path, name)
+        assert output.splitlines() == expected
+
+    @pytest.mark.functional
+    def test_single_file(self, run, host_logs): 
+        '''
+        Tests a single FILE is printed without a prefix
+        '''
+        
+        _, b = host_logs
+        assert run(["--merge", str(b)]) == HOST_B
+
+    @pytest.mark.functional
+    def test_compressed(self, run, host_logs): 
+        '''
+        Tests compressed FILEs can be merged
+        '''
+        
+        a, b = host_logs
+        expected = run(["--merge", str(a), str(b)])
+        compressed = b.with_name("b.log.gz")
+        compressed.write_bytes(gzip.compress(HOST_B.encode()))
+        output = run(["--merge", str(a), str(compressed)])
+        assert output == expected.replace(f"{b}:", f"{compressed}:")
+
+    @pytest.mark.unit
+    def test_timed_records(self): 
+        '''
+        Tests util.logParserUtil.timed_records() groups each line with the 
+            lines without a timestamp after it
+        '''
+        
+        records = util.logParserUtil().timed_records(
+            "a", HOST_B.splitlines(True))
+        assert list(records) == [
+            ("", "a", ["starting b\n"]), 
+            ("02:00:00", "a", ["02:00:00 b2\n"]), 
+            ("03:00:00", "a", ["03:00:00 b3\n", "  trace of b3\n"]), 
+            ("04:00:00", "a", ["04:00:00 b4 10.0.0.2"]), 
+        ]
+
+    @pytest.mark.unit
+    def test_merge_is_lazy(self): 
+        '''
+        Tests records are read one at a time, so endless inputs can be 
+            merged
+        '''
+        
+        parser = util.logParserUtil()
+        
+        def endless(offset): 
+            for second in itertools.count(): 
+                yield f"00:{second // 60 % 60:02}:{second % 60:02} {offset}\n"
+        sources = [
+            parser.timed_records(name, endless(name)) for name in "ab"
+        ]
+        merged = util.heapq.merge(*sources, key=util.itemgetter(0))
+        keys = [key for key, _, _ in itertools.islice(merged, 6)]
+        assert keys == ["00:00:00"] * 2 + ["00:00:01"] * 2 + ["00:00:02"] * 2
+
+
+class TestNegative: 
+    @pytest.mark.functional
+    @pytest.mark.parametrize("option", ["-F/--follow", "--unordered"])
+    def test_exclusive_options(
+            self, capsys, usage, script_name, host_logs, option): 
+        '''
+        Tests error handling when --merge is combined with options that 
+            scan FILEs one at a time
+        '''
+        
+        a, _ = host_logs
+        with pytest.raises(SystemExit): 
+            util.main(["--merge", option.split("/")[-1], str(a)])
+        captured = capsys.readouterr()
+        assert captured.out == ""
+        assert captured.err == (
+            f"{usage}{script_name}: error: argument --merge: not allowed with "
+            f"argument {option}\n"
+        )
+
+    @pytest.mark.functional
+    def test_missing_file(self, capsys, run, script_name, host_logs): 
+        '''
+        Tests a FILE that can't be opened is reported while the others are 
+            still merged, and the exit status shows the failure
+        '''
+        
+        a, b = host_logs
+        missing = a.with_name("missing.log")
+        expected = run(["--merge", str(a), str(b)])
+        with pytest.raises(SystemExit) as exit: 
+            util.main(["--merge", str(a), str(missing), str(b)])
+        assert exit.value.code == 2
+        captured = capsys.readouterr()
+        assert captured.out == expected
+        assert captured.err == (
+            f"{script_name}: can't open '{missing}': [Errno 2] No such file "
+            f"or directory: '{missing}'\n"
+        )
+
+    @pytest.mark.functional
+    def test_corrupt_file(self, capsys, usage, script_name, host_logs): 
+        '''
+        Tests damaged compressed input is reported with its name
+        '''
+        
+        a, b = host_logs
+        broken = b.with_name("broken.log.gz")
+        broken.write_bytes(gzip.compress(HOST_B.encode() * 100)[:-30])
+        with pytest.raises(SystemExit): 
+            util.main(["--merge", str(a), str(broken)])
+        captured = capsys.readouterr()
+        assert captured.err.endswith(
+            f"{script_name}: error: argument FILE: can't decompress "
+            f"'{broken}': Compressed file ended before the end-of-stream "
+            "marker was reached\n"
+        )
@@ -0,0 +1,130 @@
+import pytest
+import io
+import sys
+from .. import util
+
+
+GENERAL_LOG = "testLogs/test_general.log"
+UNICODE_LINES = (
+    "é12:00:00 not a timestamp to str patterns\n"
+    "ü 13:00:00 is a timestamp\n"
+    "1.2.3.4ß 1762:0:0:0:0:B03:1:AF18é\n"
+)
+FILTERS = [["-t"], ["-i"], ["-I"], ["-t", "-i"], ["-i", "-I"], []]
+WINDOWS = [
+    [], ["-f", "4"], ["-f", "-4"], ["-l", "4"], ["-l", "-30"], 
+    ["-f", "12", "-l", "10"], ["-f", "-3", "-l", "8"], ["-f", "3", "-l", "3"],
+]
+# Every filter with every window, leaving out no filter with no window, 
+# which is an error
+SCANS = [
+    (filters, window) for window in WINDOWS for filters in FILTERS 
+    if filters or window
+]
+
+
+@pytest.fixture(params=["plain", "trailing_newline", "unicode"])
+def log_text(request): 
+    '''
+    Returns the text of the general test log with a few variations
+    '''
+    
+    with open(GENERAL_LOG) as log: 
+        text = log.read()
+    if request.param == "trailing_newline": 
+        text += "\n\n"
+    elif request.param == "unicode": 
+        text = UNICODE_LINES + text + "\n" + UNICODE_LINES
+    return text
+
+
+class TestPositive: 
+    @pytest.mark.functional
+    @pytest.mark.parametrize("filters,window", SCANS)
+    def test_file_matches_stdin(
+            self, capsys, monkeypatch, tmp_path, log_text, filters, window): 
+        '''
+        Verifies the memory-mapped scan prints exactly what the line by 
+            line scan of the same text does
+        '''
+        
+        path = tmp_path / "scan.log"
+        path.write_text(log_text, encoding="utf-8")
+        args = filters + window
+
+        util.main(args + [str(path)])
+        from_file = capsys.readouterr()
+        monkeypatch.setattr(sys, "stdin", io.StringIO(log_text))
+        util.main(args)
+        from_stdin = capsys.readouterr()
+        assert from_file.out == from_stdin.out
+        assert from_file.err == from_stdin.err == ""
+
+    @pytest.mark.unit
+    def test_iter_matching_lines(self): 
+        '''
+        Tests util.iter_matching_lines() on a buffer of bytes
+        '''
+        
+        buf = (
+            b"a 12:00:00 1.2.3.4\n"
+            b"b 1.2.3.4\n"
+            b"c 12:00:00\n"
+            b"d 23:59:59 255.255.255.255"
+        )
+        actual = [*util.iter_matching_lines(
+            buf, 0, len(buf), True, True, False)]
+        assert actual == [
+            b"a 12:00:00 1.2.3.4\n", b"d 23:59:59 255.255.255.255"]
+        actual = [*util.iter_matching_lines(
+            buf, 19, len(buf), False, True, False)]
+        assert actual == [b"b 1.2.3.4\n", b"d 23:59:59 255.255.255.255"]
+
+    @pytest.mark.unit
+    def test_iter_matching_lines_non_ascii(self): 
+        '''
+        Verifies non-ASCII neighbours are treated the way the str patterns 
+            treat them
+        '''
+        
+        buf = UNICODE_LINES.encode()
+        actual = [*util.iter_matching_lines(
+            buf, 0, len(buf), True, False, False)]
+        assert actual == [b"\xc3\xbc 13:00:00 is a timestamp\n"]
+        actual = [*util.iter_matching_lines(
+            buf, 0, len(buf), False, True, True)]
+        assert actual == []
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize("first,last", 
+        [(None, None), (3, None), (-3, None), (None, 3), (-2, 5), (4, 8)]
+    )
+    def test_byte_window(self, tmp_path, first, last): 
+        '''
+        Verifies util.byte_window() selects the same lines as 
+            util.calculate_bounds()
+        '''
+        
+        lines = [f"line {i}\n".encode() for i in range(10)]
+        path = tmp_path / "window.log"
+        path.write_bytes(b"".join(lines))
+        with open(path, "rb") as log: 
+            start, stop, _, _ = util.logParserUtil().byte_window(
+                log.fileno(), path.stat().st_size, first, last)
+        boundaries = util.logParserUtil().calculate_bounds(first, last, 10)
+        expected = b"".join(lines[boundaries[0]:boundaries[1]])
+        assert path.read_bytes()[start:stop] == expected
+
+
+class TestNegative: 
+    @pytest.mark.functional
+    def test_carriage_returns_use_text_mode(self, capsys, tmp_path): 
+        '''
+        Verifies files with carriage returns keep text mode line endings
+        '''
+        
+        path = tmp_path / "crlf.log"
+        path.write_bytes(b"a 12:00:00\r\nb\rc 13:00:00\r\n")
+        util.main(["-t", "-l", "2", str(path)])
+        captured = capsys.readouterr()
+        assert captured.out == "c 13:00:00\n"
@@ -0,0 +1,192 @@
+import pytest
+import gzip
+import os
+import tempfile
+from .. import util
+
+
+GENERAL_LOG = "testLogs/test_general.log"
+IPV4_LOG = "testLogs/test_ipv4.log"
+TIMESTAMP_LOG = "testLogs/test_timestamp.log"
+
+
+def prefixed(run, args, path): 
+    '''
+    Returns what util.py prints for args and a single path, with each line
+        prefixed by the path the way several FILEs are printed
+    '''
+    
+    return "".join(
+        f"{path}:{line}\n" for line in run(args + [path]).splitlines())
+
+
+class TestPositive: 
+    @pytest.mark.functional
+    @pytest.mark.parametrize("args", [
+        ["-t"], ["-i"], ["-I"], ["-f", "3"], ["-l", "2", "-t"], 
+        ["-f", "-5", "-l", "9", "-i"], 
+    ])
+    @pytest.mark.parametrize("jobs", ["1", "3"])
+    def test_files_in_argument_order(self, run, args, jobs): 
+        '''
+        Tests each FILE is filtered on its own, with -f and -l applied per
+            file, and printed with its name in argument order
+        '''
+        
+        files = [GENERAL_LOG, IPV4_LOG, TIMESTAMP_LOG, GENERAL_LOG]
+        expected = "".join(prefixed(run, args, path) for path in files)
+        assert run(["-j", jobs] + args + files) == expected
+    
+    @pytest.mark.functional
+    def test_unordered(self, run): 
+        '''
+        Tests --unordered prints every file's lines, each file's lines
+            together and in order
+        '''
+        
+        files = [GENERAL_LOG, IPV4_LOG, TIMESTAMP_LOG]
+        expected = [prefixed(run, ["-t"], path) for path in files]
+        output = run(["-t", "-j", "2", "--unordered"] + files)
+        assert sorted(output.splitlines(True)) == sorted(
+            "".join(expected).splitlines(True))
+        for block in expected: 
+            assert block in output
+    
+    @pytest.mark.functional
+    def test_glob_patterns(self, run): 
+        '''
+        Tests glob patterns are expanded to the matching files in sorted
+            order
+        '''
+        
+        files = [IPV4_LOG, "testLogs/test_ipv6.log"]
+        expected = run(["-i"] + files)
+        assert run(["-i", "testLogs/test_ipv?.log"]) == expected
+        assert run(["-i", "testLogs/test_ipv4*"]) == run(["-i", IPV4_LOG])
+    
+    @pytest.mark.functional
+    def test_compressed_and_plain(self, run, tmp_path): 
+        '''
+        Tests compressed and plain FILEs can be mixed
+        '''
+        
+        path = tmp_path / "general.log.gz"
+        with open(GENERAL_LOG, "rb") as log: 
+            path.write_bytes(gzip.compress(log.read()))
+        expected = prefixed(run, ["-i"], GENERAL_LOG)
+        expected += prefixed(run, ["-i"], str(path))
+        assert run(["-i", GENERAL_LOG, str(path)]) == expected
+        assert str(path) in expected
+    
+    @pytest.mark.functional
+    @pytest.mark.parametrize("jobs", ["1", "2"])
+    def test_spooled_output(self, run, monkeypatch, tmp_path, jobs): 
+        '''
+        Tests output too large to hold in memory is spooled to temporary 
+            files, which are printed in order and removed
+        '''
+        
+        files = [GENERAL_LOG, IPV4_LOG, GENERAL_LOG]
+        expected = "".join(prefixed(run, ["-i"], path) for path in files)
+        spool = tmp_path / "spool"
+        spool.mkdir()
+        monkeypatch.setattr(util, "SPOOL_SIZE", 100)
+        monkeypatch.setattr(tempfile, "tempdir", str(spool))
+        assert run(["-i", "-j", jobs] + files) == expected
+        assert os.listdir(spool) == []
+    
+    @pytest.mark.functional
+    def test_stats_cover_every_file(self, run): 
+        '''
+        Tests --stats counts the lines of every FILE
+        '''
+        
+        collected = []
+        util.logParserUtil(stats_hook=collected.append).run(
+            ["-t", "-j", "2", GENERAL_LOG, GENERAL_LOG])
+        stats, = collected
+        assert stats.lines_read == 40
+        assert stats.stage_counts["timestamp prefilter scan"] == [40, 10]
+
+
+class TestNegative: 
+    @pytest.mark.functional
+    @pytest.mark.parametrize("jobs", ["1", "2"])
+    def test_missing_file(self, capsys, run, script_name, jobs): 
+        '''
+        Tests a FILE that can't be opened is reported while the other 
+            files are still printed, and the exit status shows the failure
+        '''
+        
+        expected = "".join(
+            prefixed(run, ["-t"], path) for path in (GENERAL_LOG, IPV4_LOG))
+        with pytest.raises(SystemExit) as exit: 
+            util.main(["-t", "-j", jobs, GENERAL_LOG, "missing.log", IPV4_LOG])
+        assert exit.value.code == 2
+        captured = capsys.readouterr()
+        assert captured.out == expected
+        assert captured.err == (
+            f"{script_name}: can't open 'missing.log': [Errno 2] No such file "
+            "or directory: 'missing.log'\n"
+        )
+    
+    @pytest.mark.functional
+    def test_missing_single_file(self, capsys, usage, script_name): 
+        '''
+        Tests a single FILE that can't be opened is a usage error
+        '''
+        
+        with pytest.raises(SystemExit): 
+            util.main(["-t", "missing.log"])
+        captured = capsys.readouterr()
+        assert captured.out == ""
+        assert captured.err == (
+            f"{usage}{script_name}: error: argument FILE: can't open "
+            "'missing.log': [Errno 2] No such file or directory: "
+            "'missing.log'\n"
+        )
+    
+    @pytest.mark.functional
+    def test_corrupt_file_among_others(
+            self, capsys, run, script_name, tmp_path): 
+        '''
+        Tests a damaged compressed FILE is reported while the other files
+            are still printed, and the exit status shows the failure
+        '''
+        
+        path = tmp_path / "broken.log.gz"
+        with open(GENERAL_LOG, "rb") as log: 
+            path.write_bytes(gzip.compress(log.read())[:-30])
+        expected = prefixed(run, ["-t"], TIMESTAMP_LOG)
+        with pytest.raises(SystemExit) as exit: 
+            util.main(["-t", str(path), TIMESTAMP_LOG])
+        assert exit.value.code == 2
+        captured = capsys.readouterr()
+        assert captured.out == expected
+        assert captured.err == (
+            f"{script_name}: can't decompress '{path}': Compressed file ended "
+            "before the end-of-stream marker was reached\n"
+        )
+    
+    @pytest.mark.functional
+    @pytest.mark.parametrize("args,message", [
+        (
+            ["-F", GENERAL_LOG, IPV4_LOG], 
+            "argument -F/--follow: not allowed with more than one FILE"
+        ), 
+        (
+            ["-", GENERAL_LOG], 
+            "argument FILE: '-' can't be given with other files"
+        ),  
+    ])
+    def test_invalid_combinations(
+            self, capsys, usage, script_name, args, message): 
+        '''
+        Tests error handling for options that need a single input
+        '''
+        
+        with pytest.raises(SystemExit): 
+            util.main(["-t"] + args)
+        captured = capsys.readouterr()
+        assert captured.out == ""
+        assert captured.err == f"{usage}{script_name}: error: {message}\n"
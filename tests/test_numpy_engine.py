@@ -0,0 +1,189 @@
+import pytest
+import gzip
+import random
+from .. import util
+
+
+GENERAL_LOG = "testLogs/test_general.log"
+IPV4_LOG = "testLogs/test_ipv4.log"
+IPV6_LOG = "testLogs/test_ipv6.log"
+TIMESTAMP_LOG = "testLogs/test_timestamp.log"
+
+FLAGS = [
+    (True, False, False), (False, True, False), (False, False, True), 
+    (True, True, False), (False, True, True), (True, True, True), 
+]
+
+
+def random_log(seed, lines): 
+    '''
+    Returns lines of timestamps and IP addresses, many slightly out of 
+        range or run into letters, non-ASCII characters, and each other
+    '''
+    
+    rand = random.Random(seed)
+    number = rand.randint
+    fields = [
+        lambda: f"{number(0, 29):02}:{number(0, 69):02}:{number(0, 69):02}", 
+        lambda: ".".join(str(number(0, 299)) for _ in range(number(3, 5))), 
+        lambda: ":".join(
+            f"{number(0, 0xfffff):x}"[:number(1, 5)] 
+            for _ in range(number(7, 9))), 
+    ]
+    separators = ["", " ", " ", ".", ":", "a", "_", "-", "é"]
+    return b"\n".join(
+        "".join(
+            rand.choice(fields)() + rand.choice(separators) 
+            for _ in range(number(0, 6))
+        ).encode() 
+        for _ in range(lines)
+    )
+
+
+@pytest.fixture
+def numpy(): 
+    '''
+    Skips tests of the numpy engine where NumPy isn't installed
+    '''
+    
+    return pytest.importorskip("numpy")
+
+
+class TestPositive: 
+    @pytest.mark.unit
+    @pytest.mark.parametrize("flags", FLAGS)
+    @pytest.mark.parametrize("seed", range(5))
+    def test_same_lines_as_regexes(self, numpy, monkeypatch, flags, seed): 
+        '''
+        Tests the numpy engine picks exactly the lines the regexes do, 
+            with lines cut across several blocks
+        '''
+        
+        monkeypatch.setattr(util, "NUMPY_BLOCK_SIZE", 256)
+        data = random_log(seed, 400)
+        expected = b"".join(
+            util.iter_matching_lines(data, 0, len(data), *flags))
+        assert expected
+        assert b"".join(util.iter_matching_runs(
+            data, 0, len(data), *flags, engine="numpy")) == expected
+    
+    @pytest.mark.unit
+    def test_runs(self, numpy): 
+        '''
+        Tests consecutive matching lines are yielded as one run
+        '''
+        
+        data = (
+            b"12:00:00 a\n12:00:01 b\nnone\n1.2.3.4 12:00:02\n12:00:03"
+        )
+        runs = list(util.iter_matching_runs(
+            data, 0, len(data), True, False, False, engine="numpy"))
+        assert runs == [
+            b"12:00:00 a\n12:00:01 b\n", b"1.2.3.4 12:00:02\n12:00:03"
+        ]
+    
+    @pytest.mark.unit
+    @pytest.mark.parametrize("line,flags,matches", [
+        (b"x 23:59:59 y", FLAGS[0], True), 
+        (b"x 24:00:00 y", FLAGS[0], False), 
+        (b"x 12:60:00 y", FLAGS[0], False), 
+        (b"x12:00:00", FLAGS[0], False), 
+        (b"12:00:000", FLAGS[0], False), 
+        (b"255.255.255.255", FLAGS[1], True), 
+        (b"099.1.0.10", FLAGS[1], True), 
+        (b"256.1.1.1", FLAGS[1], False), 
+        (b"1.2.3.4.5", FLAGS[1], True), 
+        (b"1.2.3.4a", FLAGS[1], False), 
+        (b"1.2..3.4", FLAGS[1], False), 
+        (b"fe80:0:0:0:0:0:0:1", FLAGS[2], True), 
+        (b"g1:2:3:4:5:6:7:8", FLAGS[2], False), 
+        (b"1:2:3:4:5:6:7:12345", FLAGS[2], False), 
+        ("é12:00:00".encode(), FLAGS[0], False), 
+        ("é 12:00:00".encode(), FLAGS[0], True), 
+    ])
+    def test_edge_cases(self, numpy, line, flags, matches): 
+        '''
+        Tests word boundaries, octet values, and group widths are matched 
+            like the regexes match them
+        '''
+        
+        runs = list(util.iter_matching_runs(
+            line, 0, len(line), *flags, engine="numpy"))
+        assert runs == ([line] if matches else [])
+    
+    @pytest.mark.functional
+    @pytest.mark.parametrize("args", [
+        ["-t"], ["-i"], ["-I"], ["-t", "-i", "-I"], ["-f", "7", "-i"], 
+        ["-l", "9", "-t"], ["-j", "2", "-t"], 
+    ])
+    @pytest.mark.parametrize("path", [
+        GENERAL_LOG, IPV4_LOG, IPV6_LOG, TIMESTAMP_LOG, 
+    ])
+    def test_same_output(self, numpy, run, args, path): 
+        '''
+        Tests --engine numpy prints what the python engine prints
+        '''
+        
+        expected = run(args + [path])
+        assert run(["--engine", "numpy"] + args + [path]) == expected
+    
+    @pytest.mark.functional
+    @pytest.mark.parametrize("options", [
+        [], ["--pipeline"], ["--pipeline", "-j", "2"], 
+    ])
+    def test_compressed(self, numpy, run, tmp_path, options): 
+        '''
+        Tests the numpy engine filters compressed input and --pipeline 
+            blocks
+        '''
+        
+        path = tmp_path / "log.gz"
+        path.write_bytes(gzip.compress(random_log(7, 2000)))
+        expected = run(["-i", "-t", str(path)])
+        assert run(
+            ["--engine", "numpy", "-i", "-t"] + options + [str(path)]
+        ) == expected
+    
+    @pytest.mark.functional
+    def test_stats(self, numpy, capsys): 
+        '''
+        Tests --stats counts the lines each vector scan rejects
+        '''
+        
+        collected = []
+        util.logParserUtil(stats_hook=collected.append).run(
+            ["--engine", "numpy", "-t", "-i", GENERAL_LOG])
+        capsys.readouterr()
+        stats, = collected
+        counts = stats.stage_counts
+        assert counts["timestamp vector scan"][0] == 20
+        assert counts["ipv4 vector scan"][0] == (
+            20 - counts["timestamp vector scan"][1])
+    
+    @pytest.mark.functional
+    def test_fallback_without_numpy(self, run, monkeypatch): 
+        '''
+        Tests --engine numpy falls back to the python engine without NumPy
+        '''
+        
+        expected = run(["-t", "-i", GENERAL_LOG])
+        monkeypatch.setattr(util, "numpy", None)
+        output = run(["--engine", "numpy", "-t", "-i", GENERAL_LOG])
+        assert output == expected
+
+
+class TestNegative: 
+    @pytest.mark.functional
+    def test_invalid_engine(self, capsys, usage, script_name): 
+        '''
+        Tests error handling for an unknown engine
+        '''
+        
+        with pytest.raises(SystemExit): 
+            util.main(["--engine", "fast", "-t", GENERAL_LOG])
+        captured = capsys.readouterr()
+        assert captured.out == ""
+        assert captured.err == (
+            f"{usage}{script_name}: error: argument --engine: invalid choice: "
+            "'fast' (choose from 'python', 'numpy')\n"
+        )
@@ -0,0 +1,143 @@
+import pytest
+import io
+import os
+import subprocess
+import sys
+from .. import util
+
+
+IPV4_LOG = "testLogs/test_ipv4.log"
+UTIL = os.path.join(os.path.dirname(__file__), os.pardir, "util.py")
+
+
+class FakeTerminal(io.TextIOWrapper): 
+    '''
+    Text stream over a BytesIO that claims to be a terminal
+    '''
+
+    def __init__(self): 
+        super().__init__(io.BytesIO(), encoding="utf-8")
+
+    def isatty(self): 
+        return True
+
+
+class TestPositive: 
+    @pytest.mark.functional
+    @pytest.mark.parametrize("extra_args", [[], ["-j", "2"], ["-l", "3"]])
+    def test_color_always(self, capsys, monkeypatch, extra_args): 
+        '''
+        Verifies --color=always highlights IPs even when stdout is not a 
+            terminal
+        '''
+        
+        monkeypatch.setattr(util, "MIN_CHUNK_SIZE", 16)
+        util.main(["-i", "--color=always"] + extra_args + [IPV4_LOG])
+        captured = capsys.readouterr()
+        assert "\x1b[42m86.115.8.11\x1b[0m" in captured.out
+        assert captured.err == ""
+
+    @pytest.mark.functional
+    def test_color_always_from_stdin(self, capsys, monkeypatch): 
+        '''
+        Verifies --color=always highlights IPs read from stdin
+        '''
+        
+        with open(IPV4_LOG) as log: 
+            monkeypatch.setattr(sys, "stdin", io.StringIO(log.read()))
+        util.main(["-i", "--color", "always"])
+        captured = capsys.readouterr()
+        assert captured.out.startswith(
+            "Line 1 \x1b[42m192.168.255.0\x1b[0m valid\n")
+
+    @pytest.mark.functional
+    @pytest.mark.parametrize("color", ["auto", "never"])
+    def test_no_color_when_piped(self, capsys, color): 
+        '''
+        Verifies IPs are not highlighted when stdout is not a terminal
+        '''
+        
+        util.main(["-i", "--color", color, IPV4_LOG])
+        captured = capsys.readouterr()
+        assert "\x1b" not in captured.out
+
+    @pytest.mark.unit
+    def test_writer_buffers_until_full(self): 
+        '''
+        Tests util.OutputWriter batches writes into large blocks
+        '''
+        
+        stream = io.TextIOWrapper(io.BytesIO(), encoding="utf-8")
+        writer = util.OutputWriter(stream, buffer_size=16)
+        writer.write("0123456789")
+        assert stream.buffer.getvalue() == b""
+        writer.write(b"abcdef")
+        assert stream.buffer.getvalue() == b"0123456789abcdef"
+        writer.write("é")
+        writer.flush()
+        assert stream.buffer.getvalue() == "0123456789abcdefé".encode()
+
+    @pytest.mark.unit
+    def test_writer_on_a_terminal(self): 
+        '''
+        Tests util.OutputWriter colors and flushes every write on a 
+            terminal
+        '''
+        
+        stream = FakeTerminal()
+        writer = util.OutputWriter(stream)
+        assert writer.color
+        writer.write("line\n")
+        assert stream.buffer.getvalue() == b"line\n"
+        assert not util.OutputWriter(stream, "never").color
+
+    @pytest.mark.unit
+    def test_writer_without_binary_layer(self): 
+        '''
+        Tests util.OutputWriter with a stream that only accepts text
+        '''
+        
+        stream = io.StringIO()
+        writer = util.OutputWriter(stream)
+        writer.write(b"bytes ")
+        writer.write("text")
+        writer.flush()
+        assert stream.getvalue() == "bytes text"
+
+    @pytest.mark.functional
+    @pytest.mark.parametrize("source", ["file", "stdin"])
+    def test_broken_pipe(self, tmp_path, source): 
+        '''
+        Verifies that closing the pipe early, as head does, does not 
+            print a traceback
+        '''
+        
+        path = tmp_path / "long.log"
+        path.write_text("12:00:00 line\n" * 200000)
+        with open(path) as log: 
+            reader = subprocess.Popen(
+                [sys.executable, UTIL, "-t"] 
+                + ([str(path)] if source == "file" else []), 
+                stdin=log, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            reader.stdout.readline()
+            reader.stdout.close()
+            _, stderr = reader.communicate()
+        assert stderr == b""
+        assert reader.returncode == 1
+
+
+class TestNegative: 
+    @pytest.mark.functional
+    def test_invalid_color(self, capsys, usage, script_name): 
+        '''
+        Tests error handling when --color is given an unknown value
+        '''
+        
+        with pytest.raises(SystemExit): 
+            util.main(["-i", "--color", "sometimes", IPV4_LOG])
+        captured = capsys.readouterr()
+        assert captured.out == ""
+        assert captured.err == (
+            f"{usage}{script_name}: error: argument --color: invalid choice: "
+            "'sometimes' (choose from 'auto', 'always', 'never')\n"
+        )
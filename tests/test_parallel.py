@@ -0,0 +1,95 @@
+import pytest
+from .. import util
+
+
+GENERAL_LOG = "testLogs/test_general.log"
+
+
+@pytest.fixture
+def large_log(tmp_path): 
+    '''
+    Returns the path to a log made of many copies of the general test log
+    '''
+    
+    with open(GENERAL_LOG) as log: 
+        text = log.read()
+    path = tmp_path / "large.log"
+    path.write_text("\n".join([text] * 50), encoding="utf-8")
+    return path
+
+
+class TestPositive: 
+    @pytest.mark.functional
+    @pytest.mark.parametrize("filters", 
+        [["-t"], ["-i"], ["-I"], ["-t", "-i", "-I"]]
+    )
+    @pytest.mark.parametrize("window", 
+        [[], ["-f", "300"], ["-l", "500"], ["-f", "-100", "-l", "700"]]
+    )
+    def test_jobs_match_serial_output(
+            self, capsys, monkeypatch, large_log, filters, window): 
+        '''
+        Verifies --jobs prints the same lines in the same order as a serial 
+            scan of the same file
+        '''
+        
+        monkeypatch.setattr(util, "MIN_CHUNK_SIZE", 256)
+        args = filters + window + [str(large_log)]
+        util.main(args)
+        serial = capsys.readouterr()
+        util.main(["--jobs", "4"] + args)
+        parallel = capsys.readouterr()
+        assert parallel.out == serial.out
+        assert parallel.err == serial.err == ""
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize("start,stop", [(0, 1000), (37, 1000), (0, 999)])
+    def test_split_at_newlines(self, monkeypatch, start, stop): 
+        '''
+        Tests util.split_at_newlines() covers the range without gaps and 
+            only splits after newlines
+        '''
+        
+        monkeypatch.setattr(util, "MIN_CHUNK_SIZE", 16)
+        buf = b"".join(b"x" * (i % 13) + b"\n" for i in range(1000))[:1000]
+        chunks = util.logParserUtil().split_at_newlines(buf, start, stop, 4)
+        assert chunks[0][0] == start
+        assert chunks[-1][1] == stop
+        for (_, end), (next_start, _) in zip(chunks, chunks[1:]): 
+            assert end == next_start
+            assert buf[end - 1:end] == b"\n"
+
+    @pytest.mark.unit
+    def test_scan_chunk(self, large_log): 
+        '''
+        Tests util.scan_chunk() returns bytes, or text when highlighting
+        '''
+        
+        size = large_log.stat().st_size
+        matches, counts = util.scan_chunk(
+            str(large_log), 0, size, True, False, False)
+        assert isinstance(matches, bytes)
+        assert len(matches.splitlines()) == 50 * 13
+        assert counts is None
+        matches, counts = util.scan_chunk(
+            str(large_log), 0, size, False, False, True, True, True)
+        assert isinstance(matches, str)
+        assert "\x1b[42m" in matches
+        assert counts["ipv6 prefilter scan"] == [50 * 20, 50 * 7]
+
+
+class TestNegative: 
+    @pytest.mark.functional
+    def test_negative_jobs(self, capsys, usage, script_name): 
+        '''
+        Tests error handling when --jobs is given a negative value
+        '''
+        
+        with pytest.raises(SystemExit): 
+            util.main(["-t", "-j", "-2", GENERAL_LOG])
+        captured = capsys.readouterr()
+        assert captured.out == ""
+        assert captured.err == (
+            f"{usage}{script_name}: error: argument -j/--jobs: NUM must be 0 "
+            "or more\n"
+        )
@@ -0,0 +1,193 @@
+import pytest
+import gzip
+import io
+import random
+import re
+import sys
+from .. import util
+
+
+GENERAL_LOG = "testLogs/test_general.log"
+
+
+def line_numbers(output): 
+    return [int(line.split()[1][:-1]) for line in output.splitlines()]
+
+
+class TestPositive: 
+    @pytest.mark.functional
+    @pytest.mark.parametrize("args,expected", [
+        (["-k", "invalid"], [1, 4, 6, 7, 8, 11]), 
+        (["-e", r"\b200\b"], [13, 14]), 
+        (["-e", r"(\d\d):\1:\1"], [6, 9, 11, 12]), 
+        (["-k", "abcd", "-e", r"\b200\b"], [13, 14, 15]), 
+        (["-t", "-k", "invalid"], [4, 6]), 
+        (["-i", "-e", "^Line 1"], [1, 12, 13, 14, 15, 16, 17, 18]), 
+    ])
+    def test_patterns(self, run, args, expected): 
+        '''
+        Tests lines matching any -e regex or containing any -k keyword are 
+            printed, if they pass the other filters as well
+        '''
+        
+        output = run(args + [GENERAL_LOG])
+        assert line_numbers(output) == expected
+
+    @pytest.mark.functional
+    def test_keyword_list(self, run, tmp_path): 
+        '''
+        Tests the keywords listed in a --keywords file are added to those 
+            given with -k
+        '''
+        
+        path = tmp_path / "keywords.txt"
+        path.write_text("abcd\n\n234.098\r\n")
+        output = run(["-k", "invalid", "--keywords", str(path), 
+            GENERAL_LOG])
+        assert line_numbers(output) == [1, 4, 6, 7, 8, 11, 13, 14, 15]
+
+    @pytest.mark.functional
+    @pytest.mark.parametrize("options", [
+        [], ["-j", "2"], ["--pipeline"], ["--engine", "numpy"], ["--index"], 
+    ])
+    def test_other_inputs(self, run, monkeypatch, tmp_path, options): 
+        '''
+        Tests the patterns apply to standard input, compressed input, and 
+            every way of scanning a file
+        '''
+        
+        args = ["-k", "invalid", "-e", r"\b200\b"]
+        expected = run(args + [GENERAL_LOG])
+        assert line_numbers(expected) == [1, 4, 6, 7, 8, 11, 13, 14]
+        with open(GENERAL_LOG, "rb") as log: 
+            data = log.read()
+        log = tmp_path / "general.log"
+        log.write_bytes(data)
+        assert run(args + options + [str(log)]) == expected
+        compressed = tmp_path / "general.log.gz"
+        compressed.write_bytes(gzip.compress(data))
+        assert run(args + options + [str(compressed)]) == expected
+        monkeypatch.setattr(sys, "stdin", io.StringIO(data.decode()))
+        assert run(args + options) == expected
+
+    @pytest.mark.functional
+    def test_stats_rows(self, capsys): 
+        '''
+        Tests --stats counts the lines matched by each regex and keyword
+        '''
+        
+        util.main([
+            "-k", "invalid", "-e", r"\b200\b", "-k", "missing", "--stats", 
+            GENERAL_LOG
+        ])
+        rows = [line.split() for line in capsys.readouterr().err.splitlines()]
+        assert ["pattern", "scan", "20", "12"] in rows
+        assert ["-k", "invalid", "20", "14"] in rows
+        assert ["-e", r"\b200\b", "20", "18"] in rows
+        assert not any(row[:2] == ["-k", "missing"] for row in rows)
+
+    @pytest.mark.unit
+    def test_automaton(self): 
+        '''
+        Tests util.KeywordAutomaton finds the same lines as a regex 
+            alternation, with keywords that overlap and contain one another
+        '''
+        
+        automaton = util.KeywordAutomaton(["he", "she", "his", "hers"])
+        assert automaton.search("ushers") == "she"
+        assert automaton.search("ahishe") == "his"
+        assert automaton.search("hhs sh") is None
+        
+        rng = random.Random(5)
+        keywords = [
+            "".join(rng.choices("abc.:", k=rng.randint(1, 8))) 
+            for _ in range(2000)
+        ]
+        keywords = [keyword for keyword in keywords if len(keyword) > 3]
+        automaton = util.KeywordAutomaton(keywords)
+        alternation = re.compile("|".join(map(re.escape, keywords)))
+        for _ in range(2000): 
+            line = "".join(rng.choices("abcd.:", k=rng.randint(0, 40)))
+            found = automaton.search(line)
+            assert (found is None) == (alternation.search(line) is None)
+            assert found is None or found in line
+
+    @pytest.mark.unit
+    def test_pattern_set(self): 
+        '''
+        Tests util.PatternSet labels the filter that matched, whether 
+            keywords are joined into the alternation or matched with an 
+            automaton
+        '''
+        
+        keywords = [f"key{number}" for number in range(100)]
+        for count in (2, util.AUTOMATON_MIN_KEYWORDS, 100): 
+            patterns = util.PatternSet([r"\d{4}", r"(x)\1"], keywords[:count])
+            assert (patterns.automaton is None) == (
+                count < util.AUTOMATON_MIN_KEYWORDS)
+            assert patterns.search("a 2024 b") == r"-e \d{4}"
+            assert patterns.search("a xx b") == r"-e (x)\1"
+            assert patterns.search("a key1 b") == "-k key1"
+            assert patterns.search("a key b") is None
+
+
+class TestNegative: 
+    @pytest.mark.functional
+    def test_invalid_regex(self, capsys, usage, script_name): 
+        '''
+        Tests error handling when an -e regex doesn't compile
+        '''
+        
+        with pytest.raises(SystemExit): 
+            util.main(["-e", "(", GENERAL_LOG])
+        captured = capsys.readouterr()
+        assert captured.out == ""
+        assert captured.err == (
+            f"{usage}{script_name}: error: argument -e/--regexp: invalid "
+            "pattern '(': missing ), unterminated subpattern at position 0\n"
+        )
+
+    @pytest.mark.functional
+    def test_empty_keyword(self, capsys, usage, script_name): 
+        '''
+        Tests error handling when a -k keyword is empty
+        '''
+        
+        with pytest.raises(SystemExit): 
+            util.main(["-k", "", GENERAL_LOG])
+        captured = capsys.readouterr()
+        assert captured.err == (
+            f"{usage}{script_name}: error: argument -k/--keyword: KW can't be "
+            "empty\n"
+        )
+
+    @pytest.mark.functional
+    def test_missing_list(self, capsys, usage, script_name): 
+        '''
+        Tests error handling when a --keywords list can't be opened
+        '''
+        
+        with pytest.raises(SystemExit): 
+            util.main(["--keywords", "missing.txt", GENERAL_LOG])
+        captured = capsys.readouterr()
+        assert captured.err == (
+            f"{usage}{script_name}: error: argument --keywords: can't open "
+            "'missing.txt': [Errno 2] No such file or directory: "
+            "'missing.txt'\n"
+        )
+
+    @pytest.mark.functional
+    def test_empty_list(self, capsys, usage, script_name, tmp_path): 
+        '''
+        Tests error handling when a --keywords list has only blank lines
+        '''
+        
+        path = tmp_path / "keywords.txt"
+        path.write_text("\n\r\n")
+        with pytest.raises(SystemExit): 
+            util.main(["--keywords", str(path), GENERAL_LOG])
+        captured = capsys.readouterr()
+        assert captured.err == (
+            f"{usage}{script_name}: error: argument --keywords: '{path}' "
+            "lists no keywords\n"
+        )
@@ -0,0 +1,294 @@
+import pytest
+import argparse
+import gzip
+import io
+import os
+import subprocess
+import sys
+from .. import util
+from ..benchmarks import benchmark
+
+
+UTIL = os.path.join(os.path.dirname(util.__file__), "util.py")
+GENERAL_LOG = "testLogs/test_general.log"
+IPV4_LOG = "testLogs/test_ipv4.log"
+IPV6_LOG = "testLogs/test_ipv6.log"
+TIMESTAMP_LOG = "testLogs/test_timestamp.log"
+
+
+@pytest.fixture(scope="module")
+def long_log(tmp_path_factory): 
+    '''
+    Returns the path of a log of a few thousand lines, long enough to be 
+        read in many small blocks
+    '''
+    
+    with open(GENERAL_LOG) as log: 
+        lines = log.read().splitlines(True)
+    path = tmp_path_factory.mktemp("pipeline") / "long.log"
+    path.write_text("\n".join(
+        f"{n} {line.rstrip()}" for n in range(300) for line in lines))
+    return str(path)
+
+
+class TestPositive: 
+    @pytest.mark.functional
+    @pytest.mark.parametrize("args", [
+        ["-t"], ["-i"], ["-I"], ["-t", "-i"], ["-i", "-I"], 
+    ])
+    @pytest.mark.parametrize("path", [
+        GENERAL_LOG, IPV4_LOG, IPV6_LOG, TIMESTAMP_LOG, 
+    ])
+    def test_same_output(self, run, args, path): 
+        '''
+        Tests --pipeline prints what a plain scan prints
+        '''
+        
+        expected = run(args + [path])
+        assert run(["--pipeline"] + args + [path]) == expected
+    
+    @pytest.mark.functional
+    @pytest.mark.parametrize("options", [
+        ["--block-size", "1"], ["--block-size", "100"], 
+        ["--block-size", "1k", "--queue-depth", "1"], 
+        ["-j", "2", "--block-size", "512"], 
+        ["-j", "3", "--block-size", "2K", "--queue-depth", "2"], 
+    ])
+    def test_block_sizes_and_jobs(self, run, long_log, options): 
+        '''
+        Tests lines cut across blocks are filtered whole, and blocks 
+            filtered by several threads are printed in input order
+        '''
+        
+        expected = run(["-t", "-i", long_log])
+        output = run(["--pipeline", "-t", "-i"] + options + [long_log])
+        assert output == expected
+    
+    @pytest.mark.functional
+    @pytest.mark.parametrize("jobs", ["1", "2"])
+    def test_compressed(self, run, tmp_path, long_log, jobs): 
+        '''
+        Tests compressed input is decompressed by the reader stage
+        '''
+        
+        path = tmp_path / "long.log.gz"
+        with open(long_log, "rb") as log: 
+            path.write_bytes(gzip.compress(log.read()))
+        expected = run(["-i", long_log])
+        assert run([
+            "--pipeline", "-i", "-j", jobs, "--block-size", "4k", str(path)
+        ]) == expected
+    
+    @pytest.mark.functional
+    @pytest.mark.parametrize("jobs", ["1", "2"])
+    def test_highlighted(self, run, jobs): 
+        '''
+        Tests matching IPs are highlighted the same way with --pipeline
+        '''
+        
+        args = ["-i", "-I", "--color", "always", GENERAL_LOG]
+        expected = run(args)
+        assert "\033[" in expected
+        assert run(["--pipeline", "-j", jobs] + args) == expected
+    
+    @pytest.mark.functional
+    def test_counters(self, run, long_log): 
+        '''
+        Tests --top counts the lines --pipeline filters
+        '''
+        
+        args = ["-i", "--top", "3", long_log]
+        assert run(["--pipeline"] + args) == run(args)
+    
+    @pytest.mark.functional
+    def test_text_input(self, run, monkeypatch): 
+        '''
+        Tests input that can only be read as text is cut into blocks of 
+            characters
+        '''
+        
+        with open(GENERAL_LOG) as log: 
+            monkeypatch.setattr(sys, "stdin", io.StringIO(log.read()))
+        expected = run(["-i", GENERAL_LOG])
+        assert run(["--pipeline", "-i", "--block-size", "64"]) == (
+            expected)
+    
+    @pytest.mark.functional
+    def test_worker_processes_exit(self, run): 
+        '''
+        Tests the worker processes of --pipeline -j filtering standard 
+            input are shut down cleanly, so the run exits without errors
+        '''
+        
+        expected = run(["-i", GENERAL_LOG]).encode()
+        with open(GENERAL_LOG, "rb") as log: 
+            data = log.read()
+        for _ in range(10): 
+            result = subprocess.run(
+                [sys.executable, UTIL, "--pipeline", "-j", "2", 
+                    "--block-size", "16", "-i"], 
+                input=data, capture_output=True, timeout=60)
+            assert result.stderr == b""
+            assert result.returncode == 0
+            assert result.stdout == expected
+    
+    @pytest.mark.functional
+    @pytest.mark.parametrize("window", [
+        ["-f", "7"], ["-f", "-7"], ["-l", "7"], ["-l", "-7"], 
+        ["-f", "4000", "-l", "30"], ["-f", "-30", "-l", "4000"], 
+        ["-f", "0"], 
+    ])
+    @pytest.mark.parametrize("options", [
+        ["--block-size", "100"], ["-j", "2", "--block-size", "1k"], 
+    ])
+    def test_first_and_last(self, run, long_log, window, options): 
+        '''
+        Tests -f and -l pick the same lines as a plain scan, whichever 
+            blocks they fall in
+        '''
+        
+        expected = run(window + ["-i", long_log])
+        assert run(["--pipeline"] + options + window + ["-i", long_log]) == (
+            expected)
+    
+    @pytest.mark.functional
+    def test_stats(self, capsys, long_log): 
+        '''
+        Tests --stats counts every line and shows each queue's depth and 
+            the blocks that passed through it
+        '''
+        
+        collected = []
+        util.logParserUtil(stats_hook=collected.append).run([
+            "--pipeline", "-t", "--block-size", "4k", "--queue-depth", "3", 
+            "-j", "2", long_log
+        ])
+        capsys.readouterr()
+        stats, = collected
+        assert stats.lines_read == 6000
+        assert stats.stage_counts["timestamp prefilter scan"][0] == 6000
+        assert "timestamp prefilter" not in stats.stage_counts
+        for name in ("read -> filter", "filter -> write"): 
+            depth, peak, blocks, _, _ = stats.queues[name]
+            assert depth == 3
+            assert 1 <= peak <= 3
+            assert blocks > 1
+        assert stats.queues["read -> filter"][2] == stats.queues[
+            "filter -> write"][2]
+    
+    @pytest.mark.functional
+    def test_stats_report(self, capsys): 
+        '''
+        Tests --stats prints a row for each queue
+        '''
+        
+        util.main(["--pipeline", "-t", "--stats", GENERAL_LOG])
+        err = capsys.readouterr().err
+        assert "queue" in err
+        assert "read -> filter" in err
+        assert "filter -> write" in err
+    
+    @pytest.mark.unit
+    @pytest.mark.parametrize("text,expected", [
+        ("1", 1), ("512", 512), ("4k", 4096), ("4K", 4096), 
+        ("1M", 1 << 20), ("2g", 2 << 30), ("1.5MB", 1536 << 10), 
+        ("0.5k", 512), 
+    ])
+    def test_parse_size(self, text, expected): 
+        '''
+        Tests sizes are read with optional K, M, and G suffixes, the same 
+            way as by the benchmark suite
+        '''
+        
+        assert util.parse_size(text) == expected
+        assert benchmark.parse_size(text) == expected
+
+
+class TestNegative: 
+    @pytest.mark.functional
+    @pytest.mark.parametrize("args,message", [
+        (
+            ["--pipeline", "-F"], 
+            "argument --pipeline: not allowed with argument -F/--follow"
+        ), 
+        (
+            ["--pipeline", "--since", "12:00:00"], 
+            "argument --pipeline: not allowed with argument --since"
+        ), 
+        (
+            ["--block-size", "4M"], 
+            "argument --block-size: not allowed without argument --pipeline"
+        ), 
+        (
+            ["--queue-depth", "2"], 
+            "argument --queue-depth: not allowed without argument --pipeline"
+        ), 
+        (
+            ["--pipeline", "--queue-depth", "0"], 
+            "argument --queue-depth: NUM must be 1 or more"
+        ), 
+        (
+            ["--pipeline", "--block-size", "0"], 
+            "argument --block-size: invalid size: '0'"
+        ), 
+        (
+            ["--pipeline", "--block-size", "0.1"], 
+            "argument --block-size: invalid size: '0.1'"
+        ), 
+        (
+            ["--pipeline", "--block-size", "4X"], 
+            "argument --block-size: invalid size: '4X'"
+        ), 
+    ])
+    def test_invalid_options(self, capsys, usage, script_name, args, message): 
+        '''
+        Tests error handling for --pipeline and its options
+        '''
+        
+        with pytest.raises(SystemExit): 
+            util.main(["-t"] + args + [GENERAL_LOG])
+        captured = capsys.readouterr()
+        assert captured.out == ""
+        assert captured.err == f"{usage}{script_name}: error: {message}\n"
+    
+    @pytest.mark.functional
+    def test_damaged_compressed_input(
+            self, capsys, usage, script_name, tmp_path): 
+        '''
+        Tests decompression errors in the reader stage are reported
+        '''
+        
+        path = tmp_path / "broken.log.gz"
+        with open(GENERAL_LOG, "rb") as log: 
+            path.write_bytes(gzip.compress(log.read())[:-30])
+        with pytest.raises(SystemExit): 
+            util.main(["--pipeline", "-t", str(path)])
+        assert capsys.readouterr().err == (
+            f"{usage}{script_name}: error: argument FILE: can't decompress "
+            f"'{path}': Compressed file ended before the end-of-stream "
+            "marker was reached\n"
+        )
+    
+    @pytest.mark.unit
+    def test_failed_write(self): 
+        '''
+        Tests an error writing the output stops the other stages and is 
+            raised
+        '''
+        
+        class FailingWriter: 
+            binary, encoding = True, "utf-8"
+            
+            def write(self, data): 
+                raise BrokenPipeError
+        
+        parser = util.logParserUtil()
+        parser.writer = FailingWriter()
+        parser.highlight, parser.stats = False, None
+        args = argparse.Namespace(
+            timestamps=False, ipv4=True, ipv6=False, ip_sets=[], 
+            patterns=None, first=None, last=None, 
+            jobs=2, block_size=16, queue_depth=1, engine="python", 
+            file=open(IPV4_LOG))
+        with args.file, pytest.raises(BrokenPipeError): 
+            parser.scan_pipeline(args, args.file)
@@ -0,0 +1,100 @@
+import pytest
+import argparse
+import glob
+import io
+import re
+import sys
+from .. import util
+
+
+GENERAL_LOG = "testLogs/test_general.log"
+
+
+def all_test_log_lines(): 
+    '''
+    Returns every line of every test log
+    '''
+    
+    lines = []
+    for path in sorted(glob.glob("testLogs/*.log")): 
+        with open(path) as log: 
+            lines += log.readlines()
+    return lines
+
+
+class TestPositive: 
+    @pytest.mark.unit
+    def test_prefilters_never_reject_a_match(self): 
+        '''
+        Verifies each prefilter is a necessary condition for its pattern
+        '''
+        
+        stages = util.build_filter_stages(True, True, True)
+        prefilters = {
+            stage.name.split()[0]: stage.check 
+            for stage in stages if stage.prefilter
+        }
+        lines = all_test_log_lines() + [
+            "1.2.3.4", "a:b:c:d:e:f:0:1", "00:00:00"]
+        for kind, pattern in util.PATTERNS.items(): 
+            for line in lines: 
+                if re.search(pattern, line): 
+                    assert prefilters[kind](line), (kind, line)
+                    assert re.search(
+                        util.PREFILTER_PATS[kind], line.encode()), (kind, line)
+
+    @pytest.mark.unit
+    def test_prefilters_run_first(self): 
+        '''
+        Verifies prefilters are ordered ahead of every regex stage
+        '''
+        
+        stages = util.build_filter_stages(True, True, True)
+        prefilters = [stage.prefilter for stage in stages]
+        assert prefilters == [True] * 3 + [False] * 3
+
+    @pytest.mark.unit
+    def test_selective_stages_move_forward(self, monkeypatch): 
+        '''
+        Verifies the stage that rejects the most lines is moved to the 
+            front when the stages are reordered
+        '''
+        
+        monkeypatch.setattr(util, "REORDER_INTERVAL", 10)
+        parser = util.logParserUtil()
+        line_filter = parser.build_line_filter(
+            argparse.Namespace(timestamps=True, ipv4=True, ipv6=False))
+        for _ in range(20): 
+            line_filter("12:00:00 no address here\n")
+        assert parser.filter_stages[0].name == "ipv4 prefilter"
+        assert sum(stage.rejected for stage in parser.filter_stages) == 20
+
+    @pytest.mark.functional
+    def test_stats_from_stdin(self, capsys, monkeypatch): 
+        '''
+        Tests --stats with input read one line at a time
+        '''
+        
+        with open(GENERAL_LOG) as log: 
+            monkeypatch.setattr(sys, "stdin", io.StringIO(log.read()))
+        util.main(["-t", "--stats"])
+        captured = capsys.readouterr()
+        assert captured.err.startswith(
+            "stage                     checked      rejected\n"
+            "timestamp prefilter            20             0\n"
+            "timestamp regex                20             7\n"
+        )
+
+    @pytest.mark.functional
+    def test_stats_from_file(self, capsys): 
+        '''
+        Tests --stats with a memory-mapped file
+        '''
+        
+        util.main(["-I", "-i", "--stats", GENERAL_LOG])
+        captured = capsys.readouterr()
+        assert captured.err.startswith(
+            "stage                     checked      rejected\n"
+            "ipv4 prefilter scan            20             7\n"
+            "ipv4/ipv6 regex                13             5\n"
+        )
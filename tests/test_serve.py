@@ -0,0 +1,170 @@
+import pytest
+import os
+import socket
+import subprocess
+import sys
+import time
+from .. import util
+
+
+UTIL = os.path.join(os.path.dirname(util.__file__), "util.py")
+CLIENT = os.path.join(os.path.dirname(util.__file__), "client.py")
+GENERAL_LOG = "testLogs/test_general.log"
+IPV4_LOG = "testLogs/test_ipv4.log"
+
+
+def start_server(path): 
+    '''
+    Returns a util.py --serve process listening on path
+    '''
+    
+    server = subprocess.Popen([sys.executable, UTIL, "--serve", path])
+    for _ in range(200): 
+        with socket.socket(socket.AF_UNIX) as probe: 
+            try: 
+                probe.connect(path)
+                return server
+            except OSError: 
+                time.sleep(0.05)
+    server.kill()
+    raise RuntimeError("the server didn't start")
+
+
+def run(command, args, stdin=None): 
+    '''
+    Returns (stdout, stderr, status) of a command run with args
+    '''
+    
+    result = subprocess.run(
+        command + args, input=stdin, capture_output=True)
+    return result.stdout, result.stderr, result.returncode
+
+
+@pytest.fixture(scope="module")
+def server(tmp_path_factory): 
+    '''
+    Returns the socket path of a util.py --serve process running for the 
+        module's tests
+    '''
+    
+    path = str(tmp_path_factory.mktemp("serve") / "util.sock")
+    server = start_server(path)
+    yield path
+    server.terminate()
+    server.wait()
+
+
+class TestPositive: 
+    @pytest.mark.functional
+    @pytest.mark.parametrize("args", [
+        ["-t", GENERAL_LOG], 
+        ["-i", "-I", "--color", "always", GENERAL_LOG], 
+        ["-l", "3", "--top", "2", IPV4_LOG], 
+        ["-j", "2", "-i", GENERAL_LOG, IPV4_LOG], 
+        ["-t", "missing.log"], 
+        ["--first", "x", GENERAL_LOG], 
+        ["-h"], 
+    ])
+    def test_same_as_direct_run(self, server, args): 
+        '''
+        Tests a request prints exactly what util.py prints, to the same 
+            streams, with the same exit status
+        '''
+        
+        expected = run([sys.executable, UTIL], args)
+        assert run([sys.executable, CLIENT, server], args) == expected
+    
+    @pytest.mark.functional
+    def test_standard_input(self, server): 
+        '''
+        Tests a request reads the client's standard input
+        '''
+        
+        with open(GENERAL_LOG, "rb") as log: 
+            data = log.read()
+        expected = run([sys.executable, UTIL], ["-f", "4", "-i"], data)
+        assert run(
+            [sys.executable, CLIENT, server], ["-f", "4", "-i"], data
+        ) == expected
+        assert expected[0]
+    
+    @pytest.mark.functional
+    def test_concurrent_clients(self, server): 
+        '''
+        Tests several clients are answered at once, each with its own 
+            output
+        '''
+        
+        logs = [GENERAL_LOG, IPV4_LOG] * 4
+        clients = [
+            subprocess.Popen(
+                [sys.executable, CLIENT, server, "-i", path], 
+                stdout=subprocess.PIPE) 
+            for path in logs
+        ]
+        outputs = [client.communicate()[0] for client in clients]
+        for path, output in zip(logs, outputs): 
+            assert output == run([sys.executable, UTIL], ["-i", path])[0]
+    
+    @pytest.mark.functional
+    def test_stale_socket(self, tmp_path): 
+        '''
+        Tests a socket left behind by a server that is gone is replaced, 
+            and removed again when the server stops
+        '''
+        
+        path = str(tmp_path / "stale.sock")
+        with socket.socket(socket.AF_UNIX) as stale: 
+            stale.bind(path)
+        server = start_server(path)
+        try: 
+            status = run(
+                [sys.executable, CLIENT, path], ["-t", GENERAL_LOG])[2]
+            assert status == 0
+        finally: 
+            server.terminate()
+            server.wait()
+        assert not os.path.exists(path)
+
+
+class TestNegative: 
+    @pytest.mark.functional
+    def test_other_arguments(self, capsys, usage, script_name): 
+        '''
+        Tests --serve can't be given other arguments
+        '''
+        
+        with pytest.raises(SystemExit): 
+            util.main(["--serve", "util.sock", "-t"])
+        captured = capsys.readouterr()
+        assert captured.out == ""
+        assert captured.err == (
+            f"{usage}{script_name}: error: argument --serve: not allowed with "
+            "other arguments\n"
+        )
+    
+    @pytest.mark.functional
+    def test_socket_in_use(self, server): 
+        '''
+        Tests a second server can't take over a socket that is answering
+        '''
+        
+        _, err, status = run([sys.executable, UTIL], ["--serve", server])
+        assert status == 2
+        assert err.decode().endswith(
+            f"error: argument --serve: can't listen on '{server}': [Errno 98] "
+            "Address already in use\n")
+    
+    @pytest.mark.functional
+    def test_no_server(self, tmp_path): 
+        '''
+        Tests the client reports a socket nothing is listening on
+        '''
+        
+        path = str(tmp_path / "none.sock")
+        _, err, status = run([sys.executable, CLIENT, path], ["-t"])
+        assert status == 2
+        assert err.decode() == (
+            f"client.py: can't reach '{path}': [Errno 2] No such file or "
+            "directory\n"
+        )
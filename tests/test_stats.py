@@ -0,0 +1,128 @@
+import pytest
+import io
+import re
+import sys
+from .. import util
+
+
+GENERAL_LOG = "testLogs/test_general.log"
+
+
+def stat_value(report, name): 
+    '''
+    Returns the first number printed after name in a --stats report
+    '''
+    
+    match = re.search(rf"^{name}\s+([0-9.]+)", report, re.MULTILINE)
+    return float(match.group(1))
+
+
+class TestPositive: 
+    @pytest.mark.functional
+    def test_stats_sections(self, capsys): 
+        '''
+        Tests --stats prints counters, timings, throughput, and memory
+        '''
+        
+        util.main(["-t", "--stats", GENERAL_LOG])
+        report = capsys.readouterr().err
+        for name in ("bytes read", "lines read", "lines in window", "read", 
+                "filter", "highlight", "write", "total", "throughput"): 
+            assert re.search(rf"^{name}\s", report, re.MULTILINE)
+        assert stat_value(report, "bytes read") == 1174
+        assert stat_value(report, "lines read") == 20
+        assert stat_value(report, "total") > 0
+
+    @pytest.mark.functional
+    @pytest.mark.parametrize("args, read, window", [
+        (["-t", "-l", "5"], 20, 5),
+        (["-t", "-f", "3"], 3, 3),
+        (["-t", "-f", "-5", "-l", "8"], 20, 3),
+    ])
+    def test_window_counts_from_stdin(self, capsys, monkeypatch, args, read, 
+            window): 
+        '''
+        Tests lines read and lines in the window with streamed input
+        Reading stops once -f has been satisfied
+        '''
+        
+        with open(GENERAL_LOG) as log: 
+            monkeypatch.setattr(sys, "stdin", io.StringIO(log.read()))
+        util.main(args + ["--stats"])
+        report = capsys.readouterr().err
+        assert stat_value(report, "lines read") == read
+        assert stat_value(report, "lines in window") == window
+
+    @pytest.mark.functional
+    def test_window_counts_from_file(self, capsys): 
+        '''
+        Tests a mapped file only reads the bytes of the window
+        '''
+        
+        with open(GENERAL_LOG, "rb") as log: 
+            tail = b"".join(log.readlines()[-5:])
+        util.main(["-l", "5", "--stats", GENERAL_LOG])
+        report = capsys.readouterr().err
+        assert stat_value(report, "bytes read") == len(tail)
+        assert stat_value(report, "lines in window") == 5
+
+    @pytest.mark.unit
+    def test_stats_hook(self, capsys): 
+        '''
+        Tests a stats_hook receives the stats without --stats being given
+        '''
+        
+        collected = []
+        parser = util.logParserUtil(stats_hook=collected.append)
+        parser.run(["-i", GENERAL_LOG])
+        assert capsys.readouterr().err == ""
+        stats, = collected
+        assert stats is parser.stats
+        assert stats.lines_read == 20
+        assert stats.stage_counts["ipv4 regex"] == [13, 0]
+        assert stats.elapsed > 0
+
+    @pytest.mark.unit
+    def test_highlight_timed_separately(self, monkeypatch): 
+        '''
+        Tests highlighting is timed apart from filtering and still applied
+        '''
+        
+        stats = util.RunStats()
+        line_filter = util.logParserUtil().build_line_filter(
+            util.argparse.Namespace(timestamps=False, ipv4=True, ipv6=False), 
+            highlight=True, stats=stats)
+        assert "\x1b[42m" in line_filter("from 10.0.0.1\n")
+        assert line_filter("no address\n") is None
+        assert stats.wall["filter"] > 0
+        assert stats.wall["highlight"] > 0
+
+    @pytest.mark.unit
+    def test_no_stats_no_wrappers(self): 
+        '''
+        Tests nothing is timed when stats are not collected
+        '''
+        
+        parser = util.logParserUtil()
+        parser.run(["-t", GENERAL_LOG])
+        assert parser.stats is None
+        line_filter = parser.build_line_filter(
+            util.argparse.Namespace(timestamps=True, ipv4=False, ipv6=False))
+        assert line_filter.__name__ == "line_filter"
+
+
+class TestNegative: 
+    @pytest.mark.unit
+    def test_timed_propagates_errors(self): 
+        '''
+        Tests time is still recorded when a timed callable raises
+        '''
+        
+        stats = util.RunStats()
+        
+        def fail(): 
+            raise ValueError("boom")
+        
+        with pytest.raises(ValueError): 
+            stats.timed("write", fail)()
+        assert stats.wall["write"] > 0
@@ -0,0 +1,120 @@
+import pytest
+import io
+import sys
+from .. import util
+
+
+FIRST_AND_LAST_LOG = "testLogs/test_first_and_last_options.log"
+GENERAL_LOG = "testLogs/test_general.log"
+LIMITS = [None, *range(-13, 14)]
+
+
+class CountingReader(io.StringIO): 
+    '''
+    Text stream that records how many lines have been read from it
+    '''
+
+    def __init__(self, text): 
+        super().__init__(text)
+        self.lines_read = 0
+
+    def __next__(self): 
+        line = super().__next__()
+        self.lines_read += 1
+        return line
+
+
+class TestPositive: 
+    @pytest.mark.unit
+    @pytest.mark.parametrize("length", [0, 1, 5, 10])
+    def test_line_window_matches_calculate_bounds(self, length): 
+        '''
+        Verifies that util.LineWindow yields exactly the lines that 
+            util.calculate_bounds() selects for every -f and -l pairing
+        '''
+        
+        lines = [f"{i}\n" for i in range(length)]
+        parser = util.logParserUtil()
+        for first in LIMITS: 
+            for last in LIMITS: 
+                boundaries = parser.calculate_bounds(first, last, length)
+                expected = (
+                    [] if boundaries is None 
+                    else lines[boundaries[0]:boundaries[1]]
+                )
+                actual = [*parser.stream_lines(iter(lines), first, last)]
+                assert actual == expected, (first, last)
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize("first,last,max_read", 
+        [
+            (3, None, 3),
+            (0, None, 0),
+            (0, 5, 0),
+            (2, 3, 5),
+        ]
+    )
+    def test_reading_stops_early(self, first, last, max_read): 
+        '''
+        Verifies that input is not consumed past the point where no more 
+            lines can be printed
+        '''
+        
+        reader = CountingReader("".join(f"{i}\n" for i in range(100)))
+        [*util.logParserUtil().stream_lines(reader, first, last)]
+        assert reader.lines_read == max_read
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize("first,last", 
+        [(None, 4), (-4, None), (-4, 6), (90, 4)]
+    )
+    def test_buffer_is_bounded(self, first, last): 
+        '''
+        Verifies that util.LineWindow never holds more lines than the 
+            magnitude of -f or -l
+        '''
+        
+        window = util.LineWindow(first, last)
+        for i in range(100): 
+            window.push(f"{i}\n")
+            assert len(window.buffer) <= max(abs(first or 0), last or 0)
+
+    @pytest.mark.functional
+    def test_matches_print_before_input_ends(self, capsys, monkeypatch): 
+        '''
+        Verifies matching lines are printed as they are read rather than 
+            after the whole input has been consumed
+        '''
+        
+        class InterruptedStdin(io.StringIO): 
+            def __next__(self): 
+                line = super().__next__()
+                if line.startswith("Line 3:"): 
+                    raise KeyboardInterrupt
+                return line
+
+        with open(GENERAL_LOG) as log: 
+            monkeypatch.setattr(sys, "stdin", InterruptedStdin(log.read()))
+        with pytest.raises(KeyboardInterrupt): 
+            util.main(["-t"])
+        captured = capsys.readouterr()
+        assert captured.out == "Line 2: 02:49:12 172.16.254.1 ti\n"
+
+    @pytest.mark.functional
+    @pytest.mark.parametrize("first,last", [("-4", None), ("-4", "6")])
+    def test_negative_first_from_stdin(
+            self, capsys, monkeypatch, first, last): 
+        '''
+        Verifies negative -f values behave the same for piped input
+        '''
+        
+        with open(FIRST_AND_LAST_LOG) as log: 
+            lines = log.readlines()
+        monkeypatch.setattr(sys, "stdin", io.StringIO("".join(lines)))
+        args = ["-f", first] + ([] if last is None else ["-l", last])
+        util.main(args)
+        captured = capsys.readouterr()
+        boundaries = util.logParserUtil().calculate_bounds(
+            int(first), None if last is None else int(last), len(lines))
+        assert captured.out == "".join(lines[boundaries[0]:boundaries[1]])
+        assert captured.err == ""
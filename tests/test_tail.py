@@ -0,0 +1,121 @@
+import pytest
+import io
+import os
+import sys
+from .. import util
+
+
+FIRST_AND_LAST_LOG = "testLogs/test_first_and_last_options.log"
+GENERAL_LOG = "testLogs/test_general.log"
+
+
+@pytest.fixture(params=["\n", "\r\n"], ids=["lf", "crlf"])
+def long_log(request, tmp_path): 
+    '''
+    Returns the path to a 1000 line log and its lines as read by 
+        readlines()
+    '''
+    
+    path = tmp_path / "long.log"
+    newline = request.param
+    text = newline.join(f"Line {i} 12:00:{i % 60:02}" for i in range(1000))
+    path.write_bytes(text.encode())
+    with open(path) as log: 
+        return path, log.readlines()
+
+
+class TestPositive: 
+    @pytest.mark.unit
+    @pytest.mark.parametrize("content", 
+        [b"", b"\n", b"a", b"a\n", b"a\nb", b"a\nb\n", b"\n\n\n", b"a\n\nb\n"]
+    )
+    @pytest.mark.parametrize("num", [0, 1, 2, 3, 5])
+    @pytest.mark.parametrize("block_size", [1, 2, 3, 64])
+    def test_tail_offset(self, tmp_path, content, num, block_size): 
+        '''
+        Verifies util.tail_offset() finds the start of the last num lines 
+            regardless of trailing newlines and block boundaries
+        '''
+        
+        path = tmp_path / "tail.log"
+        path.write_bytes(content)
+        lines = content.splitlines(keepends=True)
+        expected = len(b"".join(lines[:max(0, len(lines) - num)]))
+        with open(path, "rb") as log: 
+            actual = util.logParserUtil().tail_offset(
+                log.fileno(), len(content), num, block_size)
+        assert actual == expected
+
+    @pytest.mark.unit
+    def test_tail_offset_reads_only_the_tail(self, monkeypatch, long_log): 
+        '''
+        Verifies that only the blocks holding the requested lines are read
+        '''
+        
+        bytes_read = []
+        pread = os.pread
+        
+        def counting_pread(fd, n, offset): 
+            bytes_read.append(n)
+            return pread(fd, n, offset)
+
+        monkeypatch.setattr(os, "pread", counting_pread)
+        path, _ = long_log
+        with open(path, "rb") as log: 
+            util.logParserUtil().tail_offset(
+                log.fileno(), os.path.getsize(path), 10, 256)
+        assert sum(bytes_read) <= 1 + 256
+
+    @pytest.mark.functional
+    @pytest.mark.parametrize("first,last", 
+        [
+            (None, 0),
+            (None, 5),
+            (None, -5),
+            (None, 999),
+            (None, 5000),
+            (-3, 10),
+            (-10, 3),
+            (-5000, 10),
+            (995, 10),
+            (10, 995),
+        ]
+    )
+    def test_last_from_file_matches_stdin(
+            self, capsys, monkeypatch, long_log, first, last): 
+        '''
+        Verifies that -l on a regular file prints the same lines as -l on 
+            piped input, including when -f is also given
+        '''
+        
+        path, lines = long_log
+        args = ["-l", str(last), "-t"]
+        if first is not None: 
+            args += ["-f", str(first)]
+        util.main(args + [str(path)])
+        from_file = capsys.readouterr()
+
+        monkeypatch.setattr(sys, "stdin", io.StringIO("".join(lines)))
+        util.main(args)
+        from_stdin = capsys.readouterr()
+        
+        boundaries = util.logParserUtil().calculate_bounds(
+            first, last, len(lines))
+        expected = (
+            "" if boundaries is None 
+            else "".join(lines[boundaries[0]:boundaries[1]])
+        )
+        assert from_file.out == from_stdin.out == expected
+        assert from_file.err == from_stdin.err == ""
+
+
+class TestNegative: 
+    @pytest.mark.unit
+    def test_seek_to_tail_rejects_non_files(self): 
+        '''
+        Verifies streams without a regular file behind them are left alone
+        '''
+        
+        stream = io.StringIO("a\nb\n")
+        assert not util.logParserUtil().seek_to_tail(stream, 1)
+        assert stream.read() == "a\nb\n"
@@ -0,0 +1,286 @@
+import pytest
+import gzip
+import io
+import mmap
+import random
+import sys
+from .. import util
+
+
+NIGHT_LOG = (
+    "service starting\n"
+    "23:58:00 a\n"
+    "23:59:00 b 10.0.0.1\n"
+    "  continued b\n"
+    "23:59:59 c\n"
+    "00:00:00 d 10.0.0.2\n"
+    "00:01:30 e\n"
+    "  continued e\n"
+    "00:03:00 f"
+)
+DAY_LOG = (
+    "service starting\n"
+    "10:00:00 a\n"
+    "10:30:00 b\n"
+    "  continued b\n"
+    "11:00:00 c\n"
+    "11:45:00 d\n"
+    "12:00:00 e"
+)
+
+
+def sorted_log(lines, start, step=7): 
+    '''
+    Returns a log of lines timestamped in time order from start seconds, 
+        wrapping past midnight, with lines without a timestamp in between
+    '''
+    
+    text = []
+    for i in range(lines): 
+        seconds = (start + i * step) % util.DAY_SECONDS
+        hours, minutes = seconds // 3600, seconds // 60 % 60
+        stamp = f"{hours:02}:{minutes:02}:{seconds % 60:02}"
+        text.append(f"{stamp} line {i} 10.0.{i % 256}.1\n")
+        if i % 5 == 0: 
+            text.append("  continued\n")
+    return "".join(text)
+
+
+def line_groups(log): 
+    '''
+    Returns the lines of a test log grouped by the name after each 
+        timestamp, with the lines before the first timestamp named "-"
+    '''
+    
+    lines = log.splitlines(True)
+    names = {"-": lines[0]}
+    for line in lines[1:]: 
+        if line[0] != " ": 
+            name = line.split()[1]
+            names[name] = ""
+        names[name] += line
+    return names
+
+
+@pytest.fixture
+def night_log(tmp_path): 
+    '''
+    Returns the path to a log that runs past midnight
+    '''
+    
+    path = tmp_path / "night.log"
+    path.write_text(NIGHT_LOG)
+    return path
+
+
+class TestPositive: 
+    @pytest.mark.functional
+    @pytest.mark.parametrize("args,expected", [
+        (["--since", "23:59:00"], "bcdef"), 
+        (["--until", "23:59:30"], "-ab"), 
+        (["--since", "23:59:30", "--until", "00:02:00"], "cde"), 
+        (["--since", "00:00:00"], "abcdef"), 
+        (["--until", "00:00:00"], "-d"), 
+        (["--since", "00:02:00"], "abcf"), 
+        (["--since", "00:02:00", "--until", "23:59:00"], "abf"), 
+        (["--since", "12:00:00", "--until", "13:00:00"], ""), 
+        (["--since", "23:59:00", "-f", "4"], "bcd"), 
+        (["--since", "23:59:00", "-f", "3"], "bc"), 
+        (["--since", "23:59:00", "-l", "3"], "ef"), 
+    ])
+    def test_window(self, run, monkeypatch, night_log, args, expected): 
+        '''
+        Tests --since and --until across midnight, with lines without a 
+            timestamp going with the line before them, for a bisected FILE 
+            and for standard input
+        '''
+        
+        names = line_groups(NIGHT_LOG)
+        output = run(args + [str(night_log)])
+        assert output == "".join(names[name] for name in expected)
+        monkeypatch.setattr(sys, "stdin", io.StringIO(NIGHT_LOG))
+        assert run(args) == output
+
+    @pytest.mark.functional
+    @pytest.mark.parametrize("log,args,expected", [
+        (DAY_LOG, ["--since", "09:00:00"], "abcde"), 
+        (DAY_LOG, ["--until", "09:00:00"], "-"), 
+        (DAY_LOG, ["--since", "13:00:00"], ""), 
+        (DAY_LOG, ["--until", "13:00:00"], "-abcde"), 
+        (DAY_LOG, ["--since", "09:00:00", "--until", "10:30:00"], "ab"), 
+        (DAY_LOG, ["--since", "11:30:00", "--until", "09:00:00"], "de"), 
+        (DAY_LOG, ["--since", "23:00:00", "--until", "01:00:00"], ""), 
+        (NIGHT_LOG, ["--since", "22:00:00"], "abcdef"), 
+        (NIGHT_LOG, ["--until", "01:00:00"], "-def"), 
+        (NIGHT_LOG, ["--until", "22:00:00"], "-"), 
+    ])
+    def test_window_outside_log(
+            self, run, monkeypatch, tmp_path, log, args, expected): 
+        '''
+        Tests bounds earlier in the day than the first timestamp, which 
+            are before the start until the log runs past midnight, and then 
+            on the next day if they are more than half a day earlier
+        '''
+        
+        names = line_groups(log)
+        path = tmp_path / "window.log"
+        path.write_text(log)
+        output = run(args + [str(path)])
+        assert output == "".join(names[name] for name in expected)
+        monkeypatch.setattr(sys, "stdin", io.StringIO(log))
+        assert run(args) == output
+
+    @pytest.mark.functional
+    @pytest.mark.parametrize("start,step", [
+        (13 * 3600, 1800), (22 * 3600, 600), (20 * 3600, 5400), 
+        (23 * 3600, 13 * 3600)
+    ])
+    @pytest.mark.parametrize("args", [
+        ["--since", "00:30:00"], 
+        ["--until", "00:30:00"], 
+        ["--since", "21:00:00"], 
+        ["--until", "21:00:00"], 
+        ["--since", "23:30:00", "--until", "01:00:00"], 
+        ["--since", "01:00:00", "--until", "23:30:00"], 
+    ])
+    def test_same_for_every_input(
+            self, run, monkeypatch, tmp_path, start, step, args): 
+        '''
+        Tests a log gives the same lines as a bisected FILE, on standard 
+            input, and compressed, whether or not it runs past midnight
+        '''
+        
+        text = sorted_log(22, start, step)
+        path = tmp_path / "same.log"
+        path.write_text(text)
+        compressed = tmp_path / "same.log.gz"
+        compressed.write_bytes(gzip.compress(text.encode()))
+        expected = "".join(util.TimeRange(*(
+            args[args.index(option) + 1] if option in args else None 
+            for option in ("--since", "--until")
+        )).lines(text.splitlines(True)))
+        assert run(args + [str(path)]) == expected
+        assert run(args + [str(compressed)]) == expected
+        monkeypatch.setattr(sys, "stdin", io.StringIO(text))
+        assert run(args) == expected
+
+    @pytest.mark.functional
+    @pytest.mark.parametrize("start", [0, 6 * 3600, 23 * 3600])
+    def test_bisect_matches_stream(
+            self, run, monkeypatch, tmp_path, start): 
+        '''
+        Tests bisecting a large time-ordered FILE prints the same lines as 
+            reading it in full
+        '''
+        
+        text = sorted_log(5000, start)
+        path = tmp_path / "sorted.log"
+        path.write_text(text)
+        stamps = [line[:8] for line in text.splitlines() if line[0] != " "]
+        rng = random.Random(start)
+        for _ in range(10): 
+            since, until = rng.choice(stamps), rng.choice(stamps)
+            args = ["--since", since, "--until", until]
+            expected = "".join(util.TimeRange(since, until).lines(
+                text.splitlines(True)))
+            assert run(args + [str(path)]) == expected
+            monkeypatch.setattr(sys, "stdin", io.StringIO(text))
+            assert run(args) == expected
+
+    @pytest.mark.unit
+    def test_offsets(self, tmp_path): 
+        '''
+        Tests util.TimeRange.offsets() narrows a time-ordered file to the 
+            byte range of the window
+        '''
+        
+        path = tmp_path / "sorted.log"
+        path.write_text(sorted_log(50000, 0, 1))
+        with open(path, "rb") as file: 
+            buf = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        (start, stop), = util.TimeRange("01:00:00", "01:00:09").offsets(buf)
+        lines = buf[start:stop].decode().splitlines()
+        assert lines[0].startswith("01:00:00 line 3600")
+        assert lines[-1].startswith("01:00:09 line 3609")
+        buf.close()
+
+    @pytest.mark.unit
+    def test_unsorted_is_detected(self, run, tmp_path): 
+        '''
+        Tests files that are out of time order are read in full
+        '''
+        
+        lines = sorted_log(2000, 0).splitlines(True)
+        random.Random(0).shuffle(lines)
+        path = tmp_path / "shuffled.log"
+        path.write_text("".join(lines))
+        with open(path, "rb") as file: 
+            buf = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        assert util.TimeRange("01:00:00", None).offsets(buf) is None
+        buf.close()
+        expected = "".join(util.TimeRange("01:00:00", None).lines(lines))
+        assert run(["--since", "01:00:00", str(path)]) == expected
+
+    @pytest.mark.functional
+    def test_compressed(self, run, night_log): 
+        '''
+        Tests --since and --until apply to compressed input
+        '''
+        
+        args = ["--since", "23:59:30", "--until", "00:02:00"]
+        expected = run(args + [str(night_log)])
+        compressed = night_log.with_name("night.log.gz")
+        compressed.write_bytes(gzip.compress(NIGHT_LOG.encode()))
+        assert run(args + [str(compressed)]) == expected
+
+    @pytest.mark.functional
+    def test_merge(self, run, tmp_path): 
+        '''
+        Tests --since and --until apply to the merged stream of --merge
+        '''
+        
+        a = tmp_path / "a.log"
+        b = tmp_path / "b.log"
+        a.write_text("01:00:00 a1\n03:00:00 a3\n05:00:00 a5\n")
+        b.write_text("02:00:00 b2\n  continued b2\n04:00:00 b4\n")
+        output = run([
+            "--merge", "--since", "02:00:00", "--until", "04:00:00", 
+            str(a), str(b)
+        ])
+        assert output == (
+            f"{b}:02:00:00 b2\n{b}:  continued b2\n{a}:03:00:00 a3\n"
+            f"{b}:04:00:00 b4\n"
+        )
+
+
+class TestNegative: 
+    @pytest.mark.functional
+    @pytest.mark.parametrize("value", ["24:00:00", "9:30:00", "09:30", "noon"])
+    def test_invalid_time(self, capsys, usage, script_name, night_log, value): 
+        '''
+        Tests error handling when --since or --until isn't a time
+        '''
+        
+        with pytest.raises(SystemExit): 
+            util.main(["--since", value, str(night_log)])
+        captured = capsys.readouterr()
+        assert captured.out == ""
+        assert captured.err == (
+            f"{usage}{script_name}: error: argument --since: '{value}' is not "
+            "in HH:MM:SS format\n"
+        )
+
+    @pytest.mark.functional
+    @pytest.mark.parametrize("option", ["--since", "--until"])
+    def test_follow(self, capsys, usage, script_name, night_log, option): 
+        '''
+        Tests error handling when --follow is combined with a time window
+        '''
+        
+        with pytest.raises(SystemExit): 
+            util.main(["-F", option, "00:00:00", str(night_log)])
+        captured = capsys.readouterr()
+        assert captured.err == (
+            f"{usage}{script_name}: error: argument -F/--follow: not allowed "
+            f"with argument {option}\n"
+        )
@@ -268,6 +268,67 @@ class TestPositive:
         )
         assert actual == expected
 
+    @pytest.mark.unit
+    def test_ip_spans(self): 
+        '''
+        Tests util.ip_spans() reports where IPs are without highlighting
+        '''
+        
+        line = (
+            "119.243.4.69 54ad:92fb:9c62:dcc1:39fb:d679:73f4:b804 17:59:00"
+        )
+        parser = util.logParserUtil()
+        assert parser.ip_spans(line) == [(0, 12), (13, 52)]
+        assert parser.ip_spans(line, ipv6=False) == [(0, 12)]
+        assert parser.ip_spans(line, ipv4=False) == [(13, 52)]
+        assert parser.ip_spans("no addresses") == []
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize("spans,expected", 
+        [
+            ([], []),
+            ([(5, 9), (0, 3)], [(0, 3), (5, 9)]),
+            ([(0, 5), (3, 9)], [(0, 9)]),
+            ([(0, 9), (3, 5)], [(0, 9)]),
+            ([(0, 3), (3, 5), (7, 8)], [(0, 5), (7, 8)]),
+        ]
+    )
+    def test_merge_spans(self, spans, expected): 
+        '''
+        Tests util.merge_spans() sorts spans and merges overlapping ones
+        '''
+        
+        assert util.logParserUtil().merge_spans(spans) == expected
+
+    @pytest.mark.unit
+    def test_highlighting_many_ips(self): 
+        '''
+        Verifies lines with many IPs are highlighted in a single pass
+        '''
+        
+        count = 5000
+        line = " ".join(["10.0.0.1", "::"] * count)
+        parser = util.logParserUtil()
+        actual = parser.highlight_ip_addresses(
+            line, util.IPV4_RE.finditer(line))
+        assert actual == " ".join(
+            ["\x1b[42m10.0.0.1\x1b[0m", "::"] * count)
+
+    @pytest.mark.functional
+    def test_ipv4_and_ipv6_highlighted_together(self, capsys): 
+        '''
+        Verifies -i and -I highlight both kinds of address in one pass
+        '''
+        
+        args = [
+            "-i", "-I", "--color=always", "-f", "5", "-l", "16", GENERAL_LOG]
+        util.main(args)
+        captured = capsys.readouterr()
+        assert captured.out == (
+            "Line 5: \x1b[42m127.255.0.10\x1b[0m 23:59:59 \x1b[42m192.168.255"
+            ".255\x1b[0m \x1b[42m0aF3:AF18:1762:B03:0:1:af19:17f\x1b[0m tiI\n"
+        )
+
     @pytest.mark.unit
     def test_split_by_idx(self): 
         '''
@@ -283,7 +344,8 @@ class TestPositive:
 
 class TestNegative: 
     @staticmethod
-    def get_expected_values_for_erroneous_args(script_name, extra_arg): 
+    def get_expected_values_for_erroneous_args(
+            usage, script_name, extra_arg): 
         '''
         Returns expected (stdout, stderr) when an argument is 
             erroneously supplied to -t, -i, or -I
@@ -292,15 +354,14 @@ class TestNegative:
         return (
             "",
             (
-                f"usage: {script_name} [-h] [-f NUM] [-l NUM] [-t] [-i] [-I] "
-                f"[FILE]\n{script_name}: error: unrecognized arguments: "
+                f"{usage}{script_name}: error: unrecognized arguments: "
                 f"{extra_arg}\n"
             )
         )
 
     @pytest.mark.parametrize("option", ["-t", "-i", "-I"])
     def test_timestamp_and_ip_options_do_not_take_args(
-            self, capsys, script_name, option): 
+            self, capsys, usage, script_name, option): 
         '''
         Tests error handling when user tries to supply an argument to 
             -t, -i, or -I
@@ -312,7 +373,8 @@ class TestNegative:
             util.main(args)
         captured = capsys.readouterr()
         expected_stdout, expected_stderr = (
-            self.get_expected_values_for_erroneous_args(script_name, extra_arg)
+            self.get_expected_values_for_erroneous_args(
+                usage, script_name, extra_arg)
         )
         assert captured.out == expected_stdout
         assert captured.err == expected_stderr
@@ -0,0 +1,242 @@
+import pytest
+import random
+from collections import Counter
+from .. import util
+
+
+GENERAL_LOG = "testLogs/test_general.log"
+IPV4_LOG = "testLogs/test_ipv4.log"
+
+
+def parse_report(output): 
+    '''
+    Returns the (key, count, least count) tuples printed by --top
+    '''
+    
+    rows = []
+    for line in output.splitlines(): 
+        count, key, *rest = line.split(maxsplit=2)
+        least = int(rest[0][len("(at least "):-1]) if rest else int(count)
+        rows.append((key, int(count), least))
+    return rows
+
+
+@pytest.fixture(scope="module")
+def skewed_log(tmp_path_factory): 
+    '''
+    Returns the path of a log whose IPv4 addresses follow a skewed 
+        distribution, and the true count of each address
+    '''
+    
+    rand = random.Random(7)
+    ips = [f"10.0.{n // 256}.{n % 256}" for n in range(2000)]
+    weights = [1 / (rank + 1) for rank in range(len(ips))]
+    picked = rand.choices(ips, weights, k=20000)
+    path = tmp_path_factory.mktemp("top") / "skewed.log"
+    path.write_text("".join(
+        f"12:00:{n % 60:02} GET from {ip}\n" for n, ip in enumerate(picked)))
+    return str(path), Counter(picked)
+
+
+class TestPositive: 
+    @pytest.mark.functional
+    @pytest.mark.parametrize("args,expected", [
+        (
+            ["--top", "3"], 
+            [("127.0.0.1", 3, 3), ("0.0.0.0", 2, 2), 
+             ("234.98.125.251", 2, 2)]
+        ), 
+        (
+            ["--top", "3", "--by", "minute"], 
+            [("00:00", 2, 2), ("23:59", 2, 2), ("02:38", 1, 1)]
+        ), 
+        (
+            ["--top", "2", "--by", "ipv6"], 
+            [("2bc2:2a2d:98:dc3:0:18e0:aa7c:c0bd", 3, 3), 
+             ("cf91:b4ed:13fb:1857:6b32:cb99:54e8:82bc", 3, 3)]
+        ), 
+        (
+            ["--top", "1", "-f", "6"], 
+            [("127.0.0.1", 2, 2)]
+        ), 
+        (
+            ["--top", "2", "-t", "-l", "4"], 
+            [("119.243.4.69", 1, 1), ("144.1.18.87", 1, 1)]
+        ), 
+    ])
+    def test_exact_counts(self, run, args, expected): 
+        '''
+        Tests the keys of the lines that would have been printed are 
+            counted, with ties broken by key and addresses counted in 
+            canonical form
+        '''
+        
+        assert parse_report(run(args + [GENERAL_LOG])) == expected
+    
+    @pytest.mark.functional
+    def test_report_format(self, run): 
+        '''
+        Tests counts are right aligned ahead of their keys
+        '''
+        
+        assert run(["--top", "1", GENERAL_LOG]) == (
+            "           3 127.0.0.1\n")
+    
+    @pytest.mark.functional
+    @pytest.mark.parametrize("counters", ["20", "100"])
+    def test_approximate_bounds(self, run, skewed_log, counters): 
+        '''
+        Tests each approximate count is at least the true count and at 
+            most its error above it, and every key seen more often than 
+            once per NUM lines is reported
+        '''
+        
+        path, counts = skewed_log
+        rows = parse_report(
+            run(["--top", counters, "--counters", counters, path]))
+        assert len(rows) == int(counters)
+        for key, count, least in rows: 
+            assert least <= counts[key] <= count
+        reported = {key for key, _, _ in rows}
+        for key, count in counts.items(): 
+            if count > sum(counts.values()) / int(counters): 
+                assert key in reported
+    
+    @pytest.mark.functional
+    def test_enough_counters_are_exact(self, run, skewed_log): 
+        '''
+        Tests approximate counting is exact when every key has a counter
+        '''
+        
+        path, counts = skewed_log
+        rows = parse_report(run(
+            ["--top", "5", "--counters", "5000", path]))
+        assert rows == [
+            (key, count, count) for key, count in sorted(
+                counts.items(), key=lambda item: (-item[1], item[0]))[:5]
+        ]
+    
+    @pytest.mark.functional
+    @pytest.mark.parametrize("extra", [[], ["--counters", "50"]])
+    def test_files_and_jobs(self, run, skewed_log, extra): 
+        '''
+        Tests counts from several FILEs and from worker processes are 
+            added together
+        '''
+        
+        path, counts = skewed_log
+        args = ["--top", "10"] + extra
+        single = parse_report(run(args + [path]))
+        doubled = parse_report(run(args + ["-j", "2", path, path]))
+        if not extra: 
+            assert doubled == [(key, 2 * n, 2 * n) for key, n, _ in single]
+        for key, count, least in doubled: 
+            assert least <= 2 * counts[key] <= count
+    
+    @pytest.mark.functional
+    def test_merge_and_files(self, run): 
+        '''
+        Tests --top counts the lines --merge would have printed
+        '''
+        
+        files = [GENERAL_LOG, IPV4_LOG]
+        expected = Counter()
+        for path in files: 
+            for key, count, _ in parse_report(
+                    run(["--top", "100", "-t", path])): 
+                expected[key] += count
+        rows = parse_report(
+            run(["--top", "100", "-t", "--merge"] + files))
+        assert {key: count for key, count, _ in rows} == expected
+    
+    @pytest.mark.unit
+    def test_merge_counters(self): 
+        '''
+        Tests merging TopCounters keeps the largest counts within the 
+            limit and carries the smallest count of a full side as the 
+            error of keys it is missing
+        '''
+        
+        left = util.TopCounter("ipv4", limit=2)
+        left.write("1.1.1.1 1.1.1.1 1.1.1.1 2.2.2.2\n")
+        left.flush()
+        right = util.TopCounter("ipv4", limit=2)
+        right.write("3.3.3.3 3.3.3.3 4.4.4.4\n")
+        right.flush()
+        assert right.floor() == 1
+        left.merge(right)
+        assert left.total == 7
+        assert left.top(2) == [("1.1.1.1", 4, 1), ("3.3.3.3", 3, 1)]
+    
+    @pytest.mark.functional
+    @pytest.mark.parametrize("by,lines,expected", [
+        ("ipv4", ["010.0.0.1", "10.0.0.1", "10.000.0.01"], "10.0.0.1"), 
+        ("ipv6", [
+            "0AF3:0:0:0:0:0:0:1", "af3:0:0:0:0:0:0:1", 
+            "0af3:0000:0:0:0:0:0:01"
+        ], "af3::1"), 
+    ])
+    def test_forms_of_an_address(self, run, tmp_path, by, lines, expected): 
+        '''
+        Tests every way of writing an address is counted as that address
+        '''
+        
+        path = tmp_path / "forms.log"
+        path.write_text("".join(f"GET from {line}\n" for line in lines))
+        assert parse_report(run(["--top", "2", "--by", by, str(path)])) == [
+            (expected, 3, 3)]
+    
+    @pytest.mark.unit
+    def test_batch_within_limit(self): 
+        '''
+        Tests a block with many more distinct keys than counters is merged 
+            in batches no larger than the limit
+        '''
+        
+        counter = util.TopCounter("ipv4", limit=4)
+        sizes = []
+        merge = counter.merge
+
+        def record(batch, count_total=True): 
+            sizes.append(len(batch.counts))
+            merge(batch, count_total)
+
+        counter.merge = record
+        counter.add([f"10.0.0.{n}".encode() for n in range(100)], True)
+        assert sizes and max(sizes) < 2 * counter.limit
+        assert len(counter.batch) < counter.limit
+
+
+class TestNegative: 
+    @pytest.mark.functional
+    @pytest.mark.parametrize("args,message", [
+        (["--by", "ipv6", "-t"], 
+         "argument --by: not allowed without argument --top"), 
+        (["--counters", "5", "-t"], 
+         "argument --counters: not allowed without argument --top"), 
+        (["--top", "0"], "argument --top: K must be 1 or more"), 
+        (["--top", "5", "--counters", "4"], 
+         "argument --counters: NUM must be at least K"), 
+    ])
+    def test_invalid_arguments(
+            self, capsys, usage, script_name, args, message): 
+        '''
+        Tests error handling for --top and the options that need it
+        '''
+        
+        with pytest.raises(SystemExit): 
+            util.main(args + [GENERAL_LOG])
+        captured = capsys.readouterr()
+        assert captured.out == ""
+        assert captured.err == f"{usage}{script_name}: error: {message}\n"
+    
+    @pytest.mark.functional
+    def test_invalid_key(self, capsys): 
+        '''
+        Tests --by only accepts the keys it can count
+        '''
+        
+        with pytest.raises(SystemExit): 
+            util.main(["--top", "1", "--by", "port", GENERAL_LOG])
+        assert "argument --by: invalid choice: 'port'" in (
+            capsys.readouterr().err)
@@ -1,9 +1,61 @@
 #!/usr/bin/env python3
 
+import abc
 import argparse
+import asyncio
+import bisect
+import codecs
+import glob
+import gzip
+import hashlib
+import heapq
+import io
+import ipaddress
+import itertools
+import math
+import mmap
+import os
+import queue
+import signal
+import socket
+import socketserver
+import stat
+import struct
 import sys
 import re
-from colorama import init, Back, Style
+import tempfile
+import threading
+import time
+import traceback
+import zlib
+from array import array
+from collections import Counter, deque, namedtuple
+from operator import itemgetter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from colorama import Back, Style, AnsiToWin32
+
+try: 
+    import resource
+except ImportError: 
+    # Not available on Windows, where peak memory is left out of --stats
+    resource = None
+
+# bz2 and lzma are missing from Pythons built without their libraries, in 
+# which case those formats are read as plain text
+try: 
+    import bz2
+except ImportError: 
+    bz2 = None
+try: 
+    import lzma
+except ImportError: 
+    lzma = None
+
+# The numpy engine falls back to the regex engine without NumPy
+try: 
+    import numpy
+except ImportError: 
+    numpy = None
 
 
 TIMESTAMP_PAT = r"\b([01][0-9]|2[0-3]):[0-5][0-9]:[0-5][0-9]\b"
@@ -13,8 +65,2619 @@ IPV4_PAT = (
 )
 IPV6_PAT = r"\b([0-9a-fA-F]{1,4}:){7}[0-9a-fA-F]{1,4}\b"
 
+# Size of the blocks read when scanning a file backwards from its end
+BLOCK_SIZE = 64 * 1024
+
+# Encodings in which a newline is the single byte 0x0A and decoding can 
+# start at any line boundary
+BYTE_SEEKABLE_ENCODINGS = ("ascii", "utf-8", "latin-1", "iso8859-1", "cp1252")
+
+# Encodings whose bytes can be copied to a UTF-8 stdout without decoding
+PASSTHROUGH_ENCODINGS = ("ascii", "utf-8")
+
+# Bounds on the size of the byte ranges handed to worker processes
+MIN_CHUNK_SIZE = 1024 * 1024
+MAX_CHUNK_SIZE = 64 * 1024 * 1024
+
+
+PATTERNS = {"timestamp": TIMESTAMP_PAT, "ipv4": IPV4_PAT, "ipv6": IPV6_PAT}
+IPV4_RE = re.compile(IPV4_PAT)
+IPV6_RE = re.compile(IPV6_PAT)
+NON_ASCII_RE = re.compile(rb"[\x80-\xff]")
+
+# Literal-led fragments that every match of the patterns above contains, 
+# ":MM:" of a timestamp, ".B.C." of an IPv4 address, and four colons of an 
+# IPv6 address
+PREFILTER_PATS = {
+    "timestamp": rb":[0-5][0-9]:", 
+    "ipv4": rb"\.[0-9]{1,3}\.[0-9]{1,3}\.", 
+    "ipv6": rb":[0-9a-fA-F]{1,4}:[0-9a-fA-F]{1,4}:[0-9a-fA-F]{1,4}:", 
+}
+
+# Matching lines are collected until this many bytes are waiting, then 
+# written to standard output in one call
+OUTPUT_BUFFER_SIZE = 256 * 1024
+
+# Lines are checked this many times between reorderings of filter stages
+REORDER_INTERVAL = 4096
+
+# Bytes read at a time by --follow and from compressed input
+STREAM_BLOCK_SIZE = 1024 * 1024
+
+# Most bytes of one of several FILEs' output held in memory, beyond which 
+# it is moved to a temporary file
+SPOOL_SIZE = 4 * 1024 * 1024
+
+# Blocks each --pipeline queue holds by default
+PIPELINE_QUEUE_DEPTH = 4
+
+# Header of a --serve request, giving the size of the NUL-separated working 
+# directory and arguments that follow it
+SERVE_HEADER = "!I"
+
+# Bytes the numpy engine loads into an array at a time, and the zero bytes 
+# padded around each block
+NUMPY_BLOCK_SIZE = 4 * 1024 * 1024
+NUMPY_PADDING = 8
+
+# Blocks of lines at least this large are filtered in an executor by 
+# aiter_matches, and smaller ones on the event loop
+ASYNC_OFFLOAD_SIZE = 64 * 1024
+
+# Range of delays between checks for new data by --follow, which doubles 
+# while FILE stays idle
+FOLLOW_MIN_INTERVAL = 0.01
+FOLLOW_MAX_INTERVAL = 0.5
+
+# Leading bytes of each compressed format FILE can be given in, with the 
+# function that opens it for decompression. A bz2 header is followed by the 
+# magic of its first block, or of the end of the stream if it is empty
+COMPRESSED_FORMATS = [
+    (re.compile(rb"\x1f\x8b\x08"), gzip.open), 
+    (re.compile(rb"BZh[1-9](1AY&SY|\x17rE8P\x90)"), bz2 and bz2.open), 
+    (re.compile(rb"\xfd7zXZ\x00"), lzma and lzma.open), 
+]
+
+# Errors raised while decompressing damaged or truncated input
+DECOMPRESSION_ERRORS = (EOFError, OSError, zlib.error) + (
+    (lzma.LZMAError,) if lzma is not None else ())
+
+# Start of a gzip member: magic, deflate, and flags with no reserved bits
+GZIP_MEMBER_RE = re.compile(rb"\x1f\x8b\x08[\x00-\x1f]")
+
+# Suffix of the sidecar index kept next to FILE by --index
+INDEX_SUFFIX = ".lpidx"
+
+# Suffix of the compiled copy kept next to each --ip-in and --ip-not-in list
+IPSET_SUFFIX = ".lpset"
+
+# Keywords from -k and --keywords are matched with a KeywordAutomaton 
+# rather than joined into the regex alternation from this many on, where 
+# the alternation, which re tries branch by branch at every position, 
+# becomes the slower of the two
+AUTOMATON_MIN_KEYWORDS = 8
+
+# Patterns finding the keys counted by --top, the HH:MM of a minute comes 
+# from the first timestamp on each line
+TOP_KEY_PATS = {
+    "ipv4": IPV4_PAT.replace("(", "(?:"), 
+    "ipv6": IPV6_PAT.replace("(", "(?:"), 
+    "minute": (
+        r"(?m)^[^\n]*?\b((?:[01][0-9]|2[0-3]):[0-5][0-9]):[0-5][0-9]\b"
+    ), 
+}
+
+# Leading zeros of the octets or groups of addresses found as keys, 
+# which are dropped so each address is counted once however it's written
+LEADING_ZEROS = re.compile(rb"(?<![0-9a-f])0+(?=[0-9a-f])")
+
+# Feature bits recorded for each line in an index
+FEATURE_BITS = {"timestamp": 1, "ipv4": 2, "ipv6": 4}
+
+# Timestamps have no date, so times wrap around after a day
+DAY_SECONDS = 24 * 60 * 60
+
+# Evenly spaced lines checked to be in time order before --since and 
+# --until bisect a file
+TIME_SAMPLES = 64
+
+
+def parse_size(text): 
+    '''
+    Function to parse sizes such as 512, 64KB, 1.5M or 1GB into bytes
+    Reads the same sizes as benchmarks/benchmark.py, less than a byte is 
+        invalid
+    '''
+    
+    match = re.fullmatch(r"(\d+(?:\.\d+)?)\s*([KMG]?)B?", text.strip().upper())
+    size = 0 if match is None else int(
+        float(match[1]) * 1024 ** " KMG".index(match[2] or " "))
+    if size == 0: 
+        raise argparse.ArgumentTypeError(f"invalid size: '{text}'")
+    return size
+
+
+class FilterStage: 
+    '''
+    One check in the chain applied to each line by -t, -i, and -I
+    Prefilters are cheap necessary conditions that let most lines skip 
+        the regex search entirely. cost is only used to rank stages
+    '''
+
+    __slots__ = ("name", "check", "cost", "prefilter", "checked", "rejected")
+
+    def __init__(self, name, check, cost, prefilter=False): 
+        self.name = name
+        self.check = check
+        self.cost = cost
+        self.prefilter = prefilter
+        self.checked = 0
+        self.rejected = 0
+
+    def rank(self): 
+        '''
+        Function to order stages, lower ranks run first
+        Prefilters always run before regexes, then stages that reject 
+            the most lines per unit of cost go first
+        '''
+        
+        rejection_rate = (self.rejected + 1) / (self.checked + 2)
+        return (not self.prefilter, -rejection_rate / self.cost)
+
+    def rows(self): 
+        '''
+        Function to list the (name, checked, rejected) rows --stats shows 
+            for the stage
+        '''
+        
+        return [(self.name, self.checked, self.rejected)]
+
+
+class PatternStage(FilterStage): 
+    '''
+    The check for -e, -k, and --keywords, which also counts the lines 
+        matched by each regex and keyword
+    A line is credited to the first filter found in it
+    '''
+
+    __slots__ = ("matched",)
+
+    def __init__(self, patterns): 
+        matched = Counter()
+        search = patterns.search
+
+        def check(line): 
+            label = search(line)
+            if label is None: 
+                return False
+            matched[label] += 1
+            return True
+
+        super().__init__("pattern scan", check, 6)
+        self.matched = matched
+
+    def rows(self): 
+        return super().rows() + [
+            (label, self.checked, self.checked - count) 
+            for label, count in self.matched.most_common()
+        ]
+
+
+def add_stage_counts(counts, stages): 
+    '''
+    Function to add the [checked, rejected] line counts of FilterStages 
+        to a dict
+    '''
+    
+    for stage in stages: 
+        for name, checked, rejected in stage.rows(): 
+            add_counts(counts, name, checked, rejected)
+
+
+def build_filter_stages(timestamps, ipv4, ipv6, ip_sets=(), patterns=None): 
+    '''
+    Function to build the prefilter and regex stages for -t, -i, and -I, 
+        a lookup stage for each (IPSet, inside) pair of --ip-in and 
+        --ip-not-in, and a PatternStage for a PatternSet
+    A timestamp needs a colon, an IPv6 address needs seven colons and an 
+        IPv4 address needs three dots, and str methods check for these 
+        far faster than the patterns can be searched
+    '''
+    
+    stages = []
+    if timestamps: 
+        stages += [
+            FilterStage(
+                "timestamp prefilter", lambda line: ":" in line, 1, True),
+            FilterStage(
+                "timestamp regex", re.compile(TIMESTAMP_PAT).search, 4),
+        ]
+    if ipv6: 
+        stages += [
+            FilterStage(
+                "ipv6 prefilter", lambda line: line.count(":") >= 7, 1, True),
+            FilterStage("ipv6 regex", re.compile(IPV6_PAT).search, 6),
+        ]
+    if ipv4: 
+        stages += [
+            FilterStage(
+                "ipv4 prefilter", lambda line: line.count(".") >= 3, 1, True),
+            FilterStage("ipv4 regex", re.compile(IPV4_PAT).search, 8),
+        ]
+    if ip_sets: 
+        stages.append(FilterStage(
+            "ip prefilter", 
+            lambda line: line.count(".") >= 3 or line.count(":") >= 7, 
+            1, True))
+    for ip_set, inside in ip_sets: 
+        stages.append(FilterStage(
+            "ip-in lookup" if inside else "ip-not-in lookup", 
+            lambda line, ip_set=ip_set, inside=inside: (
+                ip_set.match(line) is inside), 
+            10))
+    if patterns is not None: 
+        stages.append(PatternStage(patterns))
+    stages.sort(key=FilterStage.rank)
+    return stages
+
+
+def iter_matching_lines(
+        buf, start, end, timestamps, ipv4, ipv6, counts=None): 
+    '''
+    Generator that yields the lines of buf[start:end] that pass -t, -i, 
+        and -I as bytes
+    '''
+    
+    for line_start, line_end in iter_matching_spans(
+            buf, start, end, timestamps, ipv4, ipv6, counts): 
+        yield buf[line_start:line_end]
+
+
+def filter_kinds(timestamps, ipv4, ipv6): 
+    '''
+    Function to list the kinds of match, out of "timestamp", "ipv4", and 
+        "ipv6", that -t, -i, and -I ask for
+    '''
+    
+    return [
+        kind for kind, flag in zip(PATTERNS, (timestamps, ipv4, ipv6)) if flag
+    ]
+
+
+def iter_matching_spans(
+        buf, start, end, timestamps, ipv4, ipv6, counts=None): 
+    '''
+    Generator that yields (start, end) byte offsets of the lines of 
+        buf[start:end] that pass -t, -i, and -I
+    start must be the beginning of a line. A prefilter pattern that starts 
+        with a literal, and so can be searched for at memchr speed, finds 
+        candidate lines across the whole region, and the full patterns are 
+        only tried on those lines. If a counts dict is given, [checked, 
+        rejected] line counts are added to it for each stage
+    '''
+    
+    # IPs lead, as their prefilters pass fewer lines than a timestamp's
+    kinds = filter_kinds(timestamps, ipv4, ipv6)
+    kinds.sort(key="timestamp".__eq__)
+    search = re.compile(PREFILTER_PATS[kinds[0]]).search
+    searches = [re.compile(PATTERNS[kind].encode()).search for kind in kinds]
+    text_searches = [re.compile(PATTERNS[kind]).search for kind in kinds]
+    non_ascii = NON_ASCII_RE.search
+    find, rfind = buf.find, buf.rfind
+    candidates = passed = 0
+    
+    pos = start
+    while True: 
+        match = search(buf, pos, end)
+        if match is None: 
+            break
+        hit = match.start()
+        line_start = rfind(b"\n", start, hit) + 1 or start
+        line_end = find(b"\n", hit, end) + 1 or end
+        pos = line_end
+        candidates += 1
+        if not all(search(buf, line_start, line_end) for search in searches): 
+            continue
+        
+        # \b only treats ASCII as word characters in a bytes pattern, so 
+        # lines with other characters are confirmed on their decoded text
+        if non_ascii(buf, line_start, line_end): 
+            text = buf[line_start:line_end].decode(errors="replace")
+            if not all(text_search(text) for text_search in text_searches): 
+                continue
+        passed += 1
+        yield line_start, line_end
+
+    if counts is not None: 
+        # Lines without a prefilter hit are rejected by the scan itself
+        lines = count_lines(buf, start, end)
+        add_counts(
+            counts, f"{kinds[0]} prefilter scan", lines, lines - candidates)
+        add_counts(
+            counts, f"{'/'.join(kinds)} regex", candidates, 
+            candidates - passed)
+
+
+def count_lines(buf, start, end): 
+    '''
+    Function to count the lines in buf[start:end] a block at a time
+    An unterminated last line still counts as a line
+    '''
+    
+    lines = 0
+    with memoryview(buf) as view: 
+        for pos in range(start, end, BLOCK_SIZE): 
+            lines += bytes(view[pos:min(pos + BLOCK_SIZE, end)]).count(b"\n")
+    if end > start and buf[end - 1] != 10: 
+        lines += 1
+    return lines
+
+
+def add_counts(counts, name, checked, rejected): 
+    '''
+    Function to add [checked, rejected] line counts for a stage to a dict
+    '''
+    
+    totals = counts.setdefault(name, [0, 0])
+    totals[0] += checked
+    totals[1] += rejected
+
+
+def iter_matching_runs(
+        buf, start, end, timestamps, ipv4, ipv6, counts=None, 
+        engine="python"): 
+    '''
+    Generator that yields runs of consecutive lines of buf[start:end] that 
+        pass -t, -i, and -I as bytes
+    The numpy engine finds the runs with vectorized scans if NumPy is 
+        installed, otherwise each line from iter_matching_lines is a run 
+        of its own
+    '''
+    
+    if engine != "numpy" or numpy is None: 
+        yield from iter_matching_lines(
+            buf, start, end, timestamps, ipv4, ipv6, counts)
+        return
+    for run_start, run_end in iter_vectorized_runs(
+            buf, start, end, timestamps, ipv4, ipv6, counts): 
+        yield buf[run_start:run_end]
+
+
+def iter_vectorized_runs(
+        buf, start, end, timestamps, ipv4, ipv6, counts=None): 
+    '''
+    Generator that yields (start, end) byte offsets of the runs of 
+        consecutive lines of buf[start:end] that pass -t, -i, and -I, for 
+        the numpy engine
+    start must be the beginning of a line. Each block of lines is loaded 
+        as a uint8 array and all of its newlines are found in one call. 
+        Every match of each filter is then found exactly with vectorized 
+        comparisons, and mapped to its line through the newline positions. 
+        \b only treats ASCII as word characters in bytes, so lines with 
+        other characters are confirmed on their decoded text
+    '''
+    
+    kinds = filter_kinds(timestamps, ipv4, ipv6)
+    text_searches = [re.compile(PATTERNS[kind]).search for kind in kinds]
+    prefilters = [re.compile(PREFILTER_PATS[kind]).search for kind in kinds]
+    pad = NUMPY_PADDING
+    
+    pos = start
+    while pos < end: 
+        stop = end
+        if end - pos > NUMPY_BLOCK_SIZE: 
+            stop = buf.rfind(b"\n", pos, pos + NUMPY_BLOCK_SIZE) + 1 or (
+                buf.find(b"\n", pos + NUMPY_BLOCK_SIZE, end) + 1 or end)
+        
+        # Zero bytes around the block stand in for the line breaks around 
+        # it, and keep every byte probed next to a match inside the array
+        data = numpy.zeros(stop - pos + 2 * pad, numpy.uint8)
+        data[pad:-pad] = numpy.frombuffer(buf[pos:stop], numpy.uint8)
+        newlines = numpy.flatnonzero(data == 10)
+        line_count = len(newlines) + (buf[stop - 1] != 10)
+        passed = numpy.ones(line_count, bool)
+        checked = line_count
+        for kind, prefilter in zip(kinds, prefilters): 
+            # A block without a single prefilter hit is skipped at memchr 
+            # speed
+            found = numpy.zeros(line_count, bool)
+            if prefilter(buf, pos, stop): 
+                hits = VECTORIZED_FINDERS[kind](data)
+                found[numpy.searchsorted(newlines, hits)] = True
+            passed &= found
+            if counts is not None: 
+                matched = int(numpy.count_nonzero(passed))
+                add_counts(
+                    counts, f"{kind} vector scan", checked, checked - matched)
+                checked = matched
+        
+        line_starts = numpy.concatenate(([pad], newlines + 1))[:line_count]
+        line_ends = numpy.append(newlines + 1, len(data) - pad)[:line_count]
+        non_ascii = numpy.unique(numpy.searchsorted(
+            newlines, numpy.flatnonzero(data >= 128)))
+        non_ascii = non_ascii[passed[non_ascii]]
+        for line in non_ascii.tolist(): 
+            text = bytes(data[line_starts[line]:line_ends[line]]).decode(
+                errors="replace")
+            if not all(text_search(text) for text_search in text_searches): 
+                passed[line] = False
+        if counts is not None and len(non_ascii): 
+            add_counts(counts, "non-ascii regex", len(non_ascii), 
+                len(non_ascii) - int(numpy.count_nonzero(passed[non_ascii])))
+        
+        edges = numpy.diff(passed.view(numpy.int8), prepend=0, append=0)
+        offset = pos - pad
+        for first, last in zip(
+                line_starts[edges[:-1] == 1].tolist(), 
+                line_ends[edges[1:] == -1].tolist()): 
+            yield offset + first, offset + last
+        pos = stop
+
+
+def find_timestamps(data): 
+    '''
+    Function to find where timestamps in HH:MM:SS format start in a 
+        padded uint8 array, matching TIMESTAMP_PAT
+    '''
+    
+    colons = numpy.flatnonzero(data == 58)
+    at = colons[data[colons + 3] == 58]
+    tens, hours = data[at - 2], data[at - 1]
+    hit = (((tens == 48) | (tens == 49)) & DIGIT_BYTES[hours]) | (
+        (tens == 50) & (hours >= 48) & (hours <= 51))
+    hit &= SIXTY_BYTES[data[at + 1]] & DIGIT_BYTES[data[at + 2]]
+    hit &= SIXTY_BYTES[data[at + 4]] & DIGIT_BYTES[data[at + 5]]
+    hit &= ~WORD_BYTES[data[at - 3]] & ~WORD_BYTES[data[at + 6]]
+    return at[hit]
+
+
+def find_ipv4(data): 
+    '''
+    Function to find where IPv4 addresses start in a padded uint8 array, 
+        matching IPV4_PAT
+    '''
+    
+    def octets(starts, lengths): 
+        # A three digit octet can't be above 255
+        value = data[starts].astype(numpy.int16) * 100 - 48 * 111
+        value += data[starts + 1].astype(numpy.int16) * 10 + data[starts + 2]
+        return (lengths < 3) | (value <= 255)
+
+    return find_groups(data, DIGIT_BYTES, 46, 4, 3, octets)
+
+
+def find_ipv6(data): 
+    '''
+    Function to find where IPv6 addresses in standard notation start in a 
+        padded uint8 array, matching IPV6_PAT
+    '''
+    
+    return find_groups(data, HEX_BYTES, 58, 8, 4)
+
+
+def find_groups(data, members, separator, groups, width, valid=None): 
+    '''
+    Function to find where groups runs of member bytes, each at most width 
+        long and joined by single separator bytes, start in a padded uint8 
+        array, with no word character on either side
+    A regex can only match a whole run here, since a match that ends or 
+        starts inside a run has no \b there. valid can reject runs given 
+        their starts and lengths
+    '''
+    
+    edges = numpy.diff(members[data].view(numpy.int8))
+    starts = numpy.flatnonzero(edges == 1) + 1
+    ends = numpy.flatnonzero(edges == -1) + 1
+    count = len(starts) - groups + 1
+    if count <= 0: 
+        return starts[:0]
+    lengths = ends - starts
+    fits = lengths <= width
+    if valid is not None: 
+        fits &= valid(starts, lengths)
+    joined = fits[:-1] & fits[1:] & (data[ends[:-1]] == separator)
+    joined &= starts[1:] == ends[:-1] + 1
+    hit = ~WORD_BYTES[data[starts[:count] - 1]]
+    hit &= ~WORD_BYTES[data[ends[groups - 1:]]]
+    for group in range(groups - 1): 
+        hit &= joined[group:group + count]
+    return starts[:count][hit]
+
+
+def byte_table(characters): 
+    '''
+    Function to build a lookup table of the bytes in characters, indexed by 
+        a uint8 array to test every byte in it at once
+    '''
+    
+    table = numpy.zeros(256, bool)
+    table[list(characters.encode())] = True
+    return table
+
+
+if numpy is not None: 
+    DIGIT_BYTES = byte_table("0123456789")
+    SIXTY_BYTES = byte_table("012345")
+    HEX_BYTES = byte_table("0123456789abcdefABCDEF")
+    WORD_BYTES = byte_table(
+        "0123456789abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ_")
+    VECTORIZED_FINDERS = {
+        "timestamp": find_timestamps, "ipv4": find_ipv4, "ipv6": find_ipv6, 
+    }
+
+
+def scan_chunk(
+        path, start, stop, timestamps, ipv4, ipv6, stats=False, 
+        highlight=False, engine="python"): 
+    '''
+    Function run by --jobs worker processes to filter one byte range of a 
+        file, start and stop must fall on line boundaries
+    Returns (matches, counts) where matches holds the matching lines as 
+        bytes, or as text when IPs are highlighted, and counts holds the 
+        stage counts if stats is set
+    '''
+    
+    with open(path, "rb") as file: 
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buf: 
+            return filter_buffer(
+                buf, start, stop, timestamps, ipv4, ipv6, stats, highlight, 
+                engine)
+
+
+def scan_block(
+        block, timestamps, ipv4, ipv6, stats=False, highlight=False, 
+        engine="python"): 
+    '''
+    Function run by --jobs worker processes for --pipeline to filter a 
+        block of whole lines
+    Returns (matches, counts) like scan_chunk
+    '''
+    
+    return filter_buffer(
+        block, 0, len(block), timestamps, ipv4, ipv6, stats, highlight, 
+        engine)
+
+
+def filter_buffer(
+        buf, start, stop, timestamps, ipv4, ipv6, stats, highlight, 
+        engine="python"): 
+    '''
+    Function to filter the lines of buf[start:stop] for scan_chunk and 
+        scan_block
+    '''
+    
+    counts = {} if stats else None
+    if not highlight: 
+        return b"".join(iter_matching_runs(
+            buf, start, stop, timestamps, ipv4, ipv6, counts, engine)), counts
+    matches = iter_matching_lines(
+        buf, start, stop, timestamps, ipv4, ipv6, counts)
+    line_filter = logParserUtil().build_line_filter(
+        argparse.Namespace(timestamps=timestamps, ipv4=ipv4, ipv6=ipv6), 
+        highlight=True)
+    matches = "".join(line_filter(line.decode()) for line in matches)
+    return matches, counts
+
+
+def scan_gzip_members(
+        path, start, stop, timestamps, ipv4, ipv6, stats=False, 
+        engine="python"): 
+    '''
+    Function run by --jobs worker processes to decompress and filter the 
+        gzip members in one byte range of a file
+    Returns (head, matches, tail, lines, size, counts). head holds the 
+        data up to and including the first newline, which may finish a 
+        line begun in an earlier range, tail holds the data after the last 
+        newline, and matches holds the matching lines in between. lines 
+        counts the newlines and size the bytes decompressed. Returns None 
+        if start is not the beginning of a member, the last member does 
+        not end exactly at stop, or the data contains carriage returns
+    '''
+    
+    counts = {} if stats else None
+    head, tail, matches, lines, size = None, b"", [], 0, 0
+    with open(path, "rb") as file: 
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buf: 
+            pos = start
+            while pos < stop: 
+                member = zlib.decompressobj(16 + zlib.MAX_WBITS)
+                while not member.eof: 
+                    block = buf[pos:min(pos + BLOCK_SIZE, stop)]
+                    if not block: 
+                        return None
+                    try: 
+                        data = member.decompress(block)
+                    except zlib.error: 
+                        return None
+                    pos += len(block) - len(member.unused_data)
+                    if b"\r" in data: 
+                        return None
+                    lines += data.count(b"\n")
+                    size += len(data)
+                    if head is None: 
+                        newline = data.find(b"\n")
+                        if newline == -1: 
+                            tail += data
+                            continue
+                        head = tail + data[:newline + 1]
+                        tail, data = b"", data[newline + 1:]
+                    data = tail + data
+                    end = data.rfind(b"\n") + 1
+                    tail = data[end:]
+                    matches.extend(iter_matching_runs(
+                        data, 0, end, timestamps, ipv4, ipv6, counts, engine))
+    if pos != stop: 
+        return None
+    if head is None: 
+        head, tail = tail, b""
+    return head, b"".join(matches), tail, lines, size, counts
+
+
+class DecompressionError(Exception): 
+    '''
+    Raised when compressed input turns out to be damaged or truncated
+    '''
+
+
+class Match(namedtuple("Match", ["number", "offset", "line", "spans"])): 
+    '''
+    A line yielded by iter_matches
+    number is the line's number in the input, counting from 1, and offset 
+        the byte offset it starts at, or None for a text stream. line is 
+        the decoded line without its line ending, and spans holds the 
+        sorted (start, end) positions in line of every timestamp and IP 
+        address the filters looked for
+    '''
+
+    __slots__ = ()
+
+
+def iter_matches(
+        source, first=None, last=None, timestamps=False, ipv4=False, 
+        ipv6=False, encoding="utf-8", errors="replace"): 
+    '''
+    Generator that yields a Match for each line of source within the 
+        intersection of first and last that passes the filters, the 
+        library counterpart of util.py's -f, -l, -t, -i, and -I
+    source is a path or a binary or text stream, which is left open. 
+        Compressed input is decompressed, nothing is printed, and the 
+        spans say where IPs are instead of highlighting them. Regular 
+        files are memory mapped and scanned as bytes like FILE is
+    Raises OSError if source can't be read, or DecompressionError if 
+        compressed input is damaged
+    '''
+    
+    kinds = filter_kinds(timestamps, ipv4, ipv6)
+    if isinstance(source, (str, bytes, os.PathLike)): 
+        with open(source, "rb") as stream: 
+            yield from stream_matches(
+                stream, first, last, kinds, encoding, errors)
+    else: 
+        yield from stream_matches(
+            source, first, last, kinds, encoding, errors)
+
+
+def stream_matches(stream, first, last, kinds, encoding, errors): 
+    '''
+    Generator behind iter_matches, for a binary or text stream and the 
+        names of the PATTERNS that each line must match
+    '''
+    
+    if isinstance(stream, io.TextIOBase): 
+        lines = ((None, line) for line in stream)
+        yield from window_matches(lines, first, last, kinds, None, None)
+        return
+    
+    # Bytes can only be split at newlines in ASCII-compatible encodings
+    if codecs.lookup(encoding).name not in BYTE_SEEKABLE_ENCODINGS: 
+        text = io.TextIOWrapper(stream, encoding=encoding, errors=errors)
+        try: 
+            yield from stream_matches(
+                text, first, last, kinds, encoding, errors)
+        finally: 
+            text.detach()
+        return
+    
+    magic = b""
+    try: 
+        if hasattr(stream, "peek"): 
+            magic = stream.peek(10)
+        elif stream.seekable(): 
+            pos = stream.tell()
+            magic = stream.read(10)
+            stream.seek(pos)
+    except (AttributeError, OSError, ValueError): 
+        pass
+    for header, decompressor in COMPRESSED_FORMATS: 
+        if decompressor is not None and header.match(magic): 
+            name = getattr(stream, "name", "input")
+            try: 
+                with decompressor(stream) as decompressed: 
+                    yield from stream_matches(
+                        decompressed, first, last, kinds, encoding, errors)
+            except DECOMPRESSION_ERRORS as error: 
+                raise DecompressionError(
+                    f"can't decompress '{name}': {error}") from error
+            return
+    
+    try: 
+        fd = stream.fileno()
+        info = os.fstat(fd)
+        mappable = (
+            stat.S_ISREG(info.st_mode) and info.st_size 
+            and stream.tell() == 0)
+    except (AttributeError, OSError, ValueError): 
+        mappable = False
+    if mappable: 
+        with mmap.mmap(fd, 0, access=mmap.ACCESS_READ) as buf: 
+            yield from mapped_matches(
+                buf, fd, info.st_size, first, last, kinds, encoding, errors)
+        return
+
+    def with_offsets(stream): 
+        offset = 0
+        for line in stream: 
+            yield offset, line
+            offset += len(line)
+
+    yield from window_matches(
+        with_offsets(stream), first, last, kinds, encoding, errors)
+
+
+def window_matches(lines, first, last, kinds, encoding, errors): 
+    '''
+    Generator that yields a Match for each of the (offset, line) pairs 
+        within the intersection of first and last that passes the filters 
+        named by kinds
+    '''
+    
+    records = (
+        (number, offset, line) 
+        for number, (offset, line) in enumerate(lines, 1)
+    )
+    yield from record_matches(
+        logParserUtil().stream_lines(records, first, last), kinds, 
+        encoding, errors)
+
+
+def record_matches(records, kinds, encoding, errors): 
+    '''
+    Generator that yields a Match for each (number, offset, line) record 
+        that passes the filters named by kinds
+    Lines given as bytes are decoded with encoding and errors
+    '''
+    
+    stages = build_filter_stages(*(kind in kinds for kind in PATTERNS))
+    finders = [re.compile(PATTERNS[kind]).finditer for kind in kinds]
+    for number, offset, line in records: 
+        if isinstance(line, bytes): 
+            line = line.decode(encoding, errors)
+        line = line.rstrip("\r\n")
+        if not all(stage.check(line) for stage in stages): 
+            continue
+        yield Match(number, offset, line, match_spans(finders, line))
+
+
+def mapped_matches(buf, fd, size, first, last, kinds, encoding, errors): 
+    '''
+    Generator that yields a Match for each matching line of a memory 
+        mapped file
+    The window is located with byte offsets and the filters run over the 
+        mapped bytes, so only matching lines are decoded
+    '''
+    
+    start, stop, _, _ = logParserUtil().byte_window(fd, size, first, last)
+    if start < stop: 
+        yield from buffer_matches(
+            buf, start, stop, count_lines(buf, 0, start), kinds, encoding, 
+            errors)
+
+
+def buffer_matches(buf, start, stop, number, kinds, encoding, errors, base=0): 
+    '''
+    Generator that yields a Match for each line of buf[start:stop] that 
+        passes the filters named by kinds
+    start must be the beginning of a line, preceded by number lines, and 
+        offsets are given from base at the start of buf. Line numbers are 
+        found by counting the newlines skipped between matches
+    '''
+    
+    if kinds: 
+        flags = [kind in kinds for kind in PATTERNS]
+        spans = iter_matching_spans(buf, start, stop, *flags)
+    else: 
+        spans = iter_line_spans(buf, start, stop)
+    finders = [re.compile(PATTERNS[kind]).finditer for kind in kinds]
+    
+    pos = start
+    for line_start, line_end in spans: 
+        if line_start > pos: 
+            number += count_lines(buf, pos, line_start)
+        number += 1
+        pos = line_end
+        line = buf[line_start:line_end].decode(encoding, errors)
+        line = line.rstrip("\r\n")
+        yield Match(
+            number, base + line_start, line, match_spans(finders, line))
+
+
+def match_spans(finders, line): 
+    '''
+    Function to give the sorted (start, end) spans of every match of the 
+        finditer methods in finders in line, as a tuple
+    '''
+    
+    spans = []
+    for finditer in finders: 
+        spans += map(re.Match.span, finditer(line))
+    if len(finders) > 1: 
+        spans.sort()
+    return tuple(spans)
+
+
+def iter_line_spans(buf, start, end): 
+    '''
+    Generator that yields the (start, end) byte offsets of every line of 
+        buf[start:end], start must be the beginning of a line
+    '''
+    
+    find = buf.find
+    while start < end: 
+        line_end = find(b"\n", start, end) + 1 or end
+        yield start, line_end
+        start = line_end
+
+
+def match_block(block, number, offset, kinds, encoding, errors): 
+    '''
+    Function to give the Matches of a block of whole lines as a list, for 
+        aiter_matches to run in an executor
+    '''
+    
+    return list(buffer_matches(
+        block, 0, len(block), number, kinds, encoding, errors, offset))
+
+
+def match_records(records, kinds, encoding, errors): 
+    '''
+    Function to give the Matches of (number, offset, line) records as a 
+        list, for aiter_matches to run in an executor
+    '''
+    
+    return list(record_matches(records, kinds, encoding, errors))
+
+
+async def read_chunks(reader, size): 
+    '''
+    Async generator that yields chunks of up to size bytes read from an 
+        asyncio.StreamReader until the end of its stream
+    '''
+    
+    while True: 
+        chunk = await reader.read(size)
+        if not chunk: 
+            return
+        yield chunk
+
+
+async def aiter_matches(
+        source, first=None, last=None, timestamps=False, ipv4=False, 
+        ipv6=False, encoding="utf-8", errors="replace", executor=None, 
+        block_size=STREAM_BLOCK_SIZE, offload_size=ASYNC_OFFLOAD_SIZE): 
+    '''
+    Async generator that yields a Match for each line of source within the 
+        intersection of first and last that passes the filters, the asyncio 
+        counterpart of iter_matches
+    source is an asyncio.StreamReader, read block_size bytes at a time, or 
+        an async iterator of bytes chunks. The whole lines of each chunk 
+        are filtered as soon as it arrives, and nothing more is read until 
+        their matches have been consumed, so a slow consumer holds back 
+        its stream. Lines of chunks of at least offload_size bytes are 
+        filtered in executor, or the event loop's default executor if it 
+        is None, so the event loop keeps serving other streams. Offsets 
+        count bytes from the start of source
+    Raises ValueError if encoding isn't ASCII-compatible, as lines are 
+        split as bytes
+    '''
+    
+    if codecs.lookup(encoding).name not in BYTE_SEEKABLE_ENCODINGS: 
+        raise ValueError(f"can't split {encoding} input into lines")
+    kinds = filter_kinds(timestamps, ipv4, ipv6)
+    if hasattr(source, "read"): 
+        source = read_chunks(source, block_size)
+    loop = asyncio.get_running_loop()
+
+    async def run(function, size, *args): 
+        if size >= offload_size: 
+            return await loop.run_in_executor(executor, function, *args)
+        return function(*args)
+    
+    window = LineWindow(first, last)
+    number = offset = 0
+    rest = b""
+    if window.done: 
+        return
+    async for chunk in source: 
+        data = rest + bytes(chunk)
+        end = data.rfind(b"\n") + 1
+        block, rest = data[:end], data[end:]
+        if not block: 
+            continue
+        if window.unbounded: 
+            matches = await run(
+                match_block, len(block), block, number, offset, kinds, 
+                encoding, errors)
+            number += block.count(b"\n")
+            offset += len(block)
+        else: 
+            # -f and -l count every line, so the window is kept here and 
+            # only the lines it releases are filtered
+            records = []
+            for line in block[:-1].split(b"\n"): 
+                number += 1
+                records += window.push((number, offset, line))
+                offset += len(line) + 1
+                if window.done: 
+                    break
+            matches = await run(
+                match_records, len(block), records, kinds, encoding, errors)
+        for match in matches: 
+            yield match
+        if window.done: 
+            return
+    
+    # An unterminated last line is still a line
+    if window.unbounded: 
+        matches = await run(
+            match_block, len(rest), rest, number, offset, kinds, encoding, 
+            errors)
+    else: 
+        records = list(window.push((number + 1, offset, rest))) if rest else []
+        records += window.finish()
+        matches = await run(
+            match_records, sum(len(record[2]) for record in records), 
+            records, kinds, encoding, errors)
+    for match in matches: 
+        yield match
+
+
+def has_filters(args): 
+    '''
+    Function to check whether any filter is given, so that not every line 
+        is printed
+    '''
+    
+    return bool(args.timestamps or args.ipv4 or args.ipv6 
+        or has_text_filters(args))
+
+
+def has_text_filters(args): 
+    '''
+    Function to check whether a filter is given that only works on decoded 
+        lines, --ip-in, --ip-not-in, -e, -k, and --keywords, which keeps 
+        the input from being filtered as bytes
+    '''
+    
+    return bool(args.ip_sets or args.patterns)
+
+
+def canonical_addresses(keys, kind): 
+    '''
+    Function to put IPv4 or IPv6 addresses found as bytes in the form 
+        ipaddress prints them, so every way of writing an address is 
+        counted as one key
+    IPv4 octets and IPv6 groups lose their leading zeros, and IPv6 
+        addresses are lowercased with their longest run of zero groups 
+        shortened to ::. Each distinct address is rewritten once, and keys 
+        is returned as it is if none of them changed
+    '''
+    
+    unique = list(set(keys))
+    joined = b"\n".join(unique)
+    if kind == "ipv6": 
+        joined = joined.lower()
+    trimmed = LEADING_ZEROS.sub(b"", joined)
+    if kind == "ipv4" and trimmed == joined: 
+        return keys
+    changed = {}
+    for key, canonical in zip(unique, trimmed.split(b"\n")): 
+        # Only a run of zero groups is shortened, which needs two in a row
+        if kind == "ipv6" and b"0:0" in canonical: 
+            canonical = ipaddress.IPv6Address(
+                canonical.decode()).compressed.encode()
+        if canonical != key: 
+            changed[key] = canonical
+    if not changed: 
+        return keys
+    return [changed.get(key, key) for key in keys]
+
+
+def key_counter(args): 
+    '''
+    Returns the TopCounter for --top or the DistinctCounter for 
+        --count-distinct, or None when lines are printed
+    '''
+    
+    if args.top is not None: 
+        return TopCounter(args.by, args.counters)
+    if args.count_distinct is not None: 
+        return DistinctCounter(args.count_distinct, args.precision)
+    return None
+
+
+def scan_path(path, args, encoding, errors, color, stats): 
+    '''
+    Function run for each of several FILEs, in worker processes when 
+        --jobs is above 1, to filter one file
+    Returns (output, stats, error) where output is the result of the 
+        file's OutputSpool, or the file's counter with --top or 
+        --count-distinct, stats holds the file's RunStats if stats is set, 
+        and error describes why the file couldn't be read, if it couldn't
+    '''
+    
+    parser = logParserUtil()
+    spool = OutputSpool(f"{path}:".encode(encoding, "replace"))
+    stream = io.TextIOWrapper(spool, encoding=encoding, errors=errors)
+    counter = key_counter(args)
+    parser.writer = counter or OutputWriter(
+        stream, "always" if color else "never")
+    parser.highlight = color and (args.ipv4 or args.ipv6)
+    parser.stats = RunStats() if stats else None
+    try: 
+        args.file = open(path)
+    except OSError as error: 
+        return b"", parser.stats, f"can't open '{path}': {error}"
+    try: 
+        parser.scan(args)
+    except DecompressionError as error: 
+        spool.discard()
+        return b"", parser.stats, str(error)
+    except BaseException: 
+        spool.discard()
+        raise
+    finally: 
+        parser.writer.flush()
+    if counter is not None: 
+        return counter, parser.stats, None
+    return spool.result(), parser.stats, None
+
+
+class OutputSpool(io.RawIOBase): 
+    '''
+    Binary stream collecting the output of one of several FILEs, with each 
+        line prefixed by the file's name
+    The output is kept in memory up to SPOOL_SIZE bytes and moved to a 
+        temporary file beyond that, so a worker never holds more than that 
+        of a file's lines however many of them match
+    '''
+
+    def __init__(self, prefix): 
+        self.prefix = prefix
+        self.line_start = True
+        self.memory = io.BytesIO()
+        self.file = None
+
+    def writable(self): 
+        return True
+
+    def write(self, data): 
+        data = bytes(data)
+        if not data: 
+            return 0
+        lines = data.replace(b"\n", b"\n" + self.prefix)
+        if data.endswith(b"\n"): 
+            lines = lines[:len(lines) - len(self.prefix)]
+        if self.line_start: 
+            lines = self.prefix + lines
+        self.line_start = data.endswith(b"\n")
+        
+        if (self.file is None 
+                and self.memory.tell() + len(lines) > SPOOL_SIZE): 
+            self.file = tempfile.NamedTemporaryFile(
+                prefix="lp-", suffix=".out", delete=False)
+            self.file.write(self.memory.getbuffer())
+            self.memory = None
+        (self.file or self.memory).write(lines)
+        return len(data)
+
+    def result(self): 
+        '''
+        Function to finish an unterminated last line
+        Returns the output as bytes if it was kept in memory, or the name 
+            of the temporary file holding it, which is for the caller to 
+            remove
+        '''
+        
+        if not self.line_start: 
+            self.write(b"\n")
+        if self.file is None: 
+            return self.memory.getvalue()
+        self.file.close()
+        return self.file.name
+
+    def discard(self): 
+        '''
+        Function to drop the output, removing any temporary file
+        '''
+        
+        if self.file is not None: 
+            self.file.close()
+            discard_output(self.file.name)
+
+
+def discard_output(output): 
+    '''
+    Function to remove the temporary file of a FILE's output that won't be 
+        printed, if its output is in one
+    '''
+    
+    if isinstance(output, str): 
+        try: 
+            os.unlink(output)
+        except OSError: 
+            pass
+
+
+def write_atomically(path, write): 
+    '''
+    Function to write a file by calling write with it open in binary mode, 
+        replacing any older file at path in one step so a reader never sees 
+        half of it
+    Raises OSError if it can't be written, leaving no partial file behind
+    '''
+    
+    partial = f"{path}.{os.getpid()}.tmp"
+    try: 
+        with open(partial, "wb") as file: 
+            write(file)
+        os.replace(partial, path)
+    except OSError: 
+        try: 
+            os.unlink(partial)
+        except OSError: 
+            pass
+        raise
+
+
+class LineIndex: 
+    '''
+    Line start offsets of a file and a byte of feature bits for each line
+    The index records the size, mtime, device, and inode of the file it was 
+        built from, along with the end of its last line and a digest of 
+        samples of its contents. A file that has only been appended to 
+        since is indexed from where the index left off, and any other 
+        change means the index is rebuilt. On disk it is a header followed 
+        by the offsets, the feature bytes, and the end of the last line, 
+        and the offsets and feature bytes are used straight from a memory 
+        map when loaded
+    '''
+
+    # The offsets are stored in native byte order, which the magic records
+    MAGIC = b"LPIDX3" + (b"L" if sys.byteorder == "little" else b"B") + b"\0"
+    HEADER = struct.Struct("=8sQQQQQQ16s")
+
+    # Most bytes from the end of the last line kept to check appends against
+    TAIL_SIZE = 4096
+
+    # Bytes hashed at each of SAMPLES evenly spaced offsets of the indexed 
+    # contents, so a file rewritten in place isn't taken for appended to
+    SAMPLES = 64
+    SAMPLE_SIZE = 512
+
+    def __init__(self, identity, offsets, features, tail=b"", digest=b""): 
+        self.identity = identity
+        self.offsets = offsets
+        self.features = features
+        self.tail = tail
+        self.digest = digest
+
+    @staticmethod
+    def identity_of(fd): 
+        '''
+        Function to give the (size, mtime, device, inode) an index is 
+            checked against
+        '''
+        
+        info = os.fstat(fd)
+        return (info.st_size, info.st_mtime_ns, info.st_dev, info.st_ino)
+
+    @classmethod
+    def build(cls, buf, identity): 
+        '''
+        Function to index a mapped file
+        The feature bits come from the same scan as -t, -i, and -I, so an 
+            index never disagrees with a scan of the file
+        '''
+        
+        index = cls(identity, array("Q", [0]), bytearray())
+        index.scan(buf)
+        return index
+
+    def scan(self, buf): 
+        '''
+        Function to index the lines from the last offset up to the size in 
+            the index's identity
+        '''
+        
+        offsets, features, size = self.offsets, self.features, self.identity[0]
+        start = offsets[-1]
+        append, find = offsets.append, buf.find
+        pos = find(b"\n", start, size)
+        while pos != -1: 
+            append(pos + 1)
+            pos = find(b"\n", pos + 1, size)
+        if offsets[-1] != size: 
+            append(size)
+        
+        features.extend(bytes(len(offsets) - 1 - len(features)))
+        for kind, bit in FEATURE_BITS.items(): 
+            flags = [kind == "timestamp", kind == "ipv4", kind == "ipv6"]
+            spans = iter_matching_spans(buf, start, size, *flags)
+            for line_start, _ in spans: 
+                features[bisect.bisect_right(offsets, line_start) - 1] |= bit
+        
+        last = offsets[-2] if len(offsets) > 1 else 0
+        self.tail = bytes(buf[max(last, size - self.TAIL_SIZE):size])
+        self.digest = self.sample_digest(buf, size)
+
+    @classmethod
+    def sample_digest(cls, buf, size): 
+        '''
+        Function to hash evenly spaced samples of the first size bytes of a 
+            file
+        '''
+        
+        digest = hashlib.blake2b(digest_size=16)
+        for i in range(cls.SAMPLES): 
+            start = size * i // cls.SAMPLES
+            digest.update(buf[start:min(start + cls.SAMPLE_SIZE, size)])
+        return digest.digest()
+
+    def appended_to(self, buf, identity): 
+        '''
+        Function to check whether a file has only been appended to since 
+            the index was built
+        The file must be the same inode and larger, so one rewritten in 
+            place at the same size is stale, and its old contents must 
+            still end with the same last line and hash to the same samples
+        '''
+        
+        size, _, device, inode = self.identity
+        return (
+            (identity[2], identity[3]) == (device, inode) 
+            and identity[0] > size 
+            and buf[size - len(self.tail):size] == self.tail
+            and self.sample_digest(buf, size) == self.digest
+        )
+
+    def extend(self, buf, identity): 
+        '''
+        Function to index the bytes appended to a file since the index was 
+            built, returning the extended index
+        An unterminated last line is indexed again, as it may have been 
+            completed since
+        '''
+        
+        offsets, features = array("Q"), bytearray(self.features)
+        offsets.frombytes(memoryview(self.offsets).cast("B"))
+        if features and buf[offsets[-1] - 1] != 10: 
+            offsets.pop()
+            features.pop()
+        index = LineIndex(identity, offsets, features)
+        index.scan(buf)
+        return index
+
+    @classmethod
+    def load(cls, path, identity=None): 
+        '''
+        Function to load the index at path
+        Returns None if it is missing or unreadable, or if an identity is 
+            given and the index was built from a different version of the 
+            file
+        '''
+        
+        try: 
+            with open(path, "rb") as file: 
+                buf = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError): 
+            return None
+        try: 
+            magic, *saved, lines, tail, digest = cls.HEADER.unpack_from(buf)
+        except struct.error: 
+            buf.close()
+            return None
+        start = cls.HEADER.size
+        features_start = start + 8 * (lines + 1)
+        tail_start = features_start + lines
+        if (magic != cls.MAGIC or len(buf) != tail_start + tail 
+                or identity is not None and tuple(saved) != identity): 
+            buf.close()
+            return None
+        view = memoryview(buf)
+        return cls(
+            tuple(saved), view[start:features_start].cast("Q"), 
+            view[features_start:tail_start], bytes(view[tail_start:]), 
+            digest)
+
+    def save(self, path): 
+        '''
+        Function to write the index to path
+        '''
+        
+        def write(file): 
+            file.write(self.HEADER.pack(
+                self.MAGIC, *self.identity, len(self.features), 
+                len(self.tail), self.digest))
+            file.write(self.offsets)
+            file.write(self.features)
+            file.write(self.tail)
+
+        try: 
+            write_atomically(path, write)
+        except OSError: 
+            # An unwritable directory only means the index is not kept
+            pass
+
+    @property
+    def line_count(self): 
+        return len(self.features)
+
+    def matching_runs(self, lo, hi, kinds): 
+        '''
+        Generator that yields (first, stop) ranges of consecutive lines in 
+            lines[lo:hi] that have every feature in kinds
+        '''
+        
+        mask = sum(FEATURE_BITS[kind] for kind in kinds)
+        values = bytes(value for value in range(8) if value & mask == mask)
+        pattern = re.compile(b"[" + re.escape(values) + b"]+")
+        for match in pattern.finditer(self.features, lo, hi): 
+            yield match.start(), match.end()
+
+
+class PatternSet: 
+    '''
+    The regexes given with -e and the keywords given with -k and 
+        --keywords, of which a line must contain at least one
+    The regexes and keywords are joined into one alternation with a named 
+        group for each, so a line is scanned once for all of them and the 
+        group that matched tells which one it was. From 
+        AUTOMATON_MIN_KEYWORDS keywords on, the keywords go into a 
+        KeywordAutomaton instead, which costs the same however many there 
+        are. Regexes with groups of their own are searched on their own, 
+        since joining them would renumber their backreferences, as are all 
+        of the regexes if their flags keep them from being joined
+    '''
+
+    def __init__(self, regexes=(), keywords=()): 
+        keywords = list(dict.fromkeys(keywords))
+        self.automaton = None
+        if len(keywords) >= AUTOMATON_MIN_KEYWORDS: 
+            self.automaton = KeywordAutomaton(keywords)
+            keywords = []
+        
+        joined, self.separate = [], []
+        for regex in dict.fromkeys(regexes): 
+            compiled = re.compile(regex)
+            if compiled.groups: 
+                self.separate.append((f"-e {regex}", compiled))
+            else: 
+                joined.append((f"-e {regex}", regex))
+        joined += [
+            (f"-k {keyword}", re.escape(keyword)) for keyword in keywords]
+        
+        self.alternation, self.labels = None, {}
+        if joined: 
+            try: 
+                self.alternation = re.compile("|".join(
+                    f"(?P<f{number}>{pattern})" 
+                    for number, (_, pattern) in enumerate(joined)))
+                self.labels = {
+                    f"f{number}": label 
+                    for number, (label, _) in enumerate(joined)
+                }
+            except re.error: 
+                self.separate[:0] = [
+                    (label, re.compile(pattern)) for label, pattern in joined]
+
+    @staticmethod
+    def read_keywords(path): 
+        '''
+        Function to read the keywords listed one per line in a file
+        Blank lines are ignored. Raises OSError if the file can't be read, 
+            or ValueError if it lists no keywords
+        '''
+        
+        with open(path) as file: 
+            keywords = [line.rstrip("\r\n") for line in file]
+        keywords = [keyword for keyword in keywords if keyword]
+        if not keywords: 
+            raise ValueError("lists no keywords")
+        return keywords
+
+    def search(self, line): 
+        '''
+        Function to find the first regex or keyword in a line
+        Returns its label, "-e REGEX" or "-k KEYWORD", or None if the line 
+            contains none of them
+        '''
+        
+        if self.alternation is not None: 
+            match = self.alternation.search(line)
+            if match is not None: 
+                return self.labels[match.lastgroup]
+        for label, compiled in self.separate: 
+            if compiled.search(line): 
+                return label
+        if self.automaton is not None: 
+            keyword = self.automaton.search(line)
+            if keyword is not None: 
+                return f"-k {keyword}"
+        return None
+
+
+class KeywordAutomaton: 
+    '''
+    Aho-Corasick automaton over a list of keywords
+    The keywords are stored as a trie whose states each link to the state 
+        for the longest proper suffix of their prefix that is also in the 
+        trie, so a line is searched for every keyword in a single pass, at 
+        a cost that depends on the length of the line but not on the 
+        number of keywords
+    '''
+
+    __slots__ = ("goto", "fail", "output", "start")
+
+    def __init__(self, keywords): 
+        goto, output = [{}], [None]
+        for keyword in keywords: 
+            state = 0
+            for char in keyword: 
+                following = goto[state].get(char)
+                if following is None: 
+                    following = goto[state][char] = len(goto)
+                    goto.append({})
+                    output.append(None)
+                state = following
+            if output[state] is None: 
+                output[state] = keyword
+        
+        # Suffix links are found breadth first, so a state's link is always 
+        # known before those of the states below it. A state whose own 
+        # prefix isn't a keyword still ends one if its link does
+        fail = [0] * len(goto)
+        pending = deque(goto[0].values())
+        while pending: 
+            state = pending.popleft()
+            for char, following in goto[state].items(): 
+                pending.append(following)
+                link = fail[state]
+                while link and char not in goto[link]: 
+                    link = fail[link]
+                fail[following] = goto[link].get(char, 0)
+                if output[following] is None: 
+                    output[following] = output[fail[following]]
+        self.goto, self.fail, self.output = goto, fail, output
+        
+        # Stretches of a line that can't begin a keyword are skipped with a 
+        # regex search while no keyword is under way
+        self.start = re.compile(
+            "[" + "".join(map(re.escape, sorted(goto[0]))) + "]")
+
+    def search(self, line): 
+        '''
+        Function to find a keyword in a line
+        Returns the first keyword to end in the line, or None if there is 
+            none
+        '''
+        
+        goto, fail, output = self.goto, self.fail, self.output
+        skip = self.start.search
+        state, pos, end = 0, 0, len(line)
+        while pos < end: 
+            if not state: 
+                match = skip(line, pos)
+                if match is None: 
+                    return None
+                pos = match.start()
+            char = line[pos]
+            while True: 
+                following = goto[state].get(char)
+                if following is not None: 
+                    state = following
+                    break
+                if not state: 
+                    break
+                state = fail[state]
+            if output[state] is not None: 
+                return output[state]
+            pos += 1
+        return None
+
+
+class IPSet: 
+    '''
+    The IPv4 and IPv6 addresses and CIDR networks listed in a file for 
+        --ip-in and --ip-not-in
+    Networks are turned into sorted, merged ranges of integers, so looking 
+        up an address takes one bisect however long the list is. A 
+        compiled copy is kept next to the list, checked against its size, 
+        mtime, device, and inode like an index, so later runs don't parse 
+        the list again
+    '''
+
+    # The IPv4 ranges are stored in native byte order, which the magic 
+    # records, and the IPv6 ranges as 16 big-endian bytes each
+    MAGIC = b"LPSET1" + (b"L" if sys.byteorder == "little" else b"B") + b"\0"
+    HEADER = struct.Struct("=8sQQQQQQ")
+
+    def __init__(self, identity, ipv4, ipv6): 
+        self.identity = identity
+        self.ipv4 = ipv4
+        self.ipv6 = ipv6
+
+    @classmethod
+    def load(cls, path): 
+        '''
+        Function to load the list at path, from its compiled copy if that 
+            is up to date, or by compiling it and saving the copy otherwise
+        Raises OSError if the list can't be read, or ValueError naming the 
+            first line that isn't an address or network
+        '''
+        
+        with open(path) as file: 
+            identity = LineIndex.identity_of(file.fileno())
+            ip_set = cls.load_compiled(path + IPSET_SUFFIX, identity)
+            if ip_set is None: 
+                ip_set = cls.parse(file, identity)
+                ip_set.save(path + IPSET_SUFFIX)
+        return ip_set
+
+    @classmethod
+    def parse(cls, lines, identity=None): 
+        '''
+        Function to compile a list with one address or network per line
+        Blank lines and anything after a # are ignored
+        '''
+        
+        ranges = {4: [], 6: []}
+        for number, line in enumerate(lines, 1): 
+            entry = line.split("#", 1)[0].strip()
+            if not entry: 
+                continue
+            try: 
+                network = ipaddress.ip_network(entry, strict=False)
+            except ValueError as error: 
+                raise ValueError(f"line {number}: {error}") from None
+            ranges[network.version].append(
+                (int(network.network_address), int(network.broadcast_address)))
+        return cls(identity, cls.merge(ranges[4]), cls.merge(ranges[6]))
+
+    @staticmethod
+    def merge(ranges): 
+        '''
+        Function to merge overlapping and adjacent (first, last) ranges
+        Returns the sorted first and last values as two lists
+        '''
+        
+        starts, ends = [], []
+        for start, end in sorted(ranges): 
+            if ends and start <= ends[-1] + 1: 
+                ends[-1] = max(ends[-1], end)
+            else: 
+                starts.append(start)
+                ends.append(end)
+        return starts, ends
+
+    @classmethod
+    def load_compiled(cls, path, identity): 
+        '''
+        Function to load a compiled copy of a list
+        Returns None if it is missing, unreadable, or was compiled from a 
+            different version of the list
+        '''
+        
+        try: 
+            with open(path, "rb") as file: 
+                data = file.read()
+            magic, *saved, ipv4, ipv6 = cls.HEADER.unpack_from(data)
+        except (OSError, struct.error): 
+            return None
+        start = cls.HEADER.size
+        middle = start + 16 * ipv4
+        if (magic != cls.MAGIC or len(data) != middle + 32 * ipv6 
+                or tuple(saved) != identity): 
+            return None
+        values = array("Q")
+        values.frombytes(data[start:middle])
+        wide = [
+            int.from_bytes(data[pos:pos + 16], "big") 
+            for pos in range(middle, len(data), 16)
+        ]
+        return cls(
+            identity, (values[:ipv4], values[ipv4:]), 
+            (wide[:ipv6], wide[ipv6:]))
+
+    def save(self, path): 
+        '''
+        Function to write the compiled list to path
+        '''
+        
+        (starts, ends), (wide_starts, wide_ends) = self.ipv4, self.ipv6
+
+        def write(file): 
+            file.write(self.HEADER.pack(
+                self.MAGIC, *self.identity, len(starts), len(wide_starts)))
+            file.write(array("Q", starts + ends))
+            file.write(b"".join(
+                value.to_bytes(16, "big") 
+                for value in wide_starts + wide_ends))
+
+        try: 
+            write_atomically(path, write)
+        except OSError: 
+            # An unwritable directory only means the list is parsed each run
+            pass
+
+    @staticmethod
+    def holds(ranges, value): 
+        starts, ends = ranges
+        i = bisect.bisect_right(starts, value) - 1
+        return i >= 0 and value <= ends[i]
+
+    def match(self, line): 
+        '''
+        Function to look up the IPs in a line
+        Returns True if one of them is in the set, False if none are, or 
+            None if the line has no IPs
+        '''
+        
+        found = None
+        for match in IPV4_RE.finditer(line): 
+            a, b, c, d = match.group().split(".")
+            value = int(a) << 24 | int(b) << 16 | int(c) << 8 | int(d)
+            if self.holds(self.ipv4, value): 
+                return True
+            found = False
+        for match in IPV6_RE.finditer(line): 
+            groups = match.group().split(":")
+            value = int("".join(group.rjust(4, "0") for group in groups), 16)
+            if self.holds(self.ipv6, value): 
+                return True
+            found = False
+        return found
+
+
+class RunStats: 
+    '''
+    Counters and timers collected for --stats
+    Time is split between the read, filter, highlight, and write stages, 
+        and only code paths built with a RunStats are ever timed
+    '''
+
+    STAGES = ("read", "filter", "highlight", "write")
+
+    def __init__(self): 
+        self.bytes_read = 0
+        self.lines_read = 0
+        self.window_lines = 0
+        self.stage_counts = {}
+        self.wall = dict.fromkeys(self.STAGES, 0.0)
+        self.cpu = dict.fromkeys(self.STAGES, 0.0)
+        self.started = (time.perf_counter(), time.process_time(), os.times())
+        self.elapsed = self.cpu_time = 0.0
+        self.peak_rss = None
+        self.queues = {}
+
+    def timed(self, stage, function, cpu_clock=time.process_time): 
+        '''
+        Function to wrap a callable so its wall and CPU time count towards 
+            a stage
+        Stages run in threads of their own pass time.thread_time as 
+            cpu_clock, so the other threads' CPU time isn't counted
+        '''
+        
+        wall, cpu = self.wall, self.cpu
+        clock = time.perf_counter
+
+        def timed_function(*args): 
+            started, cpu_started = clock(), cpu_clock()
+            try: 
+                return function(*args)
+            finally: 
+                wall[stage] += clock() - started
+                cpu[stage] += cpu_clock() - cpu_started
+
+        return timed_function
+
+    def timed_iter(self, stage, iterable): 
+        '''
+        Generator that yields from an iterable, counting the time spent 
+            producing each item towards a stage
+        '''
+        
+        next_item = self.timed(stage, next)
+        iterator = iter(iterable)
+        while True: 
+            try: 
+                item = next_item(iterator)
+            except StopIteration: 
+                return
+            yield item
+
+    def reading(self, lines, encoding=None): 
+        '''
+        Generator that yields lines read from a text stream, counting them 
+            and their encoded size towards the read stage
+        '''
+        
+        encoding = encoding or "utf-8"
+        for line in self.timed_iter("read", lines): 
+            self.lines_read += 1
+            self.bytes_read += (
+                len(line) if line.isascii() 
+                else len(line.encode(encoding, "replace"))
+            )
+            yield line
+
+    def counting(self, lines): 
+        '''
+        Generator that yields lines inside the --first and --last window, 
+            counting them
+        '''
+        
+        for line in lines: 
+            self.window_lines += 1
+            yield line
+
+    def merge(self, other): 
+        '''
+        Function to add the counters and stage times of another RunStats, 
+            such as one from a worker process, to this one
+        '''
+        
+        self.bytes_read += other.bytes_read
+        self.lines_read += other.lines_read
+        self.window_lines += other.window_lines
+        for name, (checked, rejected) in other.stage_counts.items(): 
+            add_counts(self.stage_counts, name, checked, rejected)
+        for stage in self.STAGES: 
+            self.wall[stage] += other.wall[stage]
+            self.cpu[stage] += other.cpu[stage]
+        for name, (depth, peak, items, put_wait, get_wait) in (
+                other.queues.items()): 
+            totals = self.queues.setdefault(name, [depth, 0, 0, 0.0, 0.0])
+            totals[1] = max(totals[1], peak)
+            totals[2] += items
+            totals[3] += put_wait
+            totals[4] += get_wait
+
+    def finish(self): 
+        '''
+        Function to record total time and peak memory at the end of a run
+        CPU time includes any --jobs worker processes
+        '''
+        
+        started, cpu_started, times = self.started
+        self.elapsed = time.perf_counter() - started
+        now = os.times()
+        self.cpu_time = (
+            time.process_time() - cpu_started 
+            + now.children_user - times.children_user 
+            + now.children_system - times.children_system
+        )
+        if resource is not None: 
+            self.peak_rss = max(
+                resource.getrusage(who).ru_maxrss 
+                for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN)
+            )
+            # ru_maxrss is in bytes on macOS and KiB elsewhere
+            if sys.platform == "darwin": 
+                self.peak_rss //= 1024
+
+    def report(self, file=None): 
+        '''
+        Function to print the collected stats, to stderr by default
+        '''
+        
+        file = sys.stderr if file is None else file
+        width = max([len("stage"), *map(len, self.stage_counts)])
+        print(f"{'stage':<{width}}  {'checked':>12}  {'rejected':>12}", 
+            file=file)
+        for name, (checked, rejected) in self.stage_counts.items(): 
+            print(f"{name:<{width}}  {checked:>12}  {rejected:>12}", file=file)
+        
+        print(file=file)
+        for name, value in (
+                ("bytes read", self.bytes_read), 
+                ("lines read", self.lines_read), 
+                ("lines in window", self.window_lines)): 
+            print(f"{name:<16}{value:>12}", file=file)
+        
+        print(file=file)
+        print(f"{'time':<16}{'wall s':>12}{'cpu s':>12}", file=file)
+        for stage in self.STAGES: 
+            print(
+                f"{stage:<16}{self.wall[stage]:>12.6f}"
+                f"{self.cpu[stage]:>12.6f}", 
+                file=file)
+        print(f"{'total':<16}{self.elapsed:>12.6f}{self.cpu_time:>12.6f}", 
+            file=file)
+        
+        print(file=file)
+        elapsed = self.elapsed or float("inf")
+        print(
+            f"{'throughput':<16}"
+            f"{self.bytes_read / 1024 ** 2 / elapsed:>12.2f} MB/s"
+            f"{self.lines_read / elapsed:>14.0f} lines/s", 
+            file=file)
+        if self.peak_rss is not None: 
+            print(f"{'peak memory':<16}{self.peak_rss:>12} KiB", file=file)
+        
+        # Time a full queue kept its producer waiting means the stage after 
+        # it is the slower one, and time an empty queue kept its consumer 
+        # waiting means the stage before it is
+        if self.queues: 
+            print(file=file)
+            print(
+                f"{'queue':<16}{'depth':>8}{'peak':>8}{'blocks':>10}"
+                f"{'full s':>12}{'empty s':>12}", file=file)
+            for name, (depth, peak, items, put_wait, get_wait) in (
+                    self.queues.items()): 
+                print(
+                    f"{name:<16}{depth:>8}{peak:>8}{items:>10}"
+                    f"{put_wait:>12.6f}{get_wait:>12.6f}", file=file)
+
+
+class PipelineQueue: 
+    '''
+    Bounded queue between two --pipeline stages
+    For --stats it records how full it got and how long producers waited 
+        for room and consumers waited for blocks, in 
+        [depth, peak, blocks, full seconds, empty seconds] form
+    '''
+
+    def __init__(self, depth): 
+        self.queue = queue.Queue(depth)
+        self.counters = [depth, 0, 0, 0.0, 0.0]
+        self.lock = threading.Lock()
+
+    def put(self, item): 
+        '''
+        Function to add an item, waiting while the queue is full
+        '''
+        
+        waited = 0.0
+        try: 
+            self.queue.put_nowait(item)
+        except queue.Full: 
+            started = time.perf_counter()
+            self.queue.put(item)
+            waited = time.perf_counter() - started
+        with self.lock: 
+            counters = self.counters
+            counters[1] = max(counters[1], self.queue.qsize())
+            counters[2] += item is not None
+            counters[3] += waited
+
+    def get(self): 
+        '''
+        Function to take the next item, waiting while the queue is empty
+        '''
+        
+        try: 
+            return self.queue.get_nowait()
+        except queue.Empty: 
+            started = time.perf_counter()
+            item = self.queue.get()
+            with self.lock: 
+                self.counters[4] += time.perf_counter() - started
+            return item
+
+
+class OutputWriter: 
+    '''
+    Buffered writer for matching lines
+    Lines are encoded and collected into large blocks that are written to 
+        the binary layer of stdout in a single call, and bytes are passed 
+        through untouched. Output to a terminal is flushed after each 
+        write so lines still appear as they are found
+    '''
+
+    def __init__(self, stream=None, color="auto", 
+            buffer_size=OUTPUT_BUFFER_SIZE): 
+        stream = sys.stdout if stream is None else stream
+        try: 
+            isatty = stream.isatty()
+        except (AttributeError, ValueError): 
+            isatty = False
+        self.color = color == "always" or (color == "auto" and isatty)
+        self.line_buffered = isatty
+        self.buffer_size = buffer_size
+        self.pending = []
+        self.pending_size = 0
+
+        # The Windows console needs colorama to translate ANSI codes, 
+        # which only works on the text layer
+        if self.color and os.name == "nt": 
+            stream = AnsiToWin32(stream).stream
+        self.stream = stream
+        self.binary = (
+            None if self.color and os.name == "nt" 
+            else getattr(stream, "buffer", None)
+        )
+        try: 
+            self.encoding = codecs.lookup(stream.encoding).name
+            self.errors = getattr(stream, "errors", None) or "strict"
+        except (AttributeError, LookupError, TypeError): 
+            self.encoding = self.errors = None
+        if self.encoding is None: 
+            self.binary = None
+        
+        # Anything already printed must come out before the first block
+        stream.flush()
+
+    def write(self, data): 
+        '''
+        Function to queue a str or bytes-like object for output
+        '''
+        
+        if self.binary is not None: 
+            if isinstance(data, str): 
+                data = data.encode(self.encoding, self.errors)
+            elif len(data) >= self.buffer_size: 
+                # Large blocks skip the buffer, avoiding a copy
+                self.flush()
+                self.binary.write(data)
+                return
+        elif not isinstance(data, str): 
+            data = bytes(data).decode(self.encoding or "utf-8")
+        self.pending.append(data)
+        self.pending_size += len(data)
+        if self.line_buffered or self.pending_size >= self.buffer_size: 
+            self.flush()
+
+    def flush(self): 
+        '''
+        Function to write out everything that has been queued
+        '''
+        
+        if self.pending: 
+            if self.binary is not None: 
+                self.binary.write(b"".join(self.pending))
+            else: 
+                self.stream.write("".join(self.pending))
+            self.pending = []
+            self.pending_size = 0
+        (self.binary or self.stream).flush()
+
+
+class KeyCounter(abc.ABC): 
+    '''
+    Base of the counters that stand in for the OutputWriter when the keys 
+        in matching lines are counted instead of printed
+    Every way of scanning the input feeds it the lines that would have 
+        been printed. Lines are queued as bytes, and the keys in each 
+        buffer_size bytes of them are handed to add at once
+    '''
+
+    # Accepts bytes, so mapped files are passed through without decoding
+    binary = True
+    encoding = "utf-8"
+    errors = "replace"
+    color = False
+
+    def __init__(self, by, buffer_size=STREAM_BLOCK_SIZE): 
+        self.by = by
+        self.buffer_size = buffer_size
+        self.total = 0
+        self.pending = []
+        self.pending_size = 0
+
+    def write(self, data): 
+        '''
+        Function to queue lines to be counted, as str or a bytes-like object
+        '''
+        
+        if isinstance(data, str): 
+            data = data.encode(self.encoding, self.errors)
+        self.pending.append(bytes(data))
+        self.pending_size += len(data)
+        if self.pending_size >= self.buffer_size: 
+            self.count(keep_partial=True)
+
+    def flush(self): 
+        '''
+        Function to count everything that has been queued
+        '''
+        
+        self.count()
+
+    def count(self, keep_partial=False): 
+        '''
+        Function to find the keys in the queued lines, keeping back an 
+            unterminated last line if keep_partial is set
+        '''
+        
+        data = b"".join(self.pending)
+        rest = b""
+        if keep_partial: 
+            end = data.rfind(b"\n") + 1
+            data, rest = data[:end], data[end:]
+        self.pending = [rest] if rest else []
+        self.pending_size = len(rest)
+        
+        keys = re.compile(TOP_KEY_PATS[self.by].encode()).findall(data)
+        if self.by != "minute": 
+            keys = canonical_addresses(keys, self.by)
+        self.total += len(keys)
+        self.add(keys, keep_partial)
+
+    @abc.abstractmethod
+    def add(self, keys, keep_partial): 
+        '''
+        Function to count keys, a list of bytes, with keep_partial unset 
+            once the last of the input has been counted
+        '''
+
+
+class TopCounter(KeyCounter): 
+    '''
+    Counts of the IPv4 addresses, IPv6 addresses, or minutes in matching 
+        lines for --top
+    Without a limit every key is counted exactly. With one, at most that 
+        many Space-Saving counters are kept. Keys are counted exactly in 
+        batches, and each batch is merged in by taking a key missing from 
+        either side to have that side's smallest count, as both its count 
+        and its error, then keeping the largest counts. Each count is then 
+        never below the true count and at most its error above it, and 
+        counters kept by worker processes merge the same way
+    '''
+
+    def __init__(self, by, limit=None, buffer_size=STREAM_BLOCK_SIZE): 
+        super().__init__(by, buffer_size)
+        self.limit = limit
+        self.counts = Counter() if limit is None else {}
+        self.errors_of = {}
+        self.batch = Counter()
+
+    def add(self, keys, keep_partial): 
+        '''
+        Function to count keys, exactly or in the next batch
+        '''
+        
+        if self.limit is None: 
+            self.counts.update(keys)
+            return
+        
+        # Keys are added at most limit at a time, and the batch is merged 
+        # once it has as many keys as there are counters, so memory stays 
+        # within twice the limit however many keys a block holds
+        limit = self.limit
+        for start in range(0, len(keys), limit): 
+            self.batch.update(keys[start:start + limit])
+            if len(self.batch) >= limit: 
+                self.merge_batch()
+        if not keep_partial and self.batch: 
+            self.merge_batch()
+
+    def merge_batch(self): 
+        '''
+        Function to merge the keys counted exactly in the batch into the 
+            counters, starting a new batch
+        '''
+        
+        batch = TopCounter(self.by)
+        batch.counts, self.batch = self.batch, Counter()
+        self.merge(batch, count_total=False)
+
+    def floor(self): 
+        '''
+        Function to give the largest count a key missing from the counters 
+            may have had
+        '''
+        
+        if self.limit is None or len(self.counts) < self.limit: 
+            return 0
+        return min(self.counts.values())
+
+    def merge(self, other, count_total=True): 
+        '''
+        Function to add the counts of another TopCounter, such as one from 
+            a worker process, to this one
+        '''
+        
+        if count_total: 
+            self.total += other.total
+        if self.limit is None: 
+            self.counts.update(other.counts)
+            return
+        
+        floor, other_floor = self.floor(), other.floor()
+        counts, errors = {}, {}
+        for key in self.counts.keys() | other.counts.keys(): 
+            counts[key] = (
+                self.counts.get(key, floor) 
+                + other.counts.get(key, other_floor))
+            errors[key] = (
+                self.errors_of.get(key, floor) 
+                + other.errors_of.get(key, other_floor))
+        if len(counts) > self.limit: 
+            kept = heapq.nlargest(self.limit, counts, key=counts.get)
+            counts = {key: counts[key] for key in kept}
+        self.counts = counts
+        self.errors_of = {key: errors[key] for key in counts}
+
+    def top(self, k): 
+        '''
+        Function to give the k largest counts as (key, count, error) tuples, 
+            most frequent first
+        '''
+        
+        ranked = heapq.nsmallest(
+            k, self.counts.items(), key=lambda item: (-item[1], item[0]))
+        return [
+            (key.decode(), count, self.errors_of.get(key, 0)) 
+            for key, count in ranked
+        ]
+
+    def report(self, out, k): 
+        '''
+        Function to write the k most frequent keys with their counts, and 
+            for approximate counts the least each key can have been seen
+        '''
+        
+        for key, count, error in self.top(k): 
+            if self.limit is None: 
+                out.write(f"{count:>12} {key}\n")
+            else: 
+                out.write(f"{count:>12} {key} (at least {count - error})\n")
+
+
+class DistinctCounter(KeyCounter): 
+    '''
+    HyperLogLog sketch of the distinct IPv4 or IPv6 addresses in matching 
+        lines for --count-distinct
+    Each address is hashed to 64 bits. The first precision bits pick one 
+        of 2 ** precision registers, which keeps the longest run of leading 
+        zeros seen in the rest, so memory is a byte per register however 
+        many addresses there are. Sketches of the same key and precision 
+        merge by keeping the larger of each pair of registers, which gives 
+        the sketch of everything either one has seen
+    '''
+
+    # The counts in the header are stored in native byte order, which the 
+    # magic records, followed by a byte for each register
+    MAGIC = b"LPHLL1" + (b"L" if sys.byteorder == "little" else b"B") + b"\0"
+    HEADER = struct.Struct("=8s8sQQ")
+
+    def __init__(self, by, precision=14, buffer_size=STREAM_BLOCK_SIZE): 
+        super().__init__(by, buffer_size)
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+
+    def add(self, keys, keep_partial): 
+        '''
+        Function to add keys to the sketch, hashing each distinct key of a 
+            block once
+        '''
+        
+        registers = self.registers
+        bits = 64 - self.precision
+        mask = (1 << bits) - 1
+        for key in set(keys): 
+            digest = hashlib.blake2b(key, digest_size=8).digest()
+            value = int.from_bytes(digest, "big")
+            rank = bits - (value & mask).bit_length() + 1
+            if rank > registers[value >> bits]: 
+                registers[value >> bits] = rank
+
+    def merge(self, other): 
+        '''
+        Function to add the addresses seen by another DistinctCounter, such 
+            as one from a worker process or a saved sketch, to this one
+        Raises ValueError if the two don't count the same key with the same 
+            precision
+        '''
+        
+        if other.by != self.by: 
+            raise ValueError(f"counts {other.by} addresses")
+        if other.precision != self.precision: 
+            raise ValueError(f"has precision {other.precision}")
+        self.total += other.total
+        self.registers = bytearray(map(max, self.registers, other.registers))
+
+    def estimate(self): 
+        '''
+        Function to give the estimated number of distinct keys
+        Small counts, which leave registers empty, are estimated from the 
+            number of empty registers instead, which is close to exact
+        '''
+        
+        size = len(self.registers)
+        alpha = {16: 0.673, 32: 0.697, 64: 0.709}.get(
+            size, 0.7213 / (1 + 1.079 / size))
+        harmonic = sum(
+            self.registers.count(rank) * 2.0 ** -rank 
+            for rank in range(66 - self.precision)
+        )
+        raw = alpha * size * size / harmonic
+        empty = self.registers.count(0)
+        if raw <= 2.5 * size and empty: 
+            return round(size * math.log(size / empty))
+        return round(raw)
+
+    def standard_error(self): 
+        '''
+        Function to give the relative standard error of the estimate
+        '''
+        
+        return 1.04 / math.sqrt(len(self.registers))
+
+    def to_bytes(self): 
+        '''
+        Function to serialise the sketch, which from_bytes reads back
+        '''
+        
+        header = self.HEADER.pack(
+            self.MAGIC, self.by.encode(), self.precision, self.total)
+        return header + bytes(self.registers)
+
+    @classmethod
+    def from_bytes(cls, data): 
+        '''
+        Function to read a sketch serialised by to_bytes
+        Raises ValueError if data isn't one
+        '''
+        
+        try: 
+            magic, by, precision, total = cls.HEADER.unpack_from(data)
+        except struct.error: 
+            raise ValueError("is not a sketch") from None
+        by = by.rstrip(b"\0").decode("ascii", "replace")
+        if (magic != cls.MAGIC or by not in ("ipv4", "ipv6") 
+                or not 4 <= precision <= 18 
+                or len(data) != cls.HEADER.size + (1 << precision)): 
+            raise ValueError("is not a sketch")
+        sketch = cls(by, precision)
+        sketch.total = total
+        sketch.registers[:] = data[cls.HEADER.size:]
+        return sketch
+
+    @classmethod
+    def load(cls, path): 
+        '''
+        Function to read the sketch saved at path, or None if there isn't one
+        Raises OSError if path can't be read, or ValueError if it doesn't 
+            hold a sketch
+        '''
+        
+        try: 
+            with open(path, "rb") as file: 
+                return cls.from_bytes(file.read())
+        except FileNotFoundError: 
+            return None
+
+    def save(self, path): 
+        '''
+        Function to write the sketch to path
+        Raises OSError if it can't be written
+        '''
+        
+        write_atomically(path, lambda file: file.write(self.to_bytes()))
+
+    def report(self, out): 
+        '''
+        Function to write the estimate with its standard error
+        '''
+        
+        estimate, error = self.estimate(), self.standard_error()
+        name = {"ipv4": "IPv4", "ipv6": "IPv6"}[self.by]
+        out.write(
+            f"{estimate} distinct {name} addresses, standard error "
+            f"\u00b1{round(estimate * error)} ({error:.2%})\n")
+
+
+class LineWindow: 
+    '''
+    Incremental counterpart to logParserUtil.calculate_bounds
+    Lines are pushed one at a time without knowing the length of the 
+        input in advance. Lines are released as soon as they are known 
+        to fall within the intersection of --first and --last, and the 
+        rest are held in a buffer no longer than the magnitude of 
+        --first or --last
+    '''
+
+    def __init__(self, first, last): 
+        self.first = first
+        self.last = last
+        self.count = 0
+        self.done = False
+        self.buffer = deque(maxlen=(None if last is None else abs(last)))
+        if first == 0: 
+            # -f 0 never prints anything, so there is nothing to read
+            self.done = True
+
+    @property
+    def unbounded(self): 
+        return self.first is None and self.last is None
+
+    def push(self, line): 
+        '''
+        Function to consume the next line of input
+        Returns a tuple of the lines that can be printed right away
+        '''
+        
+        first, last = self.first, self.last
+        idx = self.count
+        self.count = idx + 1
+
+        if last is None: 
+            if first is None: 
+                return (line,)
+            if first >= 0: 
+                # Mimic head, stop reading once NUM lines are printed
+                self.done = self.count >= first
+                return (line,) if idx < first else ()
+            # Negative -f holds back the last NUM lines
+            self.buffer.append(line)
+            if len(self.buffer) > -first: 
+                return (self.buffer.popleft(),)
+            return ()
+
+        if first is None: 
+            # Mimic tail, the ring buffer keeps the last NUM lines
+            self.buffer.append(line)
+            return ()
+        if first >= 0: 
+            # Only lines before -f can be printed, and once -f + |-l| 
+            # lines have been seen the two options can no longer overlap
+            if idx < first: 
+                self.buffer.append((idx, line))
+            self.done = self.count >= first + abs(last)
+            return ()
+        self.buffer.append((idx, line))
+        return ()
+
+    def finish(self): 
+        '''
+        Function to be called at the end of input
+        Returns the buffered lines that fall within the intersection of 
+            --first and --last
+        '''
+        
+        first, last = self.first, self.last
+        if last is None: 
+            # Lines held back by a negative -f are never printed
+            return ()
+        if first is None: 
+            return tuple(self.buffer)
+
+        boundaries = logParserUtil().calculate_bounds(first, last, self.count)
+        if boundaries is None: 
+            return ()
+        start, stop = boundaries
+        return tuple(line for idx, line in self.buffer if start <= idx < stop)
+
+
+class TimeRange: 
+    '''
+    The window given by --since and --until
+    Timestamps are compared with the bounds as times of day, so a bound 
+        earlier than the first timestamp is before the input starts, and a 
+        window that ends before it starts wraps past midnight. The input is 
+        taken to have run past midnight once a timestamp is more than half 
+        a day earlier than the one before it. From then on, timestamps 
+        earlier in the day than the first are on the next day, and so is a 
+        bound that is earlier still, by more than half a day. Every input 
+        is read by this rule as it comes, so a FILE, a pipe, and a 
+        compressed FILE give the same lines. Lines without a timestamp go 
+        with the line before them, and lines before the first timestamp 
+        are only in the window if --since isn't given
+    '''
+
+    def __init__(self, since, until): 
+        self.since = None if since is None else self.seconds(since)
+        self.until = None if until is None else self.seconds(until)
+        self.first = None
+        self.previous = None
+        self.crossed = False
+
+    @staticmethod
+    def seconds(stamp): 
+        '''
+        Function to convert an HH:MM:SS timestamp, as str or bytes, to 
+            seconds after midnight
+        '''
+        
+        return int(stamp[0:2]) * 3600 + int(stamp[3:5]) * 60 + int(stamp[6:8])
+
+    def start(self, first): 
+        '''
+        Function to start the input at first, the seconds of its first 
+            timestamp, and place the bounds for the timestamps after 
+            midnight
+        '''
+        
+        self.first = self.previous = first
+        # A bound more than half a day earlier than the first timestamp is 
+        # nearer to the timestamps after midnight than to the start
+        self.next_day = tuple(
+            bound + DAY_SECONDS 
+            if bound is not None and first - bound > DAY_SECONDS // 2 
+            else bound 
+            for bound in (self.since, self.until)
+        )
+
+    def key(self, seconds): 
+        return (seconds - self.first) % DAY_SECONDS
+
+    def inside(self, seconds): 
+        '''
+        Function to check whether a time, in seconds after midnight, is in 
+            the window, given what has been seen of the input so far
+        '''
+        
+        since, until = self.since, self.until
+        if self.crossed and seconds < self.first: 
+            seconds += DAY_SECONDS
+            since, until = self.next_day
+        if since is None: 
+            return seconds <= until
+        if until is None: 
+            return seconds >= since
+        if since <= until: 
+            return since <= seconds <= until
+        return seconds >= since or seconds <= until
+
+    def includes(self, stamp): 
+        '''
+        Function to check whether the next HH:MM:SS timestamp of the input 
+            is in the window, where an empty stamp stands for the lines 
+            before the first one
+        '''
+        
+        if not stamp: 
+            return self.since is None
+        return self.includes_time(self.seconds(stamp))
+
+    def includes_time(self, seconds): 
+        '''
+        Function to check whether the next timestamp of the input, in 
+            seconds after midnight, is in the window
+        '''
+        
+        if self.first is None: 
+            self.start(seconds)
+        elif self.previous - seconds > DAY_SECONDS // 2: 
+            self.crossed = True
+        self.previous = seconds
+        return self.inside(seconds)
+
+    def lines(self, lines): 
+        '''
+        Generator that yields the lines of an iterable that are in the window
+        '''
+        
+        # A day has few enough timestamps to remember the seconds of each
+        search = re.compile(TIMESTAMP_PAT).search
+        includes_time = self.includes_time
+        inside = self.includes(None)
+        seen = {}
+        for line in lines: 
+            found = search(line)
+            if found is not None: 
+                stamp = found.group()
+                seconds = seen.get(stamp)
+                if seconds is None: 
+                    seconds = seen[stamp] = self.seconds(stamp)
+                inside = includes_time(seconds)
+            if inside: 
+                yield line
+
+    def offsets(self, buf): 
+        '''
+        Function to locate the window in a memory-mapped file in time order 
+            by bisecting over byte offsets, so only a few dozen lines are 
+            read however large the file is
+        The lines in the ranges are the ones reading the file in full would 
+            give, and the range is left ready for lines() to read them
+        Returns a list of (start, stop) byte ranges, or None if the sampled 
+            lines show the file isn't in time order
+        '''
+        
+        pattern = re.compile(TIMESTAMP_PAT.encode())
+        search = pattern.search
+        size = len(buf)
+
+        def stamp_at(pos): 
+            # The first line with a timestamp starting at or after pos, as 
+            # (line start, key), or (size, None) if there are none
+            if pos: 
+                pos = buf.find(b"\n", pos - 1) + 1 or size
+            found = search(buf, pos)
+            if found is None: 
+                return size, None
+            line = buf.rfind(b"\n", pos, found.start()) + 1 or pos
+            return line, self.key(self.seconds(found.group()))
+
+        def first_from(target): 
+            # Offset of the first line with a timestamp at or after target
+            lo, hi = 0, size
+            while lo < hi: 
+                mid = (lo + hi) // 2
+                line, key = stamp_at(mid)
+                if key is None or key >= target: 
+                    hi = mid
+                else: 
+                    lo = line + 1
+            return stamp_at(lo)[0]
+
+        def last_key(end): 
+            # Key of the last line with a timestamp before end, searching 
+            # further back until one is found
+            back = 1 << 12
+            while True: 
+                found = None
+                for found in pattern.finditer(buf, max(end - back, 0), end): 
+                    pass
+                if found is not None: 
+                    return stamp_at(found.start())[1]
+                back <<= 2
+
+        found = search(buf)
+        if found is None: 
+            return [(0, size)] if self.since is None else []
+        first = self.seconds(found.group())
+        self.start(first)
+        keys = [
+            stamp_at(size * i // TIME_SAMPLES)[1] for i in range(TIME_SAMPLES)
+        ]
+        keys = [key for key in keys if key is not None] + [last_key(size)]
+        if keys != sorted(keys): 
+            return None
+        
+        # Reading in full would see the input run past midnight at the 
+        # first line after it, if that is less than half a day after the 
+        # line before
+        midnight = DAY_SECONDS - first
+        after = first_from(midnight)
+        if after < size: 
+            self.crossed = (
+                stamp_at(after)[1] - last_key(after) < DAY_SECONDS // 2)
+        
+        # Lines only move in or out of the window at a bound or at 
+        # midnight, so each stretch between those is checked once
+        cuts = {0, midnight, DAY_SECONDS}
+        for bound in (self.since, self.until): 
+            if bound is not None: 
+                cuts.update((self.key(bound), self.key(bound + 1)))
+        cuts = sorted(cuts)
+        offsets = [0] + [first_from(cut) for cut in cuts[:-1]] + [size]
+        inside = [self.includes(None)] + [
+            self.inside((first + cut) % DAY_SECONDS) for cut in cuts[:-1]
+        ]
+        ranges = []
+        for start, stop, keep in zip(offsets, offsets[1:], inside): 
+            if not keep or start == stop: 
+                continue
+            if ranges and ranges[-1][1] == start: 
+                ranges[-1] = (ranges[-1][0], stop)
+            else: 
+                ranges.append((start, stop))
+        return ranges
+
 
 class logParserUtil: 
+    def __init__(self, stats_hook=None): 
+        '''
+        stats_hook is an optional callable that is given the RunStats of 
+            each run, stats are collected for it even without --stats
+        '''
+        
+        self.stats_hook = stats_hook
+        self.stats = None
+
     def has_stdin(self): 
         return not sys.stdin.isatty()
 
@@ -45,36 +2708,389 @@ class logParserUtil:
             help="print lines that contain a timestamp in HH:MM:SS format"
         )
         parser.add_argument(
-            "-i", "--ipv4", action="store_true", 
+            "-i", "--ipv4", action="store_true", 
+            help=(
+                "print lines that contain an IPv4 address, matching IPs are "
+                "highlighted"
+            )
+        )
+        parser.add_argument(
+            "-I", "--ipv6", action="store_true", 
+            help=(
+                "print lines that contain an IPv6 address (standard notation)"
+                ", matching IPs are highlighted"
+            )
+        )
+        parser.add_argument(
+            "-e", "--regexp", metavar="RE", action="append", default=[], 
+            help="print lines that match the regular expression RE"
+        )
+        parser.add_argument(
+            "-k", "--keyword", metavar="KW", action="append", default=[], 
+            help="print lines that contain the keyword KW"
+        )
+        parser.add_argument(
+            "--keywords", metavar="LIST", action="append", default=[], 
+            help=(
+                "print lines that contain one of the keywords listed one per "
+                "line in the file LIST"
+            )
+        )
+        parser.add_argument(
+            "--ip-in", metavar="LIST", action="append", default=[], 
+            help=(
+                "print lines with an IP in one of the addresses or CIDR "
+                "networks listed in the file LIST"
+            )
+        )
+        parser.add_argument(
+            "--ip-not-in", metavar="LIST", action="append", default=[], 
+            help=(
+                "print lines with IPs, none of which are in the addresses or "
+                "CIDR networks listed in the file LIST"
+            )
+        )
+        parser.add_argument(
+            "--since", metavar="HH:MM:SS", 
+            help="print lines timestamped at or after HH:MM:SS"
+        )
+        parser.add_argument(
+            "--until", metavar="HH:MM:SS", 
+            help="print lines timestamped at or before HH:MM:SS"
+        )
+        parser.add_argument(
+            "-F", "--follow", action="store_true", 
+            help=(
+                "keep printing lines as they are appended to FILE, following "
+                "it across rotation and truncation"
+            )
+        )
+        parser.add_argument(
+            "-j", "--jobs", metavar="NUM", type=int, default=1, 
+            help=(
+                "filter FILE with NUM worker processes (0 uses every CPU)"
+            )
+        )
+        parser.add_argument(
+            "--color", metavar="WHEN", default="auto", 
+            choices=("auto", "always", "never"), 
+            help=(
+                "highlight IPs when WHEN is always, never, or auto (only when "
+                "printing to a terminal, the default)"
+            )
+        )
+        parser.add_argument(
+            "--stats", action="store_true", 
+            help=(
+                "print counts, timings, throughput, and peak memory for each "
+                "stage to standard error"
+            )
+        )
+        parser.add_argument(
+            "--index", action="store_true", 
+            help=(
+                "keep an index of FILE's lines in FILE.lpidx and use it while "
+                "FILE is unchanged"
+            )
+        )
+        parser.add_argument(
+            "--merge", action="store_true", 
+            help=(
+                "merge FILEs that are each in time order into one stream "
+                "ordered by the first HH:MM:SS timestamp of each line"
+            )
+        )
+        parser.add_argument(
+            "--unordered", action="store_true", 
+            help=(
+                "print each FILE's lines as soon as it has been scanned "
+                "instead of in argument order"
+            )
+        )
+        parser.add_argument(
+            "--top", metavar="K", type=int, 
+            help=(
+                "print the K most frequent keys in matching lines with their "
+                "counts, instead of the lines"
+            )
+        )
+        parser.add_argument(
+            "--by", metavar="KEY", choices=("ipv4", "ipv6", "minute"), 
+            help=(
+                "count ipv4 or ipv6 addresses, or the minute of the first "
+                "timestamp on each line, for --top (ipv4 by default)"
+            )
+        )
+        parser.add_argument(
+            "--counters", metavar="NUM", type=int, 
+            help=(
+                "count approximately for --top with at most NUM counters, "
+                "printing how far off each count can be"
+            )
+        )
+        parser.add_argument(
+            "--count-distinct", metavar="IP", choices=("ipv4", "ipv6"), 
+            help=(
+                "print an estimate of the number of distinct IP addresses, "
+                "ipv4 or ipv6, in matching lines, instead of the lines"
+            )
+        )
+        parser.add_argument(
+            "--precision", metavar="P", type=int, 
+            help=(
+                "estimate --count-distinct with 2**P registers, from 4 to 18 "
+                "(14 by default, a standard error of 0.81%%)"
+            )
+        )
+        parser.add_argument(
+            "--sketch", metavar="FILE", 
+            help=(
+                "also count the addresses in the sketch saved in FILE by an "
+                "earlier --count-distinct, and save the combined sketch to it"
+            )
+        )
+        parser.add_argument(
+            "--pipeline", action="store_true", 
+            help=(
+                "read, filter, and write in separate stages joined by "
+                "bounded queues, so slow reads and writes overlap with "
+                "filtering, which -j spreads over worker processes (not "
+                "with -F, --since, --until, or --merge)"
+            )
+        )
+        parser.add_argument(
+            "--block-size", metavar="SIZE", type=parse_size, 
+            help="bytes --pipeline reads at a time, such as 4M (1M by default)"
+        )
+        parser.add_argument(
+            "--queue-depth", metavar="NUM", type=int, 
+            help="blocks each --pipeline queue holds (4 by default)"
+        )
+        parser.add_argument(
+            "--engine", metavar="ENGINE", default="python", 
+            choices=("python", "numpy"), 
             help=(
-                "print lines that contain an IPv4 address, matching IPs are "
-                "highlighted"
+                "filter with the python engine, or the numpy engine, which "
+                "matches whole blocks at once and falls back to python "
+                "without NumPy (python by default)"
             )
         )
         parser.add_argument(
-            "-I", "--ipv6", action="store_true", 
+            "--serve", metavar="SOCKET", 
             help=(
-                "print lines that contain an IPv6 address (standard notation)"
-                ", matching IPs are highlighted"
+                "stay running and answer requests from client.py on the Unix "
+                "socket SOCKET, with no other arguments"
             )
         )
         parser.add_argument(
-            "file", metavar="FILE", type=argparse.FileType('r'), nargs="?", 
-            default=(None if not self.has_stdin() else sys.stdin), 
-            help="log file to be parsed"
+            "files", metavar="FILE", nargs="*", 
+            help="log files to be parsed, glob patterns are expanded"
         )
         
         args = parser.parse_args(args)
+        self.parser = parser
+        
+        # Error if --serve is given anything else, each request brings its own 
+        # arguments
+        if args.serve is not None: 
+            for name, value in vars(args).items(): 
+                if name != "serve" and value not in (
+                        parser.get_default(name), []): 
+                    parser.error(
+                        "argument --serve: not allowed with other arguments")
+            if not hasattr(socket, "send_fds"): 
+                parser.error(
+                    "argument --serve: not supported on this platform")
+            return args
+        
+        # Expand glob patterns. Patterns matching nothing are kept so they 
+        # fail to open like any other missing file
+        files = []
+        for pattern in args.files: 
+            matches = glob.escape(pattern) != pattern and glob.glob(pattern)
+            files += sorted(matches) if matches else [pattern]
+        args.files = files
+        
+        # Error if a single FILE argument can't be opened. Several FILEs 
+        # are opened one at a time when they are scanned, and like grep, 
+        # one that can't be is reported then while the others are scanned
+        args.file = None
+        if "-" in files and len(files) > 1: 
+            parser.error("argument FILE: '-' can't be given with other files")
+        if len(files) == 1: 
+            path, = files
+            try: 
+                args.file = sys.stdin if path == "-" else open(path)
+            except OSError as error: 
+                parser.error(f"argument FILE: can't open '{path}': {error}")
+        if not files and self.has_stdin(): 
+            args.file = sys.stdin
         
         # Error if there is neither a FILE argument nor data from stdin
-        if args.file is None: 
+        if args.file is None and not files: 
             parser.error(
                 "A file or standard input must be provided. Try -h for help."
             )
 
+        # Error if --since or --until isn't a time
+        times = {"--since": args.since, "--until": args.until}
+        for option, value in times.items(): 
+            if value is not None and not re.fullmatch(TIMESTAMP_PAT, value): 
+                parser.error(
+                    f"argument {option}: '{value}' is not in HH:MM:SS format")
+        
+        # Error if an --ip-in or --ip-not-in list can't be read, and compile 
+        # the ones that can
+        args.ip_sets = []
+        lists = (
+            ("--ip-in", args.ip_in, True), 
+            ("--ip-not-in", args.ip_not_in, False)
+        )
+        for option, paths, inside in lists: 
+            for path in paths: 
+                try: 
+                    args.ip_sets.append((IPSet.load(path), inside))
+                except OSError as error: 
+                    parser.error(
+                        f"argument {option}: can't open '{path}': {error}")
+                except ValueError as error: 
+                    parser.error(f"argument {option}: '{path}' {error}")
+        
+        # Error if an -e regex doesn't compile, a -k keyword is empty, or a 
+        # --keywords list can't be read, and combine the rest into one 
+        # PatternSet
+        for regex in args.regexp: 
+            try: 
+                re.compile(regex)
+            except re.error as error: 
+                parser.error(
+                    f"argument -e/--regexp: invalid pattern '{regex}': "
+                    f"{error}")
+        if "" in args.keyword: 
+            parser.error("argument -k/--keyword: KW can't be empty")
+        keywords = list(args.keyword)
+        for path in args.keywords: 
+            try: 
+                keywords += PatternSet.read_keywords(path)
+            except OSError as error: 
+                parser.error(
+                    f"argument --keywords: can't open '{path}': {error}")
+            except ValueError as error: 
+                parser.error(f"argument --keywords: '{path}' {error}")
+        args.patterns = None
+        if args.regexp or keywords: 
+            args.patterns = PatternSet(args.regexp, keywords)
+        
+        # Error if --follow is combined with options that end the output, 
+        # or with several FILEs
+        ending = (
+            ("-f/--first", args.first), ("--since", args.since), 
+            ("--until", args.until)
+        )
+        for option, value in ending: 
+            if args.follow and value is not None: 
+                parser.error(
+                    f"argument -F/--follow: not allowed with argument "
+                    f"{option}")
+        if args.follow and len(files) > 1: 
+            parser.error(
+                "argument -F/--follow: not allowed with more than one FILE")
+        
+        # Error if --merge is combined with options that need FILEs scanned 
+        # one at a time
+        exclusive = {"-F/--follow": args.follow, "--unordered": args.unordered}
+        for option, given in exclusive.items(): 
+            if args.merge and given: 
+                parser.error(
+                    f"argument --merge: not allowed with argument {option}")
+
+        # Error if --top is out of range, or its options are given without it
+        if args.top is None: 
+            dependent = {"--by": args.by, "--counters": args.counters}
+            for option, value in dependent.items(): 
+                if value is not None: 
+                    parser.error(f"argument {option}: not allowed without "
+                        "argument --top")
+        elif args.top < 1: 
+            parser.error("argument --top: K must be 1 or more")
+        elif args.counters is not None and args.counters < args.top: 
+            parser.error("argument --counters: NUM must be at least K")
+        args.by = args.by or "ipv4"
+
+        # Error if --count-distinct is combined with --top, or its options 
+        # are out of range or given without it. A saved sketch sets the 
+        # precision unless it is given
+        args.saved_sketch = None
+        if args.count_distinct is None: 
+            dependent = {
+                "--precision": args.precision, "--sketch": args.sketch}
+            for option, value in dependent.items(): 
+                if value is not None: 
+                    parser.error(f"argument {option}: not allowed without "
+                        "argument --count-distinct")
+        elif args.top is not None: 
+            parser.error(
+                "argument --count-distinct: not allowed with argument --top")
+        if args.precision is not None and not 4 <= args.precision <= 18: 
+            parser.error("argument --precision: P must be from 4 to 18")
+        if args.sketch is not None: 
+            try: 
+                args.saved_sketch = DistinctCounter.load(args.sketch)
+            except OSError as error: 
+                parser.error(
+                    f"argument --sketch: can't open '{args.sketch}': {error}")
+            except ValueError as error: 
+                parser.error(f"argument --sketch: '{args.sketch}' {error}")
+        saved = args.saved_sketch
+        if saved is not None: 
+            if saved.by != args.count_distinct: 
+                parser.error(f"argument --sketch: '{args.sketch}' counts "
+                    f"{saved.by} addresses")
+            if args.precision not in (None, saved.precision): 
+                parser.error(f"argument --sketch: '{args.sketch}' has "
+                    f"precision {saved.precision}")
+            args.precision = saved.precision
+        args.precision = args.precision or 14
+
+        # Error if --pipeline is combined with options that read lines by 
+        # time or as they are appended, or its options are out of range or 
+        # given without it
+        if args.pipeline: 
+            ordered = (
+                ("-F/--follow", args.follow or None), ("--since", args.since), 
+                ("--until", args.until), ("--merge", args.merge or None)
+            )
+            for option, value in ordered: 
+                if value is not None: 
+                    parser.error(f"argument --pipeline: not allowed with "
+                        f"argument {option}")
+        else: 
+            dependent = {
+                "--block-size": args.block_size, 
+                "--queue-depth": args.queue_depth
+            }
+            for option, value in dependent.items(): 
+                if value is not None: 
+                    parser.error(f"argument {option}: not allowed without "
+                        "argument --pipeline")
+        if args.queue_depth is not None and args.queue_depth < 1: 
+            parser.error("argument --queue-depth: NUM must be 1 or more")
+        args.block_size = args.block_size or STREAM_BLOCK_SIZE
+        args.queue_depth = args.queue_depth or PIPELINE_QUEUE_DEPTH
+
+        # Error if --jobs is negative
+        if args.jobs < 0: 
+            parser.error("argument -j/--jobs: NUM must be 0 or more")
+        if args.jobs == 0: 
+            args.jobs = os.cpu_count() or 1
+
         # Error if no filter arguments are given
         int_args = (args.first, args.last)
-        bool_args = (args.timestamps, args.ipv4, args.ipv6)
+        bool_args = (
+            args.timestamps, args.ipv4, args.ipv6, args.ip_sets, 
+            args.patterns, args.since, args.until, args.merge, args.top, 
+            args.count_distinct
+        )
         if (all(arg is None for arg in int_args) 
                 and all(not arg for arg in bool_args)): 
             parser.error(
@@ -143,76 +3159,1476 @@ class logParserUtil:
             front = back
         yield line[front:]
 
+    def merge_spans(self, spans): 
+        '''
+        Function to sort (start, end) spans and merge any that overlap
+        '''
+        
+        merged = []
+        for start, end in sorted(spans): 
+            if merged and start <= merged[-1][1]: 
+                if end > merged[-1][1]: 
+                    merged[-1] = (merged[-1][0], end)
+            else: 
+                merged.append((start, end))
+        return merged
+
+    def ip_spans(self, line, ipv4=True, ipv6=True): 
+        '''
+        Function to find where IP addresses appear in a string
+        Returns the sorted (start, end) spans of every IPv4 and/or IPv6 
+            match with overlapping spans merged, for callers that want the 
+            positions without building a highlighted string
+        '''
+        
+        spans = []
+        if ipv4: 
+            spans += [match.span() for match in IPV4_RE.finditer(line)]
+        if ipv6: 
+            spans += [match.span() for match in IPV6_RE.finditer(line)]
+        return self.merge_spans(spans) if ipv4 and ipv6 else spans
+
+    def highlight_spans(self, line, spans): 
+        '''
+        Function to highlight sorted, non-overlapping spans of a string
+        The output is built with a single join, so the cost is linear in 
+            the length of the line however many spans there are
+        '''
+        
+        pieces = []
+        front = 0
+        for start, end in spans: 
+            pieces += (
+                line[front:start], Back.GREEN, line[start:end], Style.RESET_ALL
+            )
+            front = end
+        pieces.append(line[front:])
+        return "".join(pieces)
+
     def highlight_ip_addresses(self, line, matches): 
         '''
         Function to highlight parts of a string given re.Match objects
         '''
         
-        # Split line into a list based on the given regex matches
-        indices = []
-        starts_with_ip = False
-        for match in matches: 
-            for i in match.span(): 
-                if i == 0: 
-                    starts_with_ip = True
-                elif i not in indices and i != len(line): 
-                    indices.append(i)
-        segments = [*self.split_by_idx(line, indices)]
+        return self.highlight_spans(
+            line, self.merge_spans(match.span() for match in matches))
+
+    def tail_offset(self, fd, size, num, block_size=BLOCK_SIZE): 
+        '''
+        Function to find the byte offset at which the last num lines of a 
+            file begin
+        The file is read backwards in fixed-size blocks until num newlines 
+            have been found, so the cost depends on the size of the tail 
+            rather than the size of the file
+        '''
+        
+        if num <= 0: 
+            return size
+
+        # A trailing newline ends the last line rather than starting one
+        pos = size
+        if size and os.pread(fd, 1, size - 1) == b"\n": 
+            pos -= 1
+
+        remaining = num
+        while pos > 0: 
+            start = max(0, pos - block_size)
+            block = os.pread(fd, pos - start, start)
+            count = block.count(b"\n")
+            if count < remaining: 
+                remaining -= count
+                pos = start
+                continue
+            idx = len(block)
+            for _ in range(remaining): 
+                idx = block.rfind(b"\n", 0, idx)
+            return start + idx + 1
+        return 0
+
+    def head_offset(self, fd, size, num, block_size=BLOCK_SIZE): 
+        '''
+        Function to find the byte offset at which the first num lines of 
+            a file end
+        Returns (offset, count) where count is the number of lines found, 
+            which is less than num if the file is shorter than that
+        '''
         
-        # Color list elements that are IPs
-        starting_position = 0 if starts_with_ip else 1
-        for i in range(starting_position, len(segments), 2): 
-            segments[i] = Back.GREEN + segments[i] + Style.RESET_ALL
+        if num <= 0: 
+            return 0, 0
+
+        pos = 0
+        remaining = num
+        block = b""
+        while pos < size: 
+            block = os.pread(fd, min(block_size, size - pos), pos)
+            count = block.count(b"\n")
+            if count < remaining: 
+                remaining -= count
+                pos += len(block)
+                continue
+            idx = -1
+            for _ in range(remaining): 
+                idx = block.find(b"\n", idx + 1)
+            return pos + idx + 1, num
+
+        # An unterminated last line still counts as a line
+        count = num - remaining
+        if block and not block.endswith(b"\n"): 
+            count += 1
+        return size, count
+
+    def byte_window(self, fd, size, first, last): 
+        '''
+        Function to translate the intersection of --first and --last into 
+            byte offsets within a file
+        Returns (start, stop, lo, hi) where [lo, hi) covers every byte 
+            whose newlines decided the window. The window is empty if 
+            start >= stop
+        '''
         
-        # Combine list into one string and return
-        return "".join(segments)
+        if last is not None and (first is None or first < 0): 
+            # Both edges are measured from the end of the file
+            start = self.tail_offset(fd, size, abs(last))
+            stop = (
+                size if first is None 
+                else self.tail_offset(fd, size, -first))
+            return start, stop, min(start, stop), size
+        if first is None: 
+            return 0, size, 0, size
+        if first < 0: 
+            stop = self.tail_offset(fd, size, -first)
+            return 0, stop, 0, size
+        if last is None: 
+            stop, _ = self.head_offset(fd, size, first)
+            return 0, stop, 0, stop
 
-    def run(self, args): 
+        # -f and -l can only overlap if the file is shorter than 
+        # -f + |-l| lines, in which case the whole file has been counted
+        stop, length = self.head_offset(fd, size, first + abs(last))
+        boundaries = self.calculate_bounds(first, last, length)
+        if length == first + abs(last) or boundaries is None: 
+            return 0, 0, 0, stop
+        start, _ = self.head_offset(fd, size, boundaries[0])
+        stop, _ = self.head_offset(fd, size, boundaries[1])
+        return start, stop, 0, size
+
+    def passthrough(self, args, encoding): 
         '''
-        Driver function
+        Function to check whether input in an encoding can be filtered and 
+            written as bytes, without being decoded
+        That needs output that takes UTF-8 bytes, and no filter that only 
+            works on decoded lines
         '''
         
-        # Parse command line args and consume input
-        args = self.parse_cli_args(args)
-        lines = args.file.readlines()
-        args.file.close()
+        out = self.writer
+        return (
+            encoding in PASSTHROUGH_ENCODINGS and out.binary is not None 
+            and out.encoding == "utf-8" and not has_text_filters(args)
+        )
+
+    def regular_file(self, stream, encodings): 
+        '''
+        Function to find the file descriptor behind a text stream
+        Returns (fd, size) if the stream reads a regular file in one of 
+            the given encodings, otherwise None
+        '''
+        
+        try: 
+            fd = stream.fileno()
+            encoding = codecs.lookup(stream.encoding).name
+        except (AttributeError, OSError, LookupError, ValueError, TypeError): 
+            return None
+        info = os.fstat(fd)
+        if not stat.S_ISREG(info.st_mode) or encoding not in encodings: 
+            return None
+        return fd, info.st_size
+
+    def seek_to_tail(self, stream, num): 
+        '''
+        Function to position a stream at the start of its last num lines
+        Only regular files in an ASCII-compatible encoding can be 
+            positioned, returns False if the stream was left untouched
+        '''
+        
+        regular_file = self.regular_file(stream, BYTE_SEEKABLE_ENCODINGS)
+        if regular_file is None: 
+            return False
+
+        # A text stream cookie with no decoder state is a byte offset
+        stream.seek(self.tail_offset(*regular_file, num))
+        return True
+
+    def build_line_filter(self, args, highlight=True, stats=None): 
+        '''
+        Function to build a callable that applies -t, -i, and -I to a line
+        The callable returns the line to be printed, with any IPs 
+            highlighted if highlight is set, or None if the line fails one 
+            of the filters
+        Every REORDER_INTERVAL lines the stages are re-sorted so the ones 
+            rejecting the most lines for their cost run first. If a RunStats 
+            is given, filtering and highlighting are timed separately
+        '''
+        
+        stages = build_filter_stages(
+            args.timestamps, args.ipv4, args.ipv6, 
+            getattr(args, "ip_sets", ()), getattr(args, "patterns", None))
+        self.filter_stages = stages
+        highlighting = highlight and (args.ipv4 or args.ipv6)
+        ip_spans, highlight_spans = self.ip_spans, self.highlight_spans
+        ipv4, ipv6 = args.ipv4, args.ipv6
+        countdown = [REORDER_INTERVAL]
+
+        # With stats, highlighting is done outside the filter to time it
+        highlight = highlighting and stats is None
+
+        def line_filter(line): 
+            countdown[0] -= 1
+            if not countdown[0]: 
+                stages.sort(key=FilterStage.rank)
+                countdown[0] = REORDER_INTERVAL
+            for stage in stages: 
+                stage.checked += 1
+                if not stage.check(line): 
+                    stage.rejected += 1
+                    return None
+            if highlight: 
+                line = highlight_spans(line, ip_spans(line, ipv4, ipv6))
+            return line
+
+        if stats is None: 
+            return line_filter
+        
+        check = stats.timed("filter", line_filter)
+        mark = stats.timed(
+            "highlight", lambda line: highlight_spans(
+                line, ip_spans(line, ipv4, ipv6)))
+
+        def timed_line_filter(line): 
+            line = check(line)
+            if line is None or not highlighting: 
+                return line
+            return mark(line)
+
+        return timed_line_filter
+
+    def stream_lines(self, lines, first, last): 
+        '''
+        Generator that yields the lines of an iterable falling within the 
+            intersection of --first and --last
+        Input is consumed one line at a time and reading stops as soon as 
+            no further lines can be yielded
+        '''
+        
+        window = LineWindow(first, last)
+        if window.unbounded: 
+            yield from lines
+            return
+        if window.done: 
+            return
+        for line in lines: 
+            yield from window.push(line)
+            if window.done: 
+                break
+        yield from window.finish()
+
+    def split_at_newlines(self, buf, start, stop, jobs): 
+        '''
+        Function to split buf[start:stop] into byte ranges for --jobs
+        Every range ends just after a newline, or at stop, so no line is 
+            shared between two ranges
+        '''
+        
+        # A few ranges per worker evens out the load without holding many 
+        # finished results in memory while waiting for an earlier one
+        size = (stop - start) // (jobs * 4)
+        size = min(max(size, MIN_CHUNK_SIZE), MAX_CHUNK_SIZE)
+        chunks = []
+        while start < stop: 
+            end = buf.find(b"\n", min(start + size, stop) - 1, stop) + 1
+            end = end or stop
+            chunks.append((start, end))
+            start = end
+        return chunks
+
+    def scan_in_parallel(self, worker, path, chunks, jobs, *flags): 
+        '''
+        Generator that runs worker over byte ranges of a file in jobs 
+            worker processes
+        Results are yielded in the order of the ranges, with at most two 
+            ranges per worker in flight at once
+        '''
+        
+        with ProcessPoolExecutor(max_workers=jobs) as pool: 
+            pending = deque()
+            for start, stop in chunks: 
+                pending.append(pool.submit(worker, path, start, stop, *flags))
+                if len(pending) >= 2 * jobs: 
+                    yield pending.popleft().result()
+            while pending: 
+                yield pending.popleft().result()
+
+    def worker_path(self, stream, fd): 
+        '''
+        Function to find a path that worker processes can reopen
+        Returns None if the stream's name does not lead back to its file
+        '''
+        
+        path = getattr(stream, "name", None)
+        if not isinstance(path, str): 
+            return None
+        try: 
+            info = os.stat(path)
+        except OSError: 
+            return None
+        opened = os.fstat(fd)
+        if (info.st_dev, info.st_ino) != (opened.st_dev, opened.st_ino): 
+            return None
+        return path
+
+    def scan_file(self, args, line_filter): 
+        '''
+        Function to scan a regular file through a memory map
+        The window given by -f and -l is located with byte offsets, and the 
+            filters run over the mapped bytes so only matching lines are 
+            ever copied. Returns False if FILE cannot be scanned this way, 
+            in which case nothing has been read or printed
+        '''
+        
+        regular_file = self.regular_file(args.file, PASSTHROUGH_ENCODINGS)
+        out = self.writer
+        stats = self.stats
+        if regular_file is None or not self.passthrough(
+                args, codecs.lookup(args.file.encoding).name): 
+            return False
+        fd, size = regular_file
+        if size == 0: 
+            return True
+
+        with mmap.mmap(fd, 0, access=mmap.ACCESS_READ) as buf: 
+            index = self.line_index(args.file, fd, buf) if args.index else None
+            if index is not None: 
+                self.scan_index(args, index, buf, line_filter)
+                return True
+            
+            start, stop, lo, hi = self.byte_window(
+                fd, size, args.first, args.last)
+            # Text mode also ends lines at carriage returns, which would 
+            # move the window, so leave those files to the text reader
+            if buf.find(b"\r", lo, hi) != -1: 
+                return False
+            if start >= stop: 
+                return True
+            
+            # Pages are read in as the scan touches them, so for a mapped 
+            # file the read stage is part of the filter stage
+            write = out.write
+            if stats is not None: 
+                lines = count_lines(buf, start, stop)
+                stats.bytes_read += stop - start
+                stats.lines_read += lines
+                stats.window_lines += lines
+                write = stats.timed("write", write)
+
+            if not has_filters(args): 
+                with memoryview(buf) as view: 
+                    for pos in range(start, stop, OUTPUT_BUFFER_SIZE): 
+                        write(view[pos:min(pos + OUTPUT_BUFFER_SIZE, stop)])
+                    out.flush()
+                return True
+
+            # Split large windows between worker processes
+            path = self.worker_path(args.file, fd)
+            if (args.jobs > 1 and path is not None 
+                    and stop - start > MIN_CHUNK_SIZE): 
+                chunks = self.split_at_newlines(buf, start, stop, args.jobs)
+                results = self.scan_in_parallel(
+                    scan_chunk, path, chunks, args.jobs, args.timestamps, 
+                    args.ipv4, args.ipv6, stats is not None, self.highlight, 
+                    args.engine)
+                if stats is not None: 
+                    results = stats.timed_iter("filter", results)
+                for result, counts in results: 
+                    write(result)
+                    for name, (checked, rejected) in (counts or {}).items(): 
+                        add_counts(
+                            stats.stage_counts, name, checked, rejected)
+                return True
+
+            counts = None if stats is None else stats.stage_counts
+            if self.highlight: 
+                matches = iter_matching_lines(
+                    buf, start, stop, args.timestamps, args.ipv4, args.ipv6, 
+                    counts)
+            else: 
+                matches = iter_matching_runs(
+                    buf, start, stop, args.timestamps, args.ipv4, args.ipv6, 
+                    counts, args.engine)
+            if stats is not None: 
+                matches = stats.timed_iter("filter", matches)
+            if self.highlight: 
+                for line in matches: 
+                    write(line_filter(line.decode()))
+            else: 
+                for run in matches: 
+                    write(run)
+        return True
+
+    def line_index(self, stream, fd, buf): 
+        '''
+        Function to load the index of a mapped file, extending it if the 
+            file has been appended to, or building it if it is missing or 
+            stale, and saving it in either case
+        Returns None if the file has no path to keep an index next to, or 
+            contains carriage returns, which end lines in text mode
+        '''
+        
+        path = self.worker_path(stream, fd)
+        if path is None: 
+            return None
+        identity = LineIndex.identity_of(fd)
+        index_path = path + INDEX_SUFFIX
+        index = LineIndex.load(index_path)
+        if index is not None and index.identity == identity: 
+            return index
+        
+        # Only the new bytes of a file that has grown by appending need to 
+        # be scanned, anything else is indexed from the start
+        if index is not None and index.appended_to(buf, identity): 
+            start = index.offsets[-1]
+            if buf.find(b"\r", start) != -1: 
+                return None
+            index = index.extend(buf, identity)
+        else: 
+            if buf.find(b"\r") != -1: 
+                return None
+            index = LineIndex.build(buf, identity)
+        index.save(index_path)
+        return index
+
+    def scan_index(self, args, index, buf, line_filter): 
+        '''
+        Function to print the lines of a mapped file selected by its index
+        The window given by -f and -l is a range of line numbers, and only 
+            lines whose feature bits satisfy -t, -i, and -I are read
+        '''
+        
+        offsets, out, stats = index.offsets, self.writer, self.stats
+        bounds = self.calculate_bounds(
+            args.first, args.last, index.line_count)
+        if bounds is None: 
+            return
+        lo, hi = bounds
+        kinds = filter_kinds(args.timestamps, args.ipv4, args.ipv6)
+        runs = index.matching_runs(lo, hi, kinds) if kinds else [(lo, hi)]
+        
+        write = out.write
+        if stats is not None: 
+            stats.window_lines += hi - lo
+            write = stats.timed("write", write)
+        matched = 0
+        for first, stop in runs: 
+            matched += stop - first
+            start, end = offsets[first], offsets[stop]
+            if stats is not None: 
+                stats.lines_read += stop - first
+                stats.bytes_read += end - start
+            if self.highlight: 
+                for line in buf[start:end].splitlines(True): 
+                    write(line_filter(line.decode()))
+            else: 
+                write(buf[start:end])
+        if stats is not None and kinds: 
+            add_counts(stats.stage_counts, "index lookup", hi - lo, 
+                hi - lo - matched)
+
+    def open_compressed(self, stream): 
+        '''
+        Function to detect gzip, bz2, and xz input by its leading bytes
+        Returns a text stream of the decompressed data, decoded like FILE, 
+            or None if the input is not compressed
+        '''
+        
+        try: 
+            magic = stream.buffer.peek(10)
+        except (AttributeError, OSError, ValueError): 
+            return None
+        for header, decompressor in COMPRESSED_FORMATS: 
+            if decompressor is not None and header.match(magic): 
+                return io.TextIOWrapper(
+                    decompressor(stream.buffer), encoding=stream.encoding, 
+                    errors=stream.errors)
+        return None
+
+    def scan_compressed(self, args, line_filter, text): 
+        '''
+        Function to scan decompressed input as it is decompressed
+        With -f or -l, lines go through the same window as any other 
+            stream, so --last only holds NUM lines. Otherwise decompressed 
+            blocks are filtered whole, and gzip files made of several 
+            members, such as logs compressed in pieces and concatenated, 
+            are split between --jobs worker processes at member boundaries
+        '''
         
-        # Find the intersection of -f and -l, ret. if intersection DNE
-        boundaries = self.calculate_bounds(args.first, args.last, len(lines))
-        if (boundaries is None 
-                or boundaries in [[0,0], [len(lines),len(lines)]]): 
+        encoding = codecs.lookup(text.encoding).name
+        if (args.first is not None or args.last is not None 
+                or encoding not in BYTE_SEEKABLE_ENCODINGS 
+                or has_text_filters(args)): 
+            self.scan_stream(args, line_filter, text)
             return
         
-        # Compile regex strings into regex pattern objects
-        timestamp_re = re.compile(TIMESTAMP_PAT)
-        ipv4_re = re.compile(IPV4_PAT)
-        ipv6_re = re.compile(IPV6_PAT)
+        lines_done = 0
+        if args.jobs > 1 and isinstance(text.buffer, gzip.GzipFile): 
+            lines_done = self.scan_gzip_in_parallel(args, line_filter)
+            if lines_done is None: 
+                return
+        if lines_done: 
+            # Workers stopped partway, so carry on from the first line they 
+            # didn't finish
+            lines = itertools.islice(text, lines_done, None)
+            self.scan_stream(args, line_filter, lines)
+            return
+        
+        passthrough = self.passthrough(args, encoding)
+        emit = self.block_emitter(args, line_filter, encoding, passthrough)
+        pending = b""
+        for data in iter(lambda: text.buffer.read(STREAM_BLOCK_SIZE), b""): 
+            data = pending + data
+            end = data.rfind(b"\n") + 1
+            pending = data[end:]
+            emit(data[:end])
+        emit(pending)
+        if self.stats is not None and not passthrough: 
+            add_stage_counts(self.stats.stage_counts, self.filter_stages)
+
+    def gzip_member_chunks(self, buf, jobs): 
+        '''
+        Function to split a gzip file into byte ranges for --jobs
+        Ranges start where a gzip member header appears to start, which 
+            the worker processes confirm as they decompress
+        '''
+        
+        size = len(buf)
+        target = min(max(size // (jobs * 4), MIN_CHUNK_SIZE), MAX_CHUNK_SIZE)
+        starts = [0]
+        while True: 
+            match = GZIP_MEMBER_RE.search(buf, starts[-1] + target)
+            if match is None: 
+                break
+            starts.append(match.start())
+        return list(zip(starts, starts[1:] + [size]))
+
+    def scan_gzip_in_parallel(self, args, line_filter): 
+        '''
+        Function to filter the members of a gzip file in worker processes
+        Lines split between ranges are put back together and filtered 
+            here. Returns None once every line has been filtered, or the 
+            number of lines already filtered if a range could not be 
+            handled, in which case the rest must be read in order
+        '''
+        
+        regular_file = self.regular_file(args.file, PASSTHROUGH_ENCODINGS)
+        out, stats = self.writer, self.stats
+        if (regular_file is None or out.binary is None 
+                or out.encoding != "utf-8"): 
+            return 0
+        fd, _ = regular_file
+        path = self.worker_path(args.file, fd)
+        if path is None: 
+            return 0
+        with mmap.mmap(fd, 0, access=mmap.ACCESS_READ) as buf: 
+            chunks = self.gzip_member_chunks(buf, args.jobs)
+        if len(chunks) < 2: 
+            return 0
+        
+        def emit(lines): 
+            if self.highlight: 
+                for line in lines.splitlines(True): 
+                    out.write(line_filter(line.decode()))
+            else: 
+                out.write(lines)
+        
+        def emit_line(line): 
+            emit(b"".join(iter_matching_runs(
+                line, 0, len(line), args.timestamps, args.ipv4, args.ipv6, 
+                None if stats is None else stats.stage_counts, args.engine)))
+        
+        lines_done, carry = 0, b""
+        results = self.scan_in_parallel(
+            scan_gzip_members, path, chunks, args.jobs, args.timestamps, 
+            args.ipv4, args.ipv6, stats is not None, args.engine)
+        for result in results: 
+            if result is None: 
+                results.close()
+                return lines_done
+            head, matches, tail, lines, size, counts = result
+            lines_done += lines
+            if stats is not None: 
+                stats.bytes_read += size
+                stats.lines_read += lines
+                stats.window_lines += lines
+                for name, (checked, rejected) in (counts or {}).items(): 
+                    add_counts(stats.stage_counts, name, checked, rejected)
+            if not head.endswith(b"\n"): 
+                carry += head
+                continue
+            emit_line(carry + head)
+            emit(matches)
+            carry = tail
+        if carry: 
+            emit_line(carry)
+        return None
+
+    def follow(self, args, line_filter): 
+        '''
+        Function to print the --last window of FILE and then keep printing 
+            lines as they are appended, until interrupted
+        FILE is polled with a delay that doubles while it is idle, and 
+            output is flushed whenever there is no more data waiting. A 
+            shorter FILE is read again from the start, and a new file moved 
+            into FILE's place is followed once the old one has been read to 
+            its end. Returns False if FILE is not a regular file in an 
+            ASCII-compatible encoding, in which case nothing has been read
+        '''
+        
+        regular_file = self.regular_file(args.file, BYTE_SEEKABLE_ENCODINGS)
+        if regular_file is None: 
+            return False
+        fd, size = regular_file
+        path = self.worker_path(args.file, fd)
+        fd = os.dup(fd)
+        encoding = codecs.lookup(args.file.encoding).name
+        passthrough = self.passthrough(args, encoding)
+        emit = self.block_emitter(args, line_filter, encoding, passthrough)
+        
+        position = 0 if args.last is None else self.tail_offset(
+            fd, size, abs(args.last))
+        pending = b""
+        interval = FOLLOW_MIN_INTERVAL
+        try: 
+            while True: 
+                data = os.pread(fd, STREAM_BLOCK_SIZE, position)
+                if data: 
+                    # Only complete lines are filtered, the rest waits for 
+                    # its newline
+                    position += len(data)
+                    data = pending + data
+                    end = data.rfind(b"\n") + 1
+                    pending = data[end:]
+                    emit(data[:end])
+                    interval = FOLLOW_MIN_INTERVAL
+                    continue
+                self.writer.flush()
+                
+                # A file that shrank was truncated, and a path that leads to 
+                # another inode was rotated. Either way an unterminated last 
+                # line is finished
+                info = os.fstat(fd)
+                try: 
+                    current = None if path is None else os.stat(path)
+                except OSError: 
+                    current = None
+                if info.st_size < position: 
+                    emit(pending)
+                    pending, position = b"", 0
+                elif current is not None and (
+                        (current.st_dev, current.st_ino) 
+                        != (info.st_dev, info.st_ino)): 
+                    emit(pending)
+                    pending, position = b"", 0
+                    os.close(fd)
+                    fd = os.open(path, os.O_RDONLY)
+                else: 
+                    time.sleep(interval)
+                    interval = min(interval * 2, FOLLOW_MAX_INTERVAL)
+        except KeyboardInterrupt: 
+            # Interrupting is how following ends
+            emit(pending)
+        finally: 
+            os.close(fd)
+        if self.stats is not None and not passthrough: 
+            add_stage_counts(self.stats.stage_counts, self.filter_stages)
+        return True
+
+    def block_emitter(self, args, line_filter, encoding, passthrough): 
+        '''
+        Function to build a callable that filters and writes a block of 
+            whole lines read by --follow or from compressed input
+        '''
+        
+        out, stats = self.writer, self.stats
+        filter_block = self.block_filter(
+            args, line_filter, encoding, passthrough, 
+            None if stats is None else stats.stage_counts)
+        write = out.write if stats is None else stats.timed("write", out.write)
+
+        def emit(data): 
+            if not data: 
+                return
+            if stats is not None: 
+                lines = data.count(b"\n") + (data[-1] != 10)
+                stats.bytes_read += len(data)
+                stats.lines_read += lines
+                stats.window_lines += lines
+            write(filter_block(data))
+
+        return emit
+
+    def block_filter(self, args, line_filter, encoding, passthrough, 
+            counts=None): 
+        '''
+        Function to build a callable that filters a block of whole lines, 
+            given as bytes or text, and returns the matching lines joined
+        If passthrough is set, blocks of bytes are filtered like a mapped 
+            file, so a burst of appended lines is handled as fast as a full 
+            scan. Their stage counts are added to counts if it is given
+        '''
+        
+        filtering = has_filters(args)
+        errors = getattr(args.file, "errors", None) or "strict"
+
+        def filter_block(data): 
+            # Carriage returns end lines in text mode, so those blocks are 
+            # decoded with universal newlines like any other input
+            if passthrough and isinstance(data, bytes) and b"\r" not in data: 
+                if not filtering: 
+                    return data
+                if not self.highlight: 
+                    return b"".join(iter_matching_runs(
+                        data, 0, len(data), args.timestamps, args.ipv4, 
+                        args.ipv6, counts, args.engine))
+                matches = iter_matching_lines(
+                    data, 0, len(data), args.timestamps, args.ipv4, 
+                    args.ipv6, counts)
+                return "".join(line_filter(line.decode()) for line in matches)
+            
+            if isinstance(data, bytes): 
+                data = data.decode(encoding, errors)
+            lines = io.StringIO(data, newline=None)
+            if not filtering: 
+                return "".join(lines)
+            return "".join(
+                line for line in map(line_filter, lines) if line is not None)
+
+        return filter_block
+
+    def scan_pipeline(self, args, text): 
+        '''
+        Function to scan input with --pipeline
+        A reader thread reads blocks of --block-size bytes, decompressing 
+            them if the input is compressed, cuts them at their last 
+            newline, and keeps the lines within -f and -l. -j filter 
+            threads filter the blocks, in worker processes if there is more 
+            than one thread, and the matching lines are written here in 
+            input order. The stages are joined by queues of --queue-depth 
+            blocks, and a block is only read once there is room for it, so 
+            memory stays within a few blocks
+        '''
+        
+        out, stats = self.writer, self.stats
+        encoding = codecs.lookup(getattr(text, "encoding", None) or "utf-8")
+        encoding = encoding.name
+        threads = args.jobs
+        
+        # Blocks are cut at newlines as bytes in ASCII-compatible encodings, 
+        # and read as text otherwise
+        if encoding in BYTE_SEEKABLE_ENCODINGS and hasattr(text, "buffer"): 
+            read, newline = text.buffer.read, b"\n"
+        else: 
+            read, newline = text.read, "\n"
+        passthrough = self.passthrough(args, encoding)
+        filtering = has_filters(args)
+        pool = None
+        if threads > 1 and passthrough and filtering: 
+            # The workers are started before any thread of ours, so none of 
+            # them is forked holding a lock, such as standard input's while 
+            # the reader waits on it
+            pool = ProcessPoolExecutor(max_workers=threads)
+            for future in [pool.submit(int) for _ in range(threads)]: 
+                future.result()
+        
+        # Each filter thread gets filter stages and stats of its own, and 
+        # they are added together at the end
+        blocks = PipelineQueue(args.queue_depth)
+        results = PipelineQueue(args.queue_depth)
+        filters = []
+        for _ in range(threads): 
+            line_filter = self.build_line_filter(args, self.highlight)
+            thread_stats = None if stats is None else RunStats()
+            filter_block = self.block_filter(
+                args, line_filter, encoding, passthrough, 
+                None if stats is None else thread_stats.stage_counts)
+            if pool is not None: 
+                filter_block = self.pooled_filter(
+                    args, pool, filter_block, thread_stats)
+            if stats is not None: 
+                filter_block = thread_stats.timed(
+                    "filter", filter_block, time.thread_time)
+            filters.append((filter_block, self.filter_stages, thread_stats))
+        
+        # Slots are held from reading a block until it is written, which 
+        # also bounds the blocks held back behind a slower one
+        slots = threading.Semaphore(2 * args.queue_depth + threads)
+        stop = threading.Event()
+        failures = []
+        if stats is not None: 
+            read = stats.timed("read", read, time.thread_time)
+        window = LineWindow(args.first, args.last)
+
+        def count_lines(data): 
+            return data.count(newline) + (
+                bool(data) and not data.endswith(newline))
+
+        def window_block(data, finished): 
+            # -f and -l count every line, so the window is kept here and 
+            # only the lines it releases are filtered
+            released = []
+            lines = data.split(newline)
+            for line in lines[:-1]: 
+                released += window.push(line + newline)
+                if window.done: 
+                    break
+            else: 
+                if lines[-1]: 
+                    released += window.push(lines[-1])
+            if finished or window.done: 
+                released += window.finish()
+            return newline[:0].join(released)
+
+        def reader(): 
+            pending, seq = newline[:0], 0
+            try: 
+                finished = window.done
+                while not finished and not stop.is_set(): 
+                    data = read(args.block_size)
+                    finished = not data
+                    if finished: 
+                        data, pending = pending, newline[:0]
+                    else: 
+                        data = pending + data
+                        end = data.rfind(newline) + 1
+                        data, pending = data[:end], data[end:]
+                    if stats is not None: 
+                        stats.bytes_read += len(data)
+                        stats.lines_read += count_lines(data)
+                    if not window.unbounded: 
+                        data = window_block(data, finished)
+                        finished = finished or window.done
+                    if data: 
+                        while not slots.acquire(timeout=0.05): 
+                            if stop.is_set(): 
+                                return
+                        if stats is not None: 
+                            stats.window_lines += count_lines(data)
+                        blocks.put((seq, data))
+                        seq += 1
+            except BaseException as error: 
+                failures.append(error)
+                stop.set()
+            finally: 
+                for _ in range(threads): 
+                    blocks.put(None)
+
+        def matcher(filter_block): 
+            try: 
+                for seq, data in iter(blocks.get, None): 
+                    if not stop.is_set(): 
+                        results.put((seq, filter_block(data)))
+            except BaseException as error: 
+                failures.append(error)
+                stop.set()
+            finally: 
+                results.put(None)
+
+        workers = [threading.Thread(target=reader, daemon=True)] + [
+            threading.Thread(target=matcher, args=(filter_block,), daemon=True)
+            for filter_block, _, _ in filters
+        ]
+        for worker in workers: 
+            worker.start()
+        write = out.write
+        if stats is not None: 
+            write = stats.timed("write", write, time.thread_time)
+        waiting, next_seq, finished = {}, 0, 0
+        try: 
+            while finished < threads: 
+                item = results.get()
+                if item is None: 
+                    finished += 1
+                    continue
+                seq, data = item
+                waiting[seq] = data
+                while next_seq in waiting: 
+                    write(waiting.pop(next_seq))
+                    next_seq += 1
+                    slots.release()
+        except BaseException: 
+            # Stop the other stages without waiting on a read that may 
+            # never return, making room for any filter thread stuck on a 
+            # full queue
+            stop.set()
+            while True: 
+                try: 
+                    results.queue.get_nowait()
+                except queue.Empty: 
+                    break
+            raise
+        finally: 
+            if pool is not None: 
+                pool.shutdown(cancel_futures=True)
+        for worker in workers: 
+            worker.join()
+        if failures: 
+            raise failures[0]
+        
+        if stats is not None: 
+            stats.queues["read -> filter"] = blocks.counters
+            stats.queues["filter -> write"] = results.counters
+            for _, stages, thread_stats in filters: 
+                stats.merge(thread_stats)
+                if not passthrough: 
+                    add_stage_counts(stats.stage_counts, stages)
+
+    def pooled_filter(self, args, pool, filter_block, stats): 
+        '''
+        Function to wrap a --pipeline filter thread's block filter so blocks 
+            of bytes are filtered in a worker process, leaving the thread 
+            free to wait on it
+        '''
+        
+        def pooled_filter_block(data): 
+            if not isinstance(data, bytes) or b"\r" in data: 
+                return filter_block(data)
+            matches, counts = pool.submit(
+                scan_block, data, args.timestamps, args.ipv4, args.ipv6, 
+                stats is not None, self.highlight, args.engine).result()
+            for name, (checked, rejected) in (counts or {}).items(): 
+                add_counts(stats.stage_counts, name, checked, rejected)
+            return matches
+
+        return pooled_filter_block
+
+    def scan_stream(self, args, line_filter, lines=None, time_range=None): 
+        '''
+        Function to scan any other input one line at a time
+        Lines are read from FILE unless another iterable of lines is given. 
+            If a TimeRange is given, lines outside it are skipped before 
+            the -f and -l window is applied
+        '''
         
-        # Init colorama for highlighting if searching for IP addresses
-        if args.ipv4 or args.ipv6: 
-            init()
+        # -l on a regular file only needs to read the tail of the file. 
+        # Positive -f needs the line count and is bounded by -f + |-l| 
+        # lines anyway, so it always reads from the start
+        if lines is None: 
+            lines = args.file
+            if (args.last is not None and time_range is None 
+                    and (args.first is None or args.first < 0)): 
+                self.seek_to_tail(args.file, abs(args.last))
         
-        # Print each line in the intersection of the given arguments
-        for line in lines[boundaries[0]:boundaries[1]]: 
-            if args.timestamps:
-                if not timestamp_re.search(line):
+        # Stream each line in the intersection of -f and -l through the 
+        # filters, writing out matches as they are found
+        filtering = has_filters(args)
+        write = self.writer.write
+        stats = self.stats
+        if stats is not None: 
+            lines = stats.reading(
+                lines, getattr(lines, "encoding", None) or args.file.encoding)
+        if time_range is not None: 
+            lines = time_range.lines(lines)
+        window = self.stream_lines(lines, args.first, args.last)
+        if stats is not None: 
+            window = stats.counting(window)
+            write = stats.timed("write", write)
+        for line in window: 
+            if filtering: 
+                line = line_filter(line)
+                if line is None: 
                     continue
-            if args.ipv4:
-                IP_match = [*ipv4_re.finditer(line)]
-                if not IP_match:
+            write(line)
+        if stats is not None: 
+            add_stage_counts(stats.stage_counts, self.filter_stages)
+
+    def timed_records(self, name, lines, compressed=False): 
+        '''
+        Generator that yields (timestamp, name, lines) for each line of an 
+            input that has an HH:MM:SS timestamp, where lines also holds the 
+            lines without a timestamp that follow it
+        Lines before the first timestamp are given an empty timestamp so 
+            they are merged first
+        '''
+        
+        search = re.compile(TIMESTAMP_PAT).search
+        key, group = "", []
+        try: 
+            for line in lines: 
+                found = search(line)
+                if found is None: 
+                    group.append(line)
                     continue
-                line = self.highlight_ip_addresses(line, IP_match)
-            if args.ipv6:
-                IP_match = [*ipv6_re.finditer(line)]
-                if not IP_match:
+                if group: 
+                    yield key, name, group
+                key, group = found.group(), [line]
+        except DECOMPRESSION_ERRORS as error: 
+            if not compressed: 
+                raise
+            raise DecompressionError(
+                f"can't decompress '{name}': {error}") from error
+        if group: 
+            yield key, name, group
+
+    def merge_files(self, args): 
+        '''
+        Function to merge FILEs that are each in time order into one stream 
+            ordered by the first HH:MM:SS timestamp of each line, and then 
+            scan it like a single FILE
+        Only the current line of each FILE, and the lines without a 
+            timestamp after it, are held at a time, so memory grows with the 
+            number of FILEs rather than their length. Lines from several 
+            FILEs are prefixed with the file name. FILEs that can't be 
+            opened are reported to stderr, and True is returned if there 
+            were any
+        '''
+        
+        if args.file is not None: 
+            inputs = [(args.file.name, args.file)]
+        else: 
+            inputs = []
+        streams = []
+        failed = False
+        try: 
+            for path in args.files if args.file is None else (): 
+                try: 
+                    file = open(path)
+                except OSError as error: 
+                    print(f"{self.parser.prog}: can't open '{path}': {error}", 
+                        file=sys.stderr)
+                    failed = True
                     continue
-                line = self.highlight_ip_addresses(line, IP_match)
+                streams.append(file)
+                inputs.append((path, file))
             
-            print(line,end="")
+            sources = []
+            for name, file in inputs: 
+                text = self.open_compressed(file)
+                lines = file if text is None else text
+                if text is not None: 
+                    streams.append(text)
+                if self.stats is not None: 
+                    lines = self.stats.reading(lines, lines.encoding)
+                sources.append(
+                    self.timed_records(name, lines, text is not None))
+            
+            # heapq.merge breaks ties by input order, so a line is never 
+            # separated from the lines without a timestamp after it
+            merged = heapq.merge(*sources, key=itemgetter(0))
+            if args.since is not None or args.until is not None: 
+                time_range = TimeRange(args.since, args.until)
+                merged = (
+                    record for record in merged 
+                    if time_range.includes(record[0])
+                )
+            lines = (
+                (name, line) for _, name, group in merged for line in group)
+            self.write_merged(
+                args, lines, len(args.files) > 1 
+                and not isinstance(self.writer, KeyCounter))
+        finally: 
+            for stream in reversed(streams): 
+                stream.close()
+            if args.file is not None: 
+                args.file.close()
+        return failed
+
+    def write_merged(self, args, lines, prefix): 
+        '''
+        Function to window, filter, and write (name, line) pairs from 
+            merge_files, prefixing each line with its name if prefix is set
+        '''
+        
+        line_filter = self.build_line_filter(args, self.highlight, self.stats)
+        filtering = has_filters(args)
+        write = self.writer.write
+        stats = self.stats
+        window = self.stream_lines(lines, args.first, args.last)
+        if stats is not None: 
+            window = stats.counting(window)
+            write = stats.timed("write", write)
+        for name, line in window: 
+            if filtering: 
+                line = line_filter(line)
+                if line is None: 
+                    continue
+            if prefix: 
+                if not line.endswith("\n"): 
+                    line += "\n"
+                line = f"{name}:{line}"
+            write(line)
+        if stats is not None: 
+            add_stage_counts(stats.stage_counts, self.filter_stages)
+
+    def scan_time_range(self, args, line_filter): 
+        '''
+        Function to scan the lines of FILE between --since and --until
+        Regular files in time order are bisected so only the lines in the 
+            window are read. Other input, or files that turn out not to be 
+            in time order, is read in full and lines outside are skipped
+        '''
+        
+        time_range = TimeRange(args.since, args.until)
+        regular_file = self.regular_file(args.file, BYTE_SEEKABLE_ENCODINGS)
+        if regular_file is not None and regular_file[1] > 0: 
+            fd, _ = regular_file
+            with mmap.mmap(fd, 0, access=mmap.ACCESS_READ) as buf: 
+                ranges = time_range.offsets(buf)
+                # Text mode also ends lines at carriage returns, so leave 
+                # those files to the text reader
+                if ranges is not None and all(
+                        buf.find(b"\r", start, stop) == -1 
+                        for start, stop in ranges): 
+                    lines = self.mapped_lines(
+                        buf, ranges, args.file.encoding, args.file.errors)
+                    self.scan_stream(args, line_filter, lines, time_range)
+                    return
+        self.scan_stream(args, line_filter, time_range=time_range)
+
+    def mapped_lines(self, buf, ranges, encoding, errors): 
+        '''
+        Generator that yields the decoded lines in byte ranges of a 
+            memory-mapped file, decoding a block of lines at a time
+        '''
+        
+        for start, stop in ranges: 
+            while start < stop: 
+                end = min(start + STREAM_BLOCK_SIZE, stop)
+                end = buf.find(b"\n", end - 1, stop) + 1 or stop
+                text = buf[start:end].decode(encoding, errors)
+                yield from io.StringIO(text, newline="\n")
+                start = end
+
+    def report_stats(self, file=None): 
+        '''
+        Function to print the stats of the last run, to stderr by default
+        '''
+        
+        self.stats.report(file)
+
+    def scan(self, args): 
+        '''
+        Function to filter the input open as args.file, writing matching 
+            lines through self.writer and closing the input afterwards
+        Raises DecompressionError if compressed input is damaged
+        '''
+        
+        line_filter = self.build_line_filter(args, self.highlight, self.stats)
+        compressed = self.open_compressed(args.file)
+        timed = args.since is not None or args.until is not None
+        try: 
+            if compressed is not None: 
+                try: 
+                    if timed: 
+                        self.scan_stream(
+                            args, line_filter, compressed, 
+                            TimeRange(args.since, args.until))
+                    elif args.pipeline: 
+                        self.scan_pipeline(args, compressed)
+                    else: 
+                        self.scan_compressed(args, line_filter, compressed)
+                except BrokenPipeError: 
+                    raise
+                except DECOMPRESSION_ERRORS as error: 
+                    raise DecompressionError(
+                        f"can't decompress '{args.file.name}': {error}"
+                    ) from error
+            elif timed: 
+                self.scan_time_range(args, line_filter)
+            elif args.pipeline: 
+                self.scan_pipeline(args, args.file)
+            elif not (args.follow and self.follow(args, line_filter)): 
+                if not self.scan_file(args, line_filter): 
+                    self.scan_stream(args, line_filter)
+        finally: 
+            if compressed is not None: 
+                compressed.close()
+            args.file.close()
+
+    def scan_files(self, args): 
+        '''
+        Function to filter several FILEs, in a pool of --jobs worker 
+            processes if --jobs is above 1, or one after another otherwise
+        Each file is filtered on its own, so -f and -l apply per file, and 
+            its lines are prefixed with its name. Files that can't be read 
+            are reported to stderr, and True is returned if there were any
+        '''
+        
+        # Workers are handed the arguments without the open input
+        options = argparse.Namespace(**vars(args))
+        options.file, options.files, options.jobs = None, [], 1
+        out = self.writer
+        encoding = out.encoding or "utf-8"
+        flags = (
+            options, encoding, out.errors or "strict", self.highlight, 
+            self.stats is not None
+        )
+        
+        if args.jobs <= 1: 
+            results = (
+                (path, scan_path(path, *flags)) for path in args.files)
+        else: 
+            results = self.scan_paths_in_parallel(
+                args.files, args.jobs, args.unordered, flags)
+        
+        failed = False
+        for path, (output, stats, error) in results: 
+            if stats is not None: 
+                self.stats.merge(stats)
+            if error is not None: 
+                out.flush()
+                print(f"{self.parser.prog}: {error}", file=sys.stderr)
+                failed = True
+            if isinstance(output, KeyCounter): 
+                out.merge(output)
+            elif isinstance(output, str): 
+                # Spooled output is copied a block at a time
+                try: 
+                    with open(output, "rb") as spooled: 
+                        for block in iter(
+                                lambda: spooled.read(STREAM_BLOCK_SIZE), b""): 
+                            out.write(block)
+                finally: 
+                    discard_output(output)
+            elif output: 
+                out.write(output)
+        return failed
+
+    def scan_paths_in_parallel(self, paths, jobs, unordered, flags): 
+        '''
+        Generator that filters files in jobs worker processes, yielding 
+            (path, result) pairs in argument order, or as soon as each file 
+            is done if unordered is set
+        '''
+        
+        # Futures not yet yielded, mapped to their paths in submission order
+        pending = {}
+        with ProcessPoolExecutor(max_workers=jobs) as pool: 
+            try: 
+                if unordered: 
+                    for path in paths: 
+                        pending[pool.submit(scan_path, path, *flags)] = path
+                    for future in as_completed(list(pending)): 
+                        yield pending.pop(future), future.result()
+                    return
+                for path in paths: 
+                    pending[pool.submit(scan_path, path, *flags)] = path
+                    if len(pending) >= 2 * jobs: 
+                        future = next(iter(pending))
+                        yield pending.pop(future), future.result()
+                while pending: 
+                    future = next(iter(pending))
+                    yield pending.pop(future), future.result()
+            finally: 
+                # Output spooled by files left unprinted after an error is 
+                # removed
+                for future in pending: 
+                    if not future.cancel() and future.exception() is None: 
+                        discard_output(future.result()[0])
+
+    def run(self, args): 
+        '''
+        Driver function
+        '''
+        
+        # Parse command line args
+        args = self.parse_cli_args(args)
+        if args.serve is not None: 
+            self.serve(args.serve)
+            return
+        
+        # IPs are only highlighted when the output can show colors. --top 
+        # and --count-distinct count what would have been printed instead
+        out = OutputWriter(sys.stdout, args.color)
+        counter = key_counter(args)
+        self.writer = counter or out
+        self.highlight = self.writer.color and (args.ipv4 or args.ipv6)
+        
+        # Stats are only collected when asked for, so that otherwise no 
+        # timing wrappers are installed at all
+        collect = args.stats or self.stats_hook is not None
+        self.stats = RunStats() if collect else None
+        flush = self.writer.flush
+        if collect: 
+            flush = self.stats.timed("write", flush)
+        
+        failed = False
+        try: 
+            if args.merge: 
+                failed = self.merge_files(args)
+            elif len(args.files) > 1: 
+                failed = self.scan_files(args)
+            else: 
+                self.scan(args)
+        except DecompressionError as error: 
+            flush()
+            self.parser.error(f"argument FILE: {error}")
+        finally: 
+            flush()
+        if args.saved_sketch is not None: 
+            counter.merge(args.saved_sketch)
+        if args.top is not None: 
+            counter.report(out, args.top)
+        elif counter is not None: 
+            counter.report(out)
+        out.flush()
+        if args.sketch is not None: 
+            try: 
+                counter.save(args.sketch)
+            except OSError as error: 
+                print(
+                    f"{self.parser.prog}: can't save sketch '{args.sketch}': "
+                    f"{error}", file=sys.stderr)
+                failed = True
+        if collect: 
+            self.stats.finish()
+            if self.stats_hook is not None: 
+                self.stats_hook(self.stats)
+            if args.stats: 
+                self.report_stats()
+        if failed: 
+            sys.exit(2)
+
+    def serve(self, path): 
+        '''
+        Function to answer requests from client.py on the Unix socket at 
+            path until interrupted
+        Each request is run in a process forked from this one, so modules, 
+            the argument parser's imports, and compiled patterns are ready 
+            without paying for them on every call
+        '''
+        
+        for kind, pattern in PATTERNS.items(): 
+            re.compile(pattern)
+            re.compile(pattern.encode())
+            re.compile(PREFILTER_PATS[kind])
+        
+        # A socket left behind by a server that is gone is replaced, one 
+        # still answering is not
+        if os.path.exists(path) and stat.S_ISSOCK(os.stat(path).st_mode): 
+            with socket.socket(socket.AF_UNIX) as probe: 
+                try: 
+                    probe.connect(path)
+                except OSError: 
+                    os.unlink(path)
+        try: 
+            server = ForkingUnixServer(path, ServeHandler)
+        except OSError as error: 
+            self.parser.error(
+                f"argument --serve: can't listen on '{path}': {error}")
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+        try: 
+            with server: 
+                server.serve_forever()
+        except KeyboardInterrupt: 
+            pass
+        finally: 
+            os.unlink(path)
+
+
+class ForkingUnixServer(
+        socketserver.ForkingMixIn, socketserver.UnixStreamServer): 
+    '''
+    Unix socket server for --serve that handles each client in a process 
+        of its own, so clients are answered concurrently
+    '''
+
+
+class ServeHandler(socketserver.BaseRequestHandler): 
+    '''
+    Handler for one --serve request, run in the process forked for it
+    A request is a SERVE_HEADER, the client's working directory and 
+        arguments separated by NUL bytes, and the client's standard input, 
+        output, and error passed as file descriptors. The run reads and 
+        writes those directly, so its output is exactly what running 
+        util.py in the client's place would print, and the exit status is 
+        sent back as a single byte
+    '''
+
+    def handle(self): 
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        request = self.receive()
+        if request is None: 
+            return
+        cwd, args = request
+        
+        # A client that goes away, e.g. when --follow is interrupted, ends 
+        # its run
+        def hang_up(): 
+            try: 
+                self.request.recv(1)
+            finally: 
+                os._exit(1)
+        
+        threading.Thread(target=hang_up, daemon=True).start()
+        status = 0
+        try: 
+            os.chdir(cwd)
+            main(args)
+        except SystemExit as exit: 
+            status = exit.code
+            if status is None: 
+                status = 0
+            elif not isinstance(status, int): 
+                print(status, file=sys.stderr)
+                status = 1
+        except BaseException: 
+            traceback.print_exc()
+            status = 1
+        finally: 
+            for stream in (sys.stdout, sys.stderr): 
+                try: 
+                    stream.flush()
+                except OSError: 
+                    pass
+        self.request.sendall(bytes([status & 0xFF]))
+
+    def receive(self): 
+        '''
+        Function to read a request and make the client's streams this 
+            process's standard streams
+        Returns (cwd, args), or None if the request is incomplete
+        '''
+        
+        size = struct.calcsize(SERVE_HEADER)
+        data, fds, _, _ = socket.recv_fds(self.request, 64 * 1024, 3)
+        if len(fds) != 3 or len(data) < size: 
+            for fd in fds: 
+                os.close(fd)
+            return None
+        length, = struct.unpack_from(SERVE_HEADER, data)
+        data = data[size:]
+        while len(data) < length: 
+            more = self.request.recv(length - len(data))
+            if not more: 
+                return None
+            data += more
+        
+        for target, fd in enumerate(fds): 
+            os.dup2(fd, target)
+            os.close(fd)
+        sys.stdin = open(0, closefd=False)
+        sys.stdout = open(1, "w", closefd=False)
+        sys.stderr = open(
+            2, "w", buffering=1, errors="backslashreplace", closefd=False)
+        cwd, *args = [os.fsdecode(part) for part in data.split(b"\0")]
+        return cwd, args
 
 
 def main(args): 
-    logParserUtil().run(args)
+    try: 
+        logParserUtil().run(args)
+    except BrokenPipeError: 
+        # The reader went away, e.g. when piped into head. Python flushes 
+        # stdout again at exit, so point it at devnull to keep that quiet
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, sys.stdout.fileno())
+        sys.exit(1)
 
 
 if __name__ == "__main__": 